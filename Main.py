@@ -1,22 +1,39 @@
-from flask import Flask, request, jsonify, render_template
-import pickle
-import numpy as np
-import sqlite3
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
+from db import get_pool, RULES_DB, FRAUD_DB
+from rule_cache import RuleCache, first_matching_rule
+from scoring import predict_fraud_scores, rule_result, model_result, score_transactions, score_valid_transactions
+from stream_ingest import DEFAULT_CHUNK_ROWS, NDJSON_MIMETYPE, chunked, ndjson_line, read_csv, read_ndjson, upload_format
+from micro_batcher import micro_batcher_from_env
+from write_behind import transaction_row, transaction_writer_from_env
+from velocity_store import velocity_store_from_env
+from transaction_query import TransactionQuery, create_transaction_indexes
+from fraud_stats import ensure_fraud_stats
+from model_registry import ModelHolder
+from shadow_scoring import shadow_scorer_from_env, shadow_summary
+from metrics import current_timer, instrument, metrics_from_env
+from fast_json import FastJSONProvider
+from asgi_server import asgi_app_from_env, asgi_enabled, serve
 
 # Initialize Flask app and enable CORS.
 # If you use a templates folder, remove template_folder parameter.
 app = Flask(__name__, template_folder='.')
 CORS(app)
+# orjson-backed jsonify and request.json when orjson is installed
+app.json = FastJSONProvider(app)
 
 ######################################
 # Load Trained Model
 ######################################
-with open("fraud_model.pkl", "rb") as model_file:
-    model = pickle.load(model_file)
+# Feature extraction in the model's training column order, the compiled forest
+# and the training-time encoders and scaler of the registry's active version
+# (see model_registry.py), or of the .pkl files when none is published.
+# Handlers take model_holder.current once per request; POST /admin/model/reload
+# swaps in another version without a restart.
+model_holder = ModelHolder()
 
-# Global channel mapping (used during feature encoding)
-channel_mapping = {"online": 0, "mobile": 1, "pos": 2}
+# Optional micro-batching of concurrent /detect_fraud model calls (FRAUD_MICROBATCH=1)
+micro_batcher = micro_batcher_from_env(predict_fraud_scores)
 
 # Utility function to safely get a key from a dict with a default value
 def safe_get(data, key, default=0):
@@ -26,65 +43,104 @@ def safe_get(data, key, default=0):
 # Database Initialization Functions
 ######################################
 
+# Pooled WAL-mode connections shared by every handler
+rules_db = get_pool(RULES_DB)
+fraud_db = get_pool(FRAUD_DB)
+
 def init_rules_db():
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS fraud_rules (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        condition TEXT NOT NULL,
-                        action TEXT NOT NULL,
-                        enabled INTEGER DEFAULT 1
-                     )''')
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fraud_rules (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            condition TEXT NOT NULL,
+                            action TEXT NOT NULL,
+                            enabled INTEGER DEFAULT 1
+                         )''')
+        conn.commit()
 
 def init_fraud_detection_db():
-    conn = sqlite3.connect("fraud_detection.db", check_same_thread=False, timeout=10)
-    cursor = conn.cursor()
-    # Create transactions table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS transactions (
-            transaction_id TEXT PRIMARY KEY,
-            transaction_amount REAL,
-            is_fraud INTEGER,
-            fraud_source TEXT,
-            fraud_reason TEXT,
-            fraud_score REAL,
-            transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    # Create fraud reports table if needed
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS fraud_reports (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_id TEXT,
-            transaction_amount REAL,
-            is_fraud INTEGER,
-            fraud_source TEXT,
-            fraud_reason TEXT,
-            fraud_score REAL,
-            report_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+    with fraud_db.connection() as conn:
+        cursor = conn.cursor()
+        # Create transactions table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                transaction_id TEXT PRIMARY KEY,
+                transaction_amount REAL,
+                is_fraud INTEGER,
+                fraud_source TEXT,
+                fraud_reason TEXT,
+                fraud_score REAL,
+                transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                transaction_channel TEXT,
+                model_version TEXT
+            )
+        """)
+        # Create fraud reports table if needed
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fraud_reports (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                transaction_id TEXT,
+                transaction_amount REAL,
+                is_fraud INTEGER,
+                fraud_source TEXT,
+                fraud_reason TEXT,
+                fraud_score REAL,
+                report_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Indexes for the /transactions query API
+        create_transaction_indexes(conn)
+        conn.commit()
+        # Running aggregates behind GET /fraud_report, maintained by triggers
+        ensure_fraud_stats(conn)
     print("✅ Fraud detection database initialized successfully!")
 
 # Initialize both databases at startup
 init_rules_db()
 init_fraud_detection_db()
 
+# Scored transactions are persisted in grouped commits by a background writer
+transaction_writer = transaction_writer_from_env(fraud_db)
+
+# Optional scoring of a candidate model version on live traffic, off the request path
+# (FRAUD_SHADOW_MODEL=<registry version>); results go to the shadow_scores table
+shadow_scorer = shadow_scorer_from_env(fraud_db)
+
+# Per-payer/payee velocity features for rules and the model (FRAUD_VELOCITY=0 disables)
+velocity_store = velocity_store_from_env()
+
+######################################
+# Compiled Rule Cache
+######################################
+
+# Active rules are compiled once and reloaded only when /rules changes them
+# or rules.db is modified on disk.
+rule_cache = RuleCache(RULES_DB)
+
 ######################################
-# Helper Function to Fetch Active Rules
+# Metrics
 ######################################
 
-def get_rules():
-    conn = sqlite3.connect("rules.db", check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute("SELECT condition, action, enabled FROM fraud_rules WHERE enabled=1")
-    rules = cursor.fetchall()
-    conn.close()
-    return rules
+# Per-stage latency histograms and rule-hit/decision counters, served at /metrics in
+# Prometheus text format together with the writer, micro-batcher and velocity store counters
+service_metrics = metrics_from_env()
+service_metrics.add_collector("fraud_writer", transaction_writer.metrics)
+if micro_batcher is not None:
+    service_metrics.add_collector("fraud_micro_batch", micro_batcher.metrics)
+if velocity_store is not None:
+    service_metrics.add_collector("fraud_velocity", velocity_store.metrics)
+if shadow_scorer is not None:
+    service_metrics.add_collector("fraud_shadow", shadow_scorer.metrics)
+instrument(app, service_metrics)
+
+######################################
+# ASGI Serving Mode
+######################################
+
+# The app behind an event loop with a bounded handler pool, for FRAUD_SERVER=asgi
+# or any ASGI server (uvicorn Main:asgi_app); see asgi_server.py
+asgi_app = asgi_app_from_env(app)
+service_metrics.add_collector("fraud_asgi", asgi_app.metrics)
 
 ######################################
 # Fraud Detection Endpoints
@@ -92,184 +148,278 @@ def get_rules():
 
 @app.route("/detect_fraud", methods=["POST"])
 def detect_fraud():
+    timer = current_timer()
+    serving = model_holder.current
     try:
         data = request.json
+        timer.lap("json_parse")
         if not data:
             return jsonify({"error": "Invalid JSON request"}), 400
+        if velocity_store is not None:
+            data = velocity_store.enrich(data)
+            timer.lap("velocity")
 
         transaction_id = safe_get(data, "transaction_id", "unknown")
 
-        # Encode categorical values (e.g., transaction_channel)
-        data["transaction_channel"] = channel_mapping.get(safe_get(data, "transaction_channel"), -1)
-
-        # Create feature vector from input data
-        features = np.array([
-            float(safe_get(data, "transaction_amount")), 
-            int(safe_get(data, "transaction_channel")), 
-            int(safe_get(data, "transaction_payment_mode_anonymous")), 
-            int(safe_get(data, "payment_gateway_bank_anonymous")), 
-            int(safe_get(data, "payer_browser_anonymous")), 
-            int(safe_get(data, "transaction_hour")), 
-            int(safe_get(data, "transaction_day")), 
-            int(safe_get(data, "transaction_month"))
-        ]).reshape(1, -1)
+        # Build the feature vector in model order; the request body is left untouched
+        features = serving.feature_extractor.extract_one(data)
+        timer.lap("feature_build")
 
         # Check rules
-        rules = get_rules()
-        for condition, action, enabled in rules:
-            if enabled:
-                try:
-                    # Evaluate condition using only allowed data fields.
-                    if eval(condition, {"__builtins__": None}, data):
-                        safe_keywords = ["safe", "approved", "all good", "verified", "trusted"]
-                        is_fraud = not any(keyword in action.lower() for keyword in safe_keywords)
-                        fraud_score = 1.0 if is_fraud else 0.0
-                        return jsonify({
-                            "transaction_id": transaction_id,
-                            "is_fraud": is_fraud,
-                            "fraud_source": "rule",
-                            "fraud_reason": action,
-                            "fraud_score": fraud_score
-                        })
-                except Exception as e:
-                    print(f"Rule evaluation error: {e}")
+        rules = rule_cache.get_rules()
+        timer.lap("rule_fetch")
+        rule = first_matching_rule(rules, serving.feature_extractor.rule_namespace(data))
+        timer.lap("rule_eval")
+        if rule is not None:
+            service_metrics.rule_hit(rule)
+            result = rule_result(transaction_id, rule)
+            transaction_writer.submit(transaction_row(data, result))
+            timer.lap("db_insert")
+            response = jsonify(result)
+            timer.lap("jsonify")
+            return response
 
         # If no rule flags fraud, use the AI model.
-        score = model.predict_proba(features)[0][1]
-        is_fraud = bool(score > 0.5)
-        source = "model"
-        reason = "Predicted by AI"
+        serving.preprocessor.transform_one(data, features)
+        timer.lap("preprocess")
+        if micro_batcher is not None:
+            score = micro_batcher.score(serving.model, features[0])
+        else:
+            score = serving.model.predict_proba(features)[0][1]
+        timer.lap("predict_proba")
+        service_metrics.model_decision(score)
+        result = model_result(transaction_id, score)
 
-        # Store the transaction in the fraud_detection database.
-        conn = sqlite3.connect("fraud_detection.db", check_same_thread=False, timeout=10)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)",
-                       (transaction_id, data["transaction_amount"], is_fraud, source, reason, round(score, 2)))
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            "transaction_id": transaction_id,
-            "is_fraud": is_fraud,
-            "fraud_source": source,
-            "fraud_reason": reason,
-            "fraud_score": round(score, 2)
-        })
+        # Queue the transaction for the background writer instead of committing inline.
+        transaction_writer.submit(transaction_row(data, result, serving.version))
+        timer.lap("db_insert")
+        if shadow_scorer is not None:
+            shadow_scorer.submit(data, result, score, serving.version)
+            timer.lap("shadow")
+
+        response = jsonify(result)
+        timer.lap("jsonify")
+        return response
     except Exception as e:
         return jsonify({"error": str(e)})
 
 @app.route("/detect_fraud_batch", methods=["POST"])
 def detect_fraud_batch():
+    timer = current_timer()
+    serving = model_holder.current
     try:
         transactions = request.json.get("transactions", [])
-        results = []
-        rules = get_rules()
-        
-        for data in transactions:
-            transaction_id = safe_get(data, "transaction_id", "unknown")
-            data["transaction_channel"] = channel_mapping.get(safe_get(data, "transaction_channel"), -1)
-
-            features = np.array([
-                float(safe_get(data, "transaction_amount")), 
-                int(safe_get(data, "transaction_channel")), 
-                int(safe_get(data, "transaction_payment_mode_anonymous")), 
-                int(safe_get(data, "payment_gateway_bank_anonymous")), 
-                int(safe_get(data, "payer_browser_anonymous")), 
-                int(safe_get(data, "transaction_hour")), 
-                int(safe_get(data, "transaction_day")), 
-                int(safe_get(data, "transaction_month"))
-            ]).reshape(1, -1)
-
-            fraud_detected = False
-            for condition, action, enabled in rules:
-                if enabled:
-                    try:
-                        if eval(condition, {"__builtins__": None}, data):
-                            safe_keywords = ["safe", "approved", "all good", "verified", "trusted"]
-                            is_fraud = not any(keyword in action.lower() for keyword in safe_keywords)
-                            fraud_score = 1.0 if is_fraud else 0.0
-                            results.append({
-                                "transaction_id": transaction_id,
-                                "is_fraud": is_fraud,
-                                "fraud_source": "rule",
-                                "fraud_reason": action,
-                                "fraud_score": fraud_score
-                            })
-                            fraud_detected = True
-                            break
-                    except Exception as e:
-                        print(f"Rule evaluation error: {e}")
-
-            if not fraud_detected:
-                score = model.predict_proba(features)[0][1]
-                is_fraud = bool(score > 0.5)
-                results.append({
-                    "transaction_id": transaction_id,
-                    "is_fraud": is_fraud,
-                    "fraud_source": "model",
-                    "fraud_reason": "Predicted by AI",
-                    "fraud_score": round(score, 2)
-                })
-        
-        return jsonify({"results": results})
+        timer.lap("json_parse")
+        if velocity_store is not None:
+            transactions = velocity_store.enrich_many(transactions)
+            timer.lap("velocity")
+        # Optional ?chunk_size=N bounds how many rows are passed to predict_proba at once
+        chunk_size = request.args.get("chunk_size", type=int)
+        if chunk_size is not None and chunk_size <= 0:
+            return jsonify({"error": "chunk_size must be a positive integer"}), 400
+
+        # Rules as one mask per rule over the batch, then one model call for the rest
+        results, scores = score_transactions(
+            transactions, rule_cache.get_rules(), serving.feature_extractor, serving.preprocessor, serving.model,
+            chunk_size, timer, with_scores=True
+        )
+
+        transaction_writer.submit_many(
+            transaction_row(data, result, serving.version) for data, result in zip(transactions, results)
+        )
+        timer.lap("db_insert")
+        if shadow_scorer is not None:
+            shadow_scorer.submit_many(transactions, results, scores, serving.version)
+            timer.lap("shadow")
+
+        response = jsonify({"results": results})
+        timer.lap("jsonify")
+        return response
     except Exception as e:
         return jsonify({"error": str(e)})
 
+@app.route("/detect_fraud_stream", methods=["POST"])
+def detect_fraud_stream():
+    # Score an uploaded CSV or NDJSON body chunk by chunk and stream NDJSON results back.
+    # ?format=csv|ndjson overrides the Content-Type; ?chunk_rows=N sets rows per chunk.
+    try:
+        upload = upload_format(request.content_type, request.args.get("format"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    chunk_rows = max(1, request.args.get("chunk_rows", DEFAULT_CHUNK_ROWS, type=int))
+    # The whole upload is scored by the model version current when it started
+    serving = model_holder.current
+    if upload == "csv":
+        records = read_csv(request.stream, serving.feature_extractor.feature_names)
+    else:
+        records = read_ndjson(request.stream)
+
+    read_errors = []
+    # Stages are timed per chunk; "read" is the time spent receiving and parsing the chunk
+    timer = current_timer()
+
+    def read_until_error():
+        # Stop at malformed input, but still score the rows read before it
+        try:
+            yield from records
+        except ValueError as e:
+            read_errors.append(e)
+
+    def generate():
+        offset = 0
+        try:
+            for chunk in chunked(read_until_error(), chunk_rows):
+                timer.lap("read")
+                if velocity_store is not None:
+                    chunk = velocity_store.enrich_many(chunk)
+                    timer.lap("velocity")
+                results, scores, errors = score_valid_transactions(
+                    chunk, rule_cache.get_rules(), serving.feature_extractor, serving.preprocessor,
+                    serving.model, timer=timer
+                )
+                scored = [i for i, result in enumerate(results) if result is not None]
+                transaction_writer.submit_many(
+                    transaction_row(chunk[i], results[i], serving.version) for i in scored
+                )
+                timer.lap("db_insert")
+                if shadow_scorer is not None:
+                    shadow_scorer.submit_many([chunk[i] for i in scored], [results[i] for i in scored],
+                                              scores[scored], serving.version)
+                    timer.lap("shadow")
+                # Rows with invalid values are reported in place, with their offset in the upload
+                lines = "".join(
+                    ndjson_line(result if result is not None else {"error": errors[i], "offset": offset + i})
+                    for i, result in enumerate(results)
+                )
+                offset += len(chunk)
+                timer.lap("serialize")
+                yield lines
+        except Exception as e:
+            yield ndjson_line({"error": str(e), "offset": offset})
+        for e in read_errors:
+            yield ndjson_line({"error": str(e), "offset": offset})
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+@app.route("/transactions", methods=["GET"])
+def list_transactions():
+    # Filters: start, end, is_fraud, fraud_source, min_score; paging: limit, cursor
+    try:
+        query = TransactionQuery.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return Response(stream_with_context(query.stream(fraud_db)), mimetype="application/json")
+
+@app.route("/micro_batch/metrics", methods=["GET"])
+def micro_batch_metrics():
+    if micro_batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(micro_batcher.metrics(), enabled=True))
+
+@app.route("/velocity/metrics", methods=["GET"])
+def velocity_metrics():
+    if velocity_store is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(velocity_store.metrics(), enabled=True))
+
+@app.route("/shadow/metrics", methods=["GET"])
+def shadow_metrics():
+    # Live counters for the running candidate plus the shadow_scores table summarized per version pair
+    if shadow_scorer is None:
+        return jsonify({"enabled": False})
+    with fraud_db.connection() as conn:
+        summary = shadow_summary(conn)
+    return jsonify(dict(shadow_scorer.metrics(), enabled=True, summary=summary))
+
 ######################################
 # Rule Management Endpoints
 ######################################
 
 @app.route("/rules", methods=["GET"])
 def get_all_rules():
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM fraud_rules")
-    rules = [{"id": row[0], "condition": row[1], "action": row[2], "enabled": bool(row[3])} for row in cursor.fetchall()]
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM fraud_rules")
+        rules = [{"id": row[0], "condition": row[1], "action": row[2], "enabled": bool(row[3])} for row in cursor.fetchall()]
     return jsonify(rules)
 
 @app.route("/rules", methods=["POST"])
 def add_rule():
     data = request.json
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO fraud_rules (condition, action, enabled) VALUES (?, ?, ?)",
-                   (data["condition"], data["action"], int(data.get("enabled", 1))))
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO fraud_rules (condition, action, enabled) VALUES (?, ?, ?)",
+                       (data["condition"], data["action"], int(data.get("enabled", 1))))
+        conn.commit()
+    rule_cache.bump_version()
     return jsonify({"message": "Rule added successfully"}), 201
 
 @app.route("/rules/<int:rule_id>", methods=["PUT"])
 def update_rule(rule_id):
     data = request.json
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute("UPDATE fraud_rules SET condition=?, action=?, enabled=? WHERE id=?",
-                   (data["condition"], data["action"], int(data["enabled"]), rule_id))
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE fraud_rules SET condition=?, action=?, enabled=? WHERE id=?",
+                       (data["condition"], data["action"], int(data["enabled"]), rule_id))
+        conn.commit()
+    rule_cache.bump_version()
     return jsonify({"message": "Rule updated successfully"})
 
 @app.route("/rules/<int:rule_id>", methods=["DELETE"])
 def delete_rule(rule_id):
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    # Delete the selected rule
-    cursor.execute("DELETE FROM fraud_rules WHERE id=?", (rule_id,))
-    conn.commit()
-    # Retrieve remaining rules sorted by ID
-    cursor.execute("SELECT * FROM fraud_rules ORDER BY id")
-    rules = cursor.fetchall()
-    # Reset table and reinsert with new sequential IDs
-    cursor.execute("DELETE FROM fraud_rules")
-    cursor.execute("DELETE FROM sqlite_sequence WHERE name='fraud_rules'")
-    for index, rule in enumerate(rules, start=1):
-        cursor.execute("INSERT INTO fraud_rules (id, condition, action, enabled) VALUES (?, ?, ?, ?)",
-                       (index, rule[1], rule[2], rule[3]))
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        # Delete the selected rule
+        cursor.execute("DELETE FROM fraud_rules WHERE id=?", (rule_id,))
+        conn.commit()
+        # Retrieve remaining rules sorted by ID
+        cursor.execute("SELECT * FROM fraud_rules ORDER BY id")
+        rules = cursor.fetchall()
+        # Reset table and reinsert with new sequential IDs
+        cursor.execute("DELETE FROM fraud_rules")
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name='fraud_rules'")
+        for index, rule in enumerate(rules, start=1):
+            cursor.execute("INSERT INTO fraud_rules (id, condition, action, enabled) VALUES (?, ?, ?, ?)",
+                           (index, rule[1], rule[2], rule[3]))
+        conn.commit()
+    rule_cache.bump_version()
     return jsonify({"message": "Rule deleted and IDs reordered successfully"})
 
+# Rule evaluation order: policy, current order and per-rule hit rates and costs
+@app.route("/rules/order", methods=["GET"])
+def get_rule_order():
+    return jsonify(rule_cache.order_report())
+
+@app.route("/rules/order", methods=["PUT"])
+def set_rule_order():
+    data = request.get_json(silent=True) or {}
+    try:
+        rule_cache.set_policy(data.get("policy"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(rule_cache.order_report())
+
+######################################
+# Model Admin Endpoints
+######################################
+
+# Serving model version, reload progress and the registry's published versions
+@app.route("/admin/model", methods=["GET"])
+def model_status():
+    return jsonify(model_holder.status())
+
+@app.route("/admin/model/reload", methods=["POST"])
+def reload_model():
+    # Load and warm the registry's active version, or {"version": ...}, in the background
+    data = request.get_json(silent=True) or {}
+    try:
+        started = model_holder.reload(data.get("version"))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    if not started:
+        return jsonify(dict(model_holder.status(), error="A model reload is already running")), 409
+    return jsonify(model_holder.status()), 202
+
 ######################################
 # Frontend Endpoint
 ######################################
@@ -279,8 +429,11 @@ def index():
     return render_template("index.html")
 
 ######################################
-# Run the Flask Application
+# Run the Application (Flask's server, or uvicorn with FRAUD_SERVER=asgi)
 ######################################
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    if asgi_enabled():
+        serve(asgi_app, port=5000)
+    else:
+        app.run(debug=True, port=5000)
@@ -0,0 +1,259 @@
+"""ASGI serving mode for the Flask services.
+
+    FRAUD_SERVER=asgi python Main.py                  # uvicorn on the service's usual port
+    uvicorn Main:asgi_app --port 5000 --no-access-log  # or any ASGI server
+
+AsgiBridge runs a service's Flask app behind an asyncio event loop. The
+loop owns every connection, so idle keep-alive clients, slow uploads and
+clients waiting on a streamed response cost no thread. Only the handler
+itself (feature building, scoring, SQLite reads) runs, on a bounded thread
+pool. Requests beyond the pool and `max_pending` waiting ones are refused
+with 503 at once instead of queueing without limit. Scored transactions
+are still persisted by the background writer, so handlers never wait on
+a commit.
+"""
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import ClientDisconnected
+
+# Request bodies up to this size are read on the event loop before the
+# handler starts; larger or chunked bodies are streamed to the handler
+BUFFER_BYTES = 1024 * 1024
+
+OVERLOADED_BODY = b'{"error":"Server is busy, retry shortly"}\n'
+
+
+class _ReceiveStream(io.RawIOBase):
+    """wsgi.input for a streamed body: the handler's reads wait on the event loop's receive()."""
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = memoryview(b"")
+        self._more = True
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and self._more:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                self._more = False
+                raise ClientDisconnected()
+            self._chunk = memoryview(message.get("body", b""))
+            self._more = message.get("more_body", False)
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+class AsgiBridge:
+    """An ASGI application serving a WSGI app from a bounded thread pool.
+
+    At most `threads` handlers run at once and at most `max_pending`
+    requests wait for one; further requests get 503 with Retry-After.
+    Responses with a Content-Length are produced in one call on the pool;
+    streamed responses are produced chunk by chunk, each chunk sent before
+    the next is requested, so a slow client slows its own stream only.
+    """
+
+    def __init__(self, wsgi_app, threads=None, max_pending=1024, buffer_bytes=BUFFER_BYTES):
+        self.wsgi_app = wsgi_app
+        self.threads = threads or min(32, (os.cpu_count() or 1) + 4)
+        self.max_pending = max_pending
+        self.buffer_bytes = buffer_bytes
+        self.executor = ThreadPoolExecutor(self.threads, thread_name_prefix="asgi-handler")
+        # Only touched on the event loop thread
+        self._in_flight = 0
+        self._stats = {"requests": 0, "rejected": 0, "streamed_requests": 0, "streamed_responses": 0,
+                       "max_observed_in_flight": 0}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+        self._stats["requests"] += 1
+        if self._in_flight >= self.threads + self.max_pending:
+            self._stats["rejected"] += 1
+            await self._overloaded(send)
+            return
+        self._in_flight += 1
+        self._stats["max_observed_in_flight"] = max(self._stats["max_observed_in_flight"], self._in_flight)
+        try:
+            await self._handle(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # The server has already closed its connections, so no handler is left running
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _overloaded(self, send):
+        await send({"type": "http.response.start", "status": 503, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(OVERLOADED_BODY)).encode()),
+            (b"retry-after", b"1"),
+        ]})
+        await send({"type": "http.response.body", "body": OVERLOADED_BODY})
+
+    async def _read_body(self, scope, receive):
+        loop = asyncio.get_running_loop()
+        length = _header(scope, b"content-length")
+        if length is None or int(length) > self.buffer_bytes:
+            self._stats["streamed_requests"] += 1
+            return io.BufferedReader(_ReceiveStream(receive, loop), 64 * 1024)
+        body = bytearray()
+        more = True
+        while more:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnected()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        return io.BytesIO(bytes(body))
+
+    def _environ(self, scope, body):
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope["query_string"].decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            # Reads end at the end of the body, with or without a Content-Length
+            "wsgi.input_terminated": True,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+        for key, value in scope["headers"]:
+            name = key.decode("latin-1").upper().replace("-", "_")
+            if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                name = "HTTP_" + name
+            value = value.decode("latin-1")
+            environ[name] = environ[name] + "," + value if name in environ else value
+        return environ
+
+    def _start(self, environ):
+        # Call the app; a response with a length is read whole, a streamed one only to its first chunk
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                  for name, value in headers]
+            return lambda data: None
+
+        iterable = self.wsgi_app(environ, start_response)
+        try:
+            if any(name == b"content-length" for name, _ in started["headers"]):
+                return started, iterable, [b"".join(iterable)], False
+            iterator = iter(iterable)
+            return started, iterable, [next(iterator, b"")], iterator
+        except BaseException:
+            if hasattr(iterable, "close"):
+                iterable.close()
+            raise
+
+    async def _handle(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        try:
+            body = await self._read_body(scope, receive)
+        except ClientDisconnected:
+            return
+        environ = self._environ(scope, body)
+        # Every pool call of a request runs in one context: a streamed response resumes
+        # Flask's request context, held in context variables, from whichever thread is free
+        context = contextvars.copy_context()
+        started, iterable, chunks, iterator = await loop.run_in_executor(
+            self.executor, context.run, self._start, environ
+        )
+        try:
+            await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+            if iterator:
+                self._stats["streamed_responses"] += 1
+            chunk = chunks[0]
+            while True:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                if not iterator:
+                    break
+                chunk = await loop.run_in_executor(self.executor, context.run, next, iterator, None)
+                if chunk is None:
+                    break
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(iterable, "close"):
+                # Ends the request context of a streamed response on the pool, like the last chunk
+                await loop.run_in_executor(self.executor, context.run, iterable.close)
+
+    def metrics(self):
+        stats = dict(self._stats)
+        stats["in_flight"] = self._in_flight
+        stats["config"] = {"threads": self.threads, "max_pending": self.max_pending,
+                           "buffer_bytes": self.buffer_bytes}
+        return stats
+
+
+def asgi_app_from_env(wsgi_app):
+    """Wrap a Flask app in an AsgiBridge configured from the environment.
+
+    FRAUD_ASGI_THREADS sets the handler threads (default min(32, CPUs + 4)),
+    FRAUD_ASGI_MAX_PENDING the requests allowed to wait for one (default
+    1024) and FRAUD_ASGI_BUFFER_BYTES the largest body read before the
+    handler starts (default 1 MiB).
+    """
+    return AsgiBridge(
+        wsgi_app,
+        threads=int(os.environ.get("FRAUD_ASGI_THREADS", 0)) or None,
+        max_pending=int(os.environ.get("FRAUD_ASGI_MAX_PENDING", 1024)),
+        buffer_bytes=int(os.environ.get("FRAUD_ASGI_BUFFER_BYTES", BUFFER_BYTES)),
+    )
+
+
+def asgi_enabled():
+    """True when FRAUD_SERVER=asgi asks for the ASGI server instead of Flask's."""
+    return os.environ.get("FRAUD_SERVER", "flask") == "asgi"
+
+
+def serve(asgi_app, port):
+    """Serve `asgi_app` with uvicorn on FRAUD_ASGI_HOST (default 127.0.0.1) and `port`."""
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("FRAUD_SERVER=asgi needs uvicorn (pip install uvicorn), "
+                         "or run the module's asgi_app with another ASGI server")
+    uvicorn.run(asgi_app, host=os.environ.get("FRAUD_ASGI_HOST", "127.0.0.1"), port=port,
+                access_log=False, backlog=4096)
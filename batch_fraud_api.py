@@ -1,27 +1,74 @@
-from flask import Flask, request, jsonify
-import pickle
-import numpy as np
-import sqlite3
-import pandas as pd
+from flask import Flask, Response, request, jsonify, stream_with_context
+from db import get_pool, RULES_DB, FRAUD_DB
+from rule_cache import RuleCache, first_matching_rule
+from scoring import predict_fraud_scores, rule_result, model_result, score_transactions, score_valid_transactions
+from stream_ingest import DEFAULT_CHUNK_ROWS, NDJSON_MIMETYPE, chunked, ndjson_line, read_csv, read_ndjson, upload_format
+from micro_batcher import micro_batcher_from_env
+from write_behind import transaction_row, transaction_writer_from_env
+from velocity_store import velocity_store_from_env
+from transaction_query import TransactionQuery, create_transaction_indexes
+from fraud_stats import ensure_fraud_stats
+from model_registry import ModelHolder
+from shadow_scoring import shadow_scorer_from_env, shadow_summary
+from metrics import current_timer, instrument, metrics_from_env
+from fast_json import FastJSONProvider
+from asgi_server import asgi_app_from_env, asgi_enabled, serve
 
-# Load trained model
-with open("fraud_model.pkl", "rb") as model_file:
-    model = pickle.load(model_file)
+# Feature extraction shared with training, plus the trained model, encoders and
+# scaler of the registry's active version (or of the .pkl files when none is
+# published). Handlers take model_holder.current once per request so
+# POST /admin/model/reload can swap versions without a restart
+model_holder = ModelHolder()
+
+# Optional micro-batching of concurrent /detect_fraud model calls (FRAUD_MICROBATCH=1)
+micro_batcher = micro_batcher_from_env(predict_fraud_scores)
 
 # Initialize Flask app
 app = Flask(__name__)
+# orjson-backed jsonify and request.json when orjson is installed
+app.json = FastJSONProvider(app)
+
+# Compiled rules, reloaded only when rules.db changes on disk
+rule_cache = RuleCache(RULES_DB)
+
+# Pooled WAL-mode connection to the transactions database
+fraud_db = get_pool(FRAUD_DB)
+
+# Indexes for the /transactions query API and the running aggregates behind GET /fraud_report
+try:
+    with fraud_db.connection() as conn:
+        create_transaction_indexes(conn)
+        conn.commit()
+        ensure_fraud_stats(conn)
+except Exception as e:
+    print(f"Could not prepare the transactions table: {e}")
+
+# Scored transactions are persisted in grouped commits by a background writer
+transaction_writer = transaction_writer_from_env(fraud_db)
+
+# Optional scoring of a candidate model version on live traffic, off the request path
+# (FRAUD_SHADOW_MODEL=<registry version>); results go to the shadow_scores table
+shadow_scorer = shadow_scorer_from_env(fraud_db)
+
+# Per-payer/payee velocity features for rules and the model (FRAUD_VELOCITY=0 disables)
+velocity_store = velocity_store_from_env()
 
-# Connect to SQLite database
-def get_rules():
-    conn = sqlite3.connect("rules.db", check_same_thread=False)
-    cursor = conn.cursor()
-    cursor.execute("SELECT condition, action, enabled FROM fraud_rules WHERE enabled=1")
-    rules = cursor.fetchall()
-    conn.close()
-    return rules
+# Per-stage latency histograms and rule-hit/decision counters, served at /metrics in
+# Prometheus text format together with the writer, micro-batcher and velocity store counters
+service_metrics = metrics_from_env()
+service_metrics.add_collector("fraud_writer", transaction_writer.metrics)
+if micro_batcher is not None:
+    service_metrics.add_collector("fraud_micro_batch", micro_batcher.metrics)
+if velocity_store is not None:
+    service_metrics.add_collector("fraud_velocity", velocity_store.metrics)
+if shadow_scorer is not None:
+    service_metrics.add_collector("fraud_shadow", shadow_scorer.metrics)
+instrument(app, service_metrics)
 
-# Define channel mapping globally
-channel_mapping = {"online": 0, "mobile": 1, "pos": 2}
+# ASGI entry point (FRAUD_SERVER=asgi, or uvicorn fraud_detection_api:asgi_app): the event
+# loop holds the connections and a bounded thread pool runs the handlers
+asgi_app = asgi_app_from_env(app)
+service_metrics.add_collector("fraud_asgi", asgi_app.metrics)
 
 # Function to safely get values with default fallback
 def safe_get(data, key, default=0):
@@ -30,129 +77,214 @@ def safe_get(data, key, default=0):
 # Fraud Detection API
 @app.route("/detect_fraud", methods=["POST"])
 def detect_fraud():
+    timer = current_timer()
+    serving = model_holder.current
     try:
         data = request.json
+        timer.lap("json_parse")
         if not data:
             return jsonify({"error": "Invalid JSON request"}), 400
+        if velocity_store is not None:
+            data = velocity_store.enrich(data)
+            timer.lap("velocity")
 
         transaction_id = safe_get(data, "transaction_id", "unknown")
 
-        # Encoding categorical values (same as training)
-        data["transaction_channel"] = channel_mapping.get(safe_get(data, "transaction_channel"), -1)
-
-        features = np.array([
-            float(safe_get(data, "transaction_amount")), 
-            int(safe_get(data, "transaction_channel")), 
-            int(safe_get(data, "transaction_payment_mode_anonymous")), 
-            int(safe_get(data, "payment_gateway_bank_anonymous")), 
-            int(safe_get(data, "payer_browser_anonymous")), 
-            int(safe_get(data, "transaction_hour")), 
-            int(safe_get(data, "transaction_day")), 
-            int(safe_get(data, "transaction_month"))
-        ]).reshape(1, -1)
-
-        # Fetch rules dynamically
-        rules = get_rules()
-        for condition, action, enabled in rules:
-            if enabled:
-                try:
-                    # Safely evaluate condition using only allowed data fields
-                    if eval(condition, {"__builtins__": None}, data):
-                        safe_keywords = ["safe", "approved", "all good", "verified", "trusted"]
-                        is_fraud = not any(keyword in action.lower() for keyword in safe_keywords)
-                        fraud_score = 1.0 if is_fraud else 0.0
-                        return jsonify({
-                            "transaction_id": transaction_id,
-                            "is_fraud": is_fraud,
-                            "fraud_source": "rule",
-                            "fraud_reason": action,
-                            "fraud_score": fraud_score
-                        })
-                except Exception as e:
-                    print(f"Rule evaluation error: {e}")
+        # Build the feature vector in model order; the request body is left untouched
+        features = serving.feature_extractor.extract_one(data)
+        timer.lap("feature_build")
+
+        # Fetch cached rules
+        rules = rule_cache.get_rules()
+        timer.lap("rule_fetch")
+        rule = first_matching_rule(rules, serving.feature_extractor.rule_namespace(data))
+        timer.lap("rule_eval")
+        if rule is not None:
+            service_metrics.rule_hit(rule)
+            result = rule_result(transaction_id, rule)
+            transaction_writer.submit(transaction_row(data, result))
+            timer.lap("db_insert")
+            response = jsonify(result)
+            timer.lap("jsonify")
+            return response
 
         # If no rule flags fraud, use AI model
-        score = model.predict_proba(features)[0][1]
-        is_fraud = bool(score > 0.5)
-        source = "model"
-        reason = "Predicted by AI"
-
-        # Store transaction in DB
-        conn = sqlite3.connect("fraud_detection.db", check_same_thread=False, timeout=10)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)",
-                       (transaction_id, data["transaction_amount"], is_fraud, source, reason, round(score, 2)))
-        conn.commit()
-        conn.close()
-        
-        return jsonify({
-            "transaction_id": transaction_id,
-            "is_fraud": is_fraud,
-            "fraud_source": source,
-            "fraud_reason": reason,
-            "fraud_score": round(score, 2)
-        })
+        serving.preprocessor.transform_one(data, features)
+        timer.lap("preprocess")
+        if micro_batcher is not None:
+            score = micro_batcher.score(serving.model, features[0])
+        else:
+            score = serving.model.predict_proba(features)[0][1]
+        timer.lap("predict_proba")
+        service_metrics.model_decision(score)
+        result = model_result(transaction_id, score)
+
+        # Queue transaction for the background DB writer
+        transaction_writer.submit(transaction_row(data, result, serving.version))
+        timer.lap("db_insert")
+        if shadow_scorer is not None:
+            shadow_scorer.submit(data, result, score, serving.version)
+            timer.lap("shadow")
+
+        response = jsonify(result)
+        timer.lap("jsonify")
+        return response
     except Exception as e:
         return jsonify({"error": str(e)})
 
 # Batch Fraud Detection API
 @app.route("/detect_fraud_batch", methods=["POST"])
 def detect_fraud_batch():
+    timer = current_timer()
+    serving = model_holder.current
     try:
         transactions = request.json.get("transactions", [])
-        results = []
-        rules = get_rules()
-        
-        for data in transactions:
-            transaction_id = safe_get(data, "transaction_id", "unknown")
-            data["transaction_channel"] = channel_mapping.get(safe_get(data, "transaction_channel"), -1)
-
-            features = np.array([
-                float(safe_get(data, "transaction_amount")), 
-                int(safe_get(data, "transaction_channel")), 
-                int(safe_get(data, "transaction_payment_mode_anonymous")), 
-                int(safe_get(data, "payment_gateway_bank_anonymous")), 
-                int(safe_get(data, "payer_browser_anonymous")), 
-                int(safe_get(data, "transaction_hour")), 
-                int(safe_get(data, "transaction_day")), 
-                int(safe_get(data, "transaction_month"))
-            ]).reshape(1, -1)
-
-            fraud_detected = False
-            for condition, action, enabled in rules:
-                if enabled:
-                    try:
-                        if eval(condition, {"__builtins__": None}, data):
-                            safe_keywords = ["safe", "approved", "all good", "verified", "trusted"]
-                            is_fraud = not any(keyword in action.lower() for keyword in safe_keywords)
-                            fraud_score = 1.0 if is_fraud else 0.0
-                            results.append({
-                                "transaction_id": transaction_id,
-                                "is_fraud": is_fraud,
-                                "fraud_source": "rule",
-                                "fraud_reason": action,
-                                "fraud_score": fraud_score
-                            })
-                            fraud_detected = True
-                            break
-                    except Exception as e:
-                        print(f"Rule evaluation error: {e}")
-
-            if not fraud_detected:
-                score = model.predict_proba(features)[0][1]
-                is_fraud = bool(score > 0.5)
-                results.append({
-                    "transaction_id": transaction_id,
-                    "is_fraud": is_fraud,
-                    "fraud_source": "model",
-                    "fraud_reason": "Predicted by AI",
-                    "fraud_score": round(score, 2)
-                })
-        
-        return jsonify({"results": results})
+        timer.lap("json_parse")
+        if velocity_store is not None:
+            transactions = velocity_store.enrich_many(transactions)
+            timer.lap("velocity")
+        # Optional ?chunk_size=N bounds how many rows are passed to predict_proba at once
+        chunk_size = request.args.get("chunk_size", type=int)
+        if chunk_size is not None and chunk_size <= 0:
+            return jsonify({"error": "chunk_size must be a positive integer"}), 400
+
+        # Rules as one mask per rule over the batch, then one model call for the rest
+        results, scores = score_transactions(
+            transactions, rule_cache.get_rules(), serving.feature_extractor, serving.preprocessor, serving.model,
+            chunk_size, timer, with_scores=True
+        )
+
+        transaction_writer.submit_many(
+            transaction_row(data, result, serving.version) for data, result in zip(transactions, results)
+        )
+        timer.lap("db_insert")
+        if shadow_scorer is not None:
+            shadow_scorer.submit_many(transactions, results, scores, serving.version)
+            timer.lap("shadow")
+
+        response = jsonify({"results": results})
+        timer.lap("jsonify")
+        return response
     except Exception as e:
         return jsonify({"error": str(e)})
 
-# Run the Flask app
+# Streaming CSV/NDJSON Fraud Detection API
+@app.route("/detect_fraud_stream", methods=["POST"])
+def detect_fraud_stream():
+    # Score an uploaded CSV or NDJSON body chunk by chunk and stream NDJSON results back.
+    # ?format=csv|ndjson overrides the Content-Type; ?chunk_rows=N sets rows per chunk.
+    try:
+        upload = upload_format(request.content_type, request.args.get("format"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    chunk_rows = max(1, request.args.get("chunk_rows", DEFAULT_CHUNK_ROWS, type=int))
+    # The whole upload is scored by the model version current when it started
+    serving = model_holder.current
+    if upload == "csv":
+        records = read_csv(request.stream, serving.feature_extractor.feature_names)
+    else:
+        records = read_ndjson(request.stream)
+
+    read_errors = []
+    # Stages are timed per chunk; "read" is the time spent receiving and parsing the chunk
+    timer = current_timer()
+
+    def read_until_error():
+        # Stop at malformed input, but still score the rows read before it
+        try:
+            yield from records
+        except ValueError as e:
+            read_errors.append(e)
+
+    def generate():
+        offset = 0
+        try:
+            for chunk in chunked(read_until_error(), chunk_rows):
+                timer.lap("read")
+                if velocity_store is not None:
+                    chunk = velocity_store.enrich_many(chunk)
+                    timer.lap("velocity")
+                results, scores, errors = score_valid_transactions(
+                    chunk, rule_cache.get_rules(), serving.feature_extractor, serving.preprocessor,
+                    serving.model, timer=timer
+                )
+                scored = [i for i, result in enumerate(results) if result is not None]
+                transaction_writer.submit_many(
+                    transaction_row(chunk[i], results[i], serving.version) for i in scored
+                )
+                timer.lap("db_insert")
+                if shadow_scorer is not None:
+                    shadow_scorer.submit_many([chunk[i] for i in scored], [results[i] for i in scored],
+                                              scores[scored], serving.version)
+                    timer.lap("shadow")
+                # Rows with invalid values are reported in place, with their offset in the upload
+                lines = "".join(
+                    ndjson_line(result if result is not None else {"error": errors[i], "offset": offset + i})
+                    for i, result in enumerate(results)
+                )
+                offset += len(chunk)
+                timer.lap("serialize")
+                yield lines
+        except Exception as e:
+            yield ndjson_line({"error": str(e), "offset": offset})
+        for e in read_errors:
+            yield ndjson_line({"error": str(e), "offset": offset})
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+# Paginated transaction query API
+@app.route("/transactions", methods=["GET"])
+def list_transactions():
+    # Filters: start, end, is_fraud, fraud_source, min_score; paging: limit, cursor
+    try:
+        query = TransactionQuery.from_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return Response(stream_with_context(query.stream(fraud_db)), mimetype="application/json")
+
+# Micro-batching metrics
+@app.route("/micro_batch/metrics", methods=["GET"])
+def micro_batch_metrics():
+    if micro_batcher is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(micro_batcher.metrics(), enabled=True))
+
+# Velocity feature store metrics
+@app.route("/velocity/metrics", methods=["GET"])
+def velocity_metrics():
+    if velocity_store is None:
+        return jsonify({"enabled": False})
+    return jsonify(dict(velocity_store.metrics(), enabled=True))
+
+# Shadow scoring metrics: live counters plus the shadow_scores table summarized per version pair
+@app.route("/shadow/metrics", methods=["GET"])
+def shadow_metrics():
+    if shadow_scorer is None:
+        return jsonify({"enabled": False})
+    with fraud_db.connection() as conn:
+        summary = shadow_summary(conn)
+    return jsonify(dict(shadow_scorer.metrics(), enabled=True, summary=summary))
+
+# Serving model version, reload progress and the registry's published versions
+@app.route("/admin/model", methods=["GET"])
+def model_status():
+    return jsonify(model_holder.status())
+
+# Load and warm the registry's active version, or {"version": ...}, in the background
+@app.route("/admin/model/reload", methods=["POST"])
+def reload_model():
+    data = request.get_json(silent=True) or {}
+    try:
+        started = model_holder.reload(data.get("version"))
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    if not started:
+        return jsonify(dict(model_holder.status(), error="A model reload is already running")), 409
+    return jsonify(model_holder.status()), 202
+
+# Run the Flask app, or uvicorn with FRAUD_SERVER=asgi
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    if asgi_enabled():
+        serve(asgi_app, port=5001)
+    else:
+        app.run(debug=True, port=5001)
@@ -0,0 +1,438 @@
+"""Benchmark /detect_fraud, /detect_fraud_batch and /fraud_report latency and throughput.
+
+    python bench_services.py
+    python bench_services.py --concurrency 1 4 16 --batch-sizes 10 100 1000 --output run.json
+    python bench_services.py --http http://localhost:5001 --report-http http://localhost:5002 --server-pid 4242
+    python bench_services.py --output current.json --compare baseline.json
+
+Requests are built from synthetic rows shaped like transactions_train.csv,
+with categories drawn from the trained label encoders, and converted to
+request bodies the same way bulk_score.py reads that file. By default the
+services are imported and driven in-process through the Flask test client,
+working on copies of the databases in a temporary directory so the real
+ones are never written. With --http (and --report-http) a running server
+is driven over HTTP instead. Each run reports p50/p95/p99 latency,
+requests and rows per second, errors and peak RSS; --output saves the
+results as JSON and --compare flags runs that got slower, or failed more
+requests, than a saved baseline. A response is an error when its status
+is 400 or above or its JSON body has an "error" key, as the scoring
+handlers answer failures with status 200.
+"""
+import argparse
+import http.client
+import importlib
+import itertools
+import json
+import os
+import pickle
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from bulk_score import prepare_chunk
+from model_store import ARTIFACTS_DIR, read_manifest
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SCENARIOS = ["detect_fraud", "detect_fraud_batch", "fraud_report", "fraud_report_batch"]
+
+# Scenarios sent to the fraud reporting service rather than the scoring service
+REPORT_SCENARIOS = {"fraud_report", "fraud_report_batch"}
+
+ENDPOINTS = {
+    "detect_fraud": "/detect_fraud",
+    "detect_fraud_batch": "/detect_fraud_batch",
+    "fraud_report": "/fraud_report",
+    "fraud_report_batch": "/fraud_report/batch",
+}
+
+# Files the services read from their working directory
+MODEL_FILES = ["model_features.pkl", "fraud_model.pkl", "scaler.pkl", "label_encoders.pkl", ARTIFACTS_DIR]
+
+CHANNELS_FALLBACK = ["W", "M", "mobile", "WEB"]
+
+# Synthetic transactions generated per run, and distinct bodies per batch size
+SYNTHETIC_ROWS = 10000
+BATCH_BODIES = 16
+
+
+def category_values():
+    """The classes of each trained label encoder, used as the synthetic category values."""
+    manifest = read_manifest()
+    if manifest is not None:
+        return {
+            name: np.load(os.path.join(ARTIFACTS_DIR, f"encoder_{name}.npy"), allow_pickle=False)
+            for name in manifest["encoders"]
+        }
+    try:
+        with open("label_encoders.pkl", "rb") as f:
+            return {name: encoder.classes_ for name, encoder in pickle.load(f).items()}
+    except OSError:
+        return {"transaction_channel": np.array(CHANNELS_FALLBACK)}
+
+
+def synthetic_transactions(n, seed=0, fraud_rate=0.05, prefix="BENCH"):
+    """A DataFrame of `n` rows with the columns of transactions_train.csv."""
+    rng = np.random.default_rng(seed)
+    categories = category_values()
+
+    def draw(name, high):
+        if name not in categories:
+            return rng.integers(0, high, n)
+        values = rng.choice(categories[name], n)
+        # Integer-coded categories are numbers in the CSV (and in requests)
+        try:
+            return values.astype(np.int64)
+        except ValueError:
+            return values
+
+    return pd.DataFrame({
+        "transaction_amount": np.round(rng.lognormal(7.0, 1.5, n), 2),
+        "transaction_date": (pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, n), unit="s"))
+        .strftime("%Y-%m-%d %H:%M:%S"),
+        "transaction_channel": draw("transaction_channel", 4),
+        "transaction_id_anonymous": [f"{prefix}_{i}" for i in range(n)],
+        "payee_id_anonymous": rng.integers(0, 2000, n),
+        "payer_email_anonymous": [f"payer{i}@example.com" for i in rng.integers(0, 20000, n)],
+        "payee_ip_anonymous": rng.integers(0, 5000, n),
+        "payer_mobile_anonymous": rng.integers(0, 20000, n),
+        "transaction_payment_mode_anonymous": draw("transaction_payment_mode_anonymous", 12),
+        "payment_gateway_bank_anonymous": draw("payment_gateway_bank_anonymous", 40),
+        "payer_browser_anonymous": draw("payer_browser_anonymous", 3000),
+        "is_fraud": (rng.random(n) < fraud_rate).astype(int),
+    })
+
+
+def request_transactions(df):
+    """Request bodies for /detect_fraud, as bulk_score.py derives them from the training columns."""
+    df = prepare_chunk(df.drop(columns=["is_fraud"]))
+    return json.loads(df.to_json(orient="records"))
+
+
+def report_bodies(transaction_ids):
+    return [
+        {"transaction_id": transaction_id, "reporting_entity_id": "BANK_BENCH", "fraud_details": "Chargeback"}
+        for transaction_id in transaction_ids
+    ]
+
+
+class InProcessClient:
+    """Posts to a Flask app through one test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, path, body, content_type="application/json"):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(path, data=body, content_type=content_type)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+
+class HttpClient:
+    """Posts to a running server over one keep-alive connection per thread."""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def post(self, path, body, content_type="application/json"):
+        for attempt in range(2):
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                conn.request("POST", self.prefix + path, body=body, headers={"Content-Type": content_type})
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def peak_rss_mb(pid=None):
+    """Peak resident set size of this process, or of `pid` when given (Linux only); None if unknown."""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024.0, 1)
+        except OSError:
+            return None
+        return None
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def is_error(status, body):
+    """Whether a response failed: an error status, or a JSON object with an "error" key."""
+    if status is None or status >= 400:
+        return True
+    # Only bodies that mention "error" are parsed, so large batch responses stay cheap to check
+    if b'"error"' not in body:
+        return False
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and "error" in data
+
+
+def run_load(client, path, make_body, n_requests, concurrency, warmup=0):
+    """Send `n_requests` bodies from make_body(i) with `concurrency` threads.
+
+    Returns per-request latencies in seconds, the error count and the wall
+    time. Building a body is not part of its latency.
+    """
+    for i in range(warmup):
+        client.post(path, make_body(i))
+    latencies = [0.0] * n_requests
+    errors = [0]
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= n_requests:
+                return
+            body = make_body(warmup + i)
+            started = time.perf_counter()
+            try:
+                status, response = client.post(path, body)
+            except Exception:
+                status, response = None, b""
+            latencies[i] = time.perf_counter() - started
+            if is_error(status, response):
+                with lock:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), errors[0], time.perf_counter() - started
+
+
+def summarize(scenario, batch_size, concurrency, latencies, errors, seconds, rss_mb):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000.0 if len(latencies) else (0.0, 0.0, 0.0)
+    return {
+        "scenario": scenario,
+        "endpoint": ENDPOINTS[scenario],
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds > 0 else 0.0,
+        "rows_per_second": round(len(latencies) * batch_size / seconds, 1) if seconds > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3),
+            "mean": round(float(latencies.mean() * 1000.0), 3) if len(latencies) else 0.0,
+            "max": round(float(latencies.max() * 1000.0), 3) if len(latencies) else 0.0,
+        },
+        "peak_rss_mb": rss_mb,
+    }
+
+
+def body_factory(scenario, transactions, batch_size, report_ids):
+    """make_body(i) for a scenario.
+
+    Scoring requests cycle through a fixed set of serialized bodies. Report
+    bodies are built on demand with ids from `report_ids`, so every report
+    is new and none is rejected as a duplicate.
+    """
+    if scenario == "detect_fraud":
+        bodies = [json.dumps(t).encode() for t in transactions]
+    elif scenario == "detect_fraud_batch":
+        rows = itertools.cycle(transactions)
+        bodies = [json.dumps({"transactions": list(itertools.islice(rows, batch_size))}).encode()
+                  for _ in range(BATCH_BODIES)]
+    else:
+        def make_report(i):
+            reports = report_bodies(next(report_ids) for _ in range(batch_size))
+            return json.dumps(reports if scenario == "fraud_report_batch" else reports[0]).encode()
+        return make_report
+    return lambda i: bodies[i % len(bodies)]
+
+
+def isolated_workspace():
+    """A temporary working directory with copies of the databases and links to the model files."""
+    source = os.path.dirname(os.path.abspath(__file__))
+    workspace = tempfile.mkdtemp(prefix="fraud-bench-")
+    for name in ("rules.db", "fraud_detection.db"):
+        if os.path.exists(os.path.join(source, name)):
+            shutil.copy2(os.path.join(source, name), workspace)
+    for name in MODEL_FILES + ["index.html"]:
+        path = os.path.join(source, name)
+        if os.path.exists(path):
+            try:
+                os.symlink(path, os.path.join(workspace, name))
+            except OSError:
+                copy = shutil.copytree if os.path.isdir(path) else shutil.copy2
+                copy(path, os.path.join(workspace, name))
+    return workspace
+
+
+def run_meta(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "mode": "http" if args.http else "in-process",
+        "target": args.http or args.app,
+        "report_target": args.report_http or ("fraud_report_api" if not args.http else None),
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "env": {key: value for key, value in os.environ.items() if key.startswith("FRAUD_")},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against a baseline run; return the runs whose p95, throughput or errors regressed."""
+    def key(run):
+        return run["scenario"], run["batch_size"], run["concurrency"]
+
+    previous = {key(run): run for run in baseline["results"]}
+    regressions = []
+    print(f"\n{'scenario':<20} {'batch':>6} {'conc':>5} {'p95 ms':>18} {'req/s':>20} {'errors':>14}")
+    for run in results:
+        old = previous.get(key(run))
+        if old is None:
+            continue
+        p95, old_p95 = run["latency_ms"]["p95"], old["latency_ms"]["p95"]
+        rps, old_rps = run["requests_per_second"], old["requests_per_second"]
+        errors, old_errors = run["errors"], old.get("errors", 0)
+        slower = old_p95 > 0 and p95 > old_p95 * (1 + tolerance)
+        lower = old_rps > 0 and rps < old_rps * (1 - tolerance)
+        flag = "  REGRESSION" if slower or lower or errors > old_errors else ""
+        if flag:
+            regressions.append(run)
+        print(f"{run['scenario']:<20} {run['batch_size']:>6} {run['concurrency']:>5} "
+              f"{old_p95:>8.2f} -> {p95:<8.2f} {old_rps:>9.1f} -> {rps:<9.1f} {old_errors:>5} -> {errors:<5}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4], help="Client threads per run")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[100, 1000],
+                        help="Rows per request for the batch scenarios")
+    parser.add_argument("--requests", type=int, default=500, help="Timed requests per run")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests sent before each run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--app", default="fraud_detection_api", choices=["fraud_detection_api", "Main"],
+                        help="Scoring service imported for in-process runs")
+    parser.add_argument("--http", help="Base URL of a running scoring service, e.g. http://localhost:5001")
+    parser.add_argument("--report-http", help="Base URL of a running fraud_report_api.py, e.g. http://localhost:5002")
+    parser.add_argument("--server-pid", type=int, help="Read peak RSS of the scoring server process (Linux)")
+    parser.add_argument("--report-server-pid", type=int, help="Read peak RSS of the reporting server process (Linux)")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output run")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed p95 increase or throughput drop against --compare (default 10%%); "
+                             "any increase in errors is a regression")
+    args = parser.parse_args()
+
+    run_id = time.strftime("%Y%m%d%H%M%S")
+    transactions = request_transactions(synthetic_transactions(SYNTHETIC_ROWS, args.seed, prefix=f"BENCH_{run_id}"))
+    report_ids = (f"BENCH_REPORT_{run_id}_{i}" for i in itertools.count())
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+
+    if args.http:
+        scoring = HttpClient(args.http)
+        reporting = HttpClient(args.report_http) if args.report_http else None
+    else:
+        workspace = isolated_workspace()
+        print(f"In-process run in {workspace}")
+        os.chdir(workspace)
+        service = importlib.import_module(args.app)
+        scoring = InProcessClient(service.app)
+        reporting = InProcessClient(importlib.import_module("fraud_report_api").app)
+
+    results = []
+    print(f"{'scenario':<20} {'batch':>6} {'conc':>5} {'req/s':>9} {'rows/s':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6} {'RSS MB':>7}")
+    for scenario in args.scenarios:
+        client = reporting if scenario in REPORT_SCENARIOS else scoring
+        if client is None:
+            print(f"{scenario:<20} skipped: pass --report-http to benchmark the reporting service")
+            continue
+        batch_sizes = args.batch_sizes if scenario.endswith("_batch") else [1]
+        for batch_size, concurrency in itertools.product(batch_sizes, args.concurrency):
+            make_body = body_factory(scenario, transactions, batch_size, report_ids)
+            latencies, errors, seconds = run_load(
+                client, ENDPOINTS[scenario], make_body, args.requests, concurrency, args.warmup
+            )
+            if not args.http:
+                rss = peak_rss_mb()
+            else:
+                pid = args.report_server_pid if scenario in REPORT_SCENARIOS else args.server_pid
+                rss = peak_rss_mb(pid) if pid else None
+            run = summarize(scenario, batch_size, concurrency, latencies, errors, seconds, rss)
+            results.append(run)
+            latency = run["latency_ms"]
+            print(f"{scenario:<20} {batch_size:>6} {concurrency:>5} {run['requests_per_second']:>9.1f} "
+                  f"{run['rows_per_second']:>10.1f} {latency['p50']:>8.2f} {latency['p95']:>8.2f} "
+                  f"{latency['p99']:>8.2f} {errors:>6} {run['peak_rss_mb'] or '-':>7}")
+
+    if not args.http:
+        # Let the background writer finish, then drop the scratch databases
+        service.transaction_writer.flush()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"meta": run_meta(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} run(s) regressed: p95 or throughput more than {args.tolerance:.0%} worse, "
+                  f"or more errors")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
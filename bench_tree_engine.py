@@ -0,0 +1,56 @@
+"""Compare sklearn and compiled predict_proba latency on fraud_model.pkl.
+
+    python bench_tree_engine.py [--repeat N]
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from tree_engine import TOLERANCE, CompiledForest
+
+BATCH_SIZES = [1, 64, 10000]
+
+
+def time_call(fn, X, repeat):
+    fn(X)  # warm up
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - started)
+    return np.median(timings) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="fraud_model.pkl")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    # Always use the compiled walk here, whatever the batch size
+    forest = CompiledForest.from_sklearn(model)
+    print(f"Verification max abs diff: {forest.verify(model):.3g} (tolerance {TOLERANCE:g})")
+
+    rng = np.random.default_rng(0)
+    # Inputs on the preprocessed scale: standardized numericals, small category codes
+    X = np.column_stack([
+        rng.normal(size=max(BATCH_SIZES)),
+        rng.integers(-1, 10, size=(max(BATCH_SIZES), 4)),
+        rng.normal(size=(max(BATCH_SIZES), 3)),
+    ])
+
+    print(f"{'rows':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8} {'max diff':>9}")
+    for n in BATCH_SIZES:
+        batch = X[:n]
+        sk = time_call(model.predict_proba, batch, args.repeat)
+        compiled = time_call(forest.predict_proba, batch, args.repeat)
+        diff = np.abs(forest.predict_proba(batch) - model.predict_proba(batch)).max()
+        print(f"{n:>6} {sk:>11.3f} {compiled:>12.3f} {sk / compiled:>7.1f}x {diff:>9.2g}")
+
+
+if __name__ == "__main__":
+    main()
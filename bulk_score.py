@@ -0,0 +1,243 @@
+"""Score a large CSV or NDJSON file offline with the /detect_fraud rules and model.
+
+    python bulk_score.py transactions_train.csv scored.csv
+    python bulk_score.py history.ndjson scored.parquet --workers 8 --chunk-rows 20000
+    python bulk_score.py history.csv scored.csv --version 20250321-101500-1a2b3c4d
+
+The input is read in chunks that are scored across a process pool. Each
+worker loads the rules and the model once. The model is the one the
+services serve: the model registry's active version (or --version), or
+the working-directory .pkl files when nothing is published, loaded from
+its memory-mapped export so workers share its pages. Output rows stay in
+input order. A row with invalid field values does not stop the run: its
+output row carries the message in the `error` column, and the summary
+lists it by offset (0-based data row in the file). Files shaped like
+transactions_train.csv are accepted as-is: hour, day and month are
+derived from transaction_date and transaction_id_anonymous is used as
+the transaction id. When the rules or the model use velocity features,
+they are replayed in the main process from transaction_date, in file
+order, before chunks are handed out.
+"""
+import argparse
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pool
+
+import pandas as pd
+
+from db import RULES_DB
+from model_registry import current_version, load_version
+from rule_cache import RuleCache
+from scoring import score_valid_transactions
+from velocity_store import VELOCITY_FEATURES, VelocityStore, replay_features
+
+RESULT_COLUMNS = ["transaction_id", "is_fraud", "fraud_source", "fraud_reason", "fraud_score", "error"]
+
+# Invalid rows listed individually in the summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Set in each worker by _init_worker
+_worker = {}
+
+
+def _init_worker(rules_db, version):
+    _use_model(load_version(version), rules_db)
+
+
+def _use_model(serving, rules_db):
+    _worker.update(
+        feature_extractor=serving.feature_extractor,
+        model=serving.model,
+        preprocessor=serving.preprocessor,
+        rules=RuleCache(rules_db).get_rules(),
+    )
+
+
+def prepare_chunk(df):
+    """Fill in the request fields /detect_fraud expects from a training-shaped frame."""
+    if "transaction_id" not in df.columns and "transaction_id_anonymous" in df.columns:
+        df = df.rename(columns={"transaction_id_anonymous": "transaction_id"})
+    if "transaction_date" in df.columns:
+        dates = pd.to_datetime(df["transaction_date"], errors="coerce")
+        for field, values in (("transaction_hour", dates.dt.hour),
+                              ("transaction_day", dates.dt.day),
+                              ("transaction_month", dates.dt.month)):
+            if field not in df.columns:
+                df[field] = values
+    return df
+
+
+def uses_velocity(rules_db, feature_names):
+    """True if the model features or any active rule reference a velocity feature."""
+    conditions = [rule.condition for rule in RuleCache(rules_db).get_rules()]
+    return any(name in feature_names or any(name in c for c in conditions) for name in VELOCITY_FEATURES)
+
+
+def add_velocity(df, store):
+    df = prepare_chunk(df)
+    if "transaction_date" in df.columns:
+        dates = pd.to_datetime(df["transaction_date"], errors="coerce")
+        seconds = (dates - pd.Timestamp(0)).dt.total_seconds().fillna(time.time()).tolist()
+    else:
+        seconds = [time.time()] * len(df)
+    records = df.to_dict("records")
+    velocity = pd.DataFrame(replay_features(records, seconds, store), index=df.index, columns=VELOCITY_FEATURES)
+    return df.drop(columns=[c for c in VELOCITY_FEATURES if c in df.columns]).join(velocity)
+
+
+def _score_chunk(df):
+    df = prepare_chunk(df)
+    transactions = df.to_dict("records")
+    results, _, errors = score_valid_transactions(
+        transactions,
+        _worker["rules"],
+        _worker["feature_extractor"],
+        _worker["preprocessor"],
+        _worker["model"],
+    )
+    for i, message in errors.items():
+        results[i] = {"transaction_id": transactions[i].get("transaction_id"), "error": message}
+    # The chunk's index holds each row's offset in the input file
+    return pd.DataFrame(results, columns=RESULT_COLUMNS, index=df.index)
+
+
+def read_chunks(path, chunk_rows):
+    if path.endswith((".ndjson", ".jsonl")):
+        return pd.read_json(path, lines=True, chunksize=chunk_rows)
+    return pd.read_csv(path, chunksize=chunk_rows)
+
+
+class CsvOutput:
+    def __init__(self, path):
+        self.path = path
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            pd.DataFrame(columns=RESULT_COLUMNS).to_csv(self.path, index=False)
+
+
+class ParquetOutput:
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow), or write a .csv file")
+        self.pa = pyarrow
+        self.schema = pyarrow.schema([
+            ("transaction_id", pyarrow.string()),
+            ("is_fraud", pyarrow.bool_()),
+            ("fraud_source", pyarrow.string()),
+            ("fraud_reason", pyarrow.string()),
+            ("fraud_score", pyarrow.float64()),
+            ("error", pyarrow.string()),
+        ])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write(self, df):
+        df = df.assign(transaction_id=df["transaction_id"].astype(str))
+        self.writer.write_table(self.pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+def open_output(path):
+    if path.endswith(".parquet"):
+        return ParquetOutput(path)
+    return CsvOutput(path)
+
+
+def bulk_score(input_path, output_path, workers=None, chunk_rows=10000, rules_db=RULES_DB, version=None):
+    """Score `input_path` into `output_path` and return a summary dict.
+
+    `version` names a model registry version; by default the active one is
+    used, like the services do.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Resolve the active version once, so every worker scores with the same model
+    version = version or current_version()
+    serving = load_version(version)
+    output = open_output(output_path)
+    summary = {"rows": 0, "fraudulent": 0, "rule_flagged": 0, "model_scored": 0, "invalid_rows": 0, "chunks": 0,
+               "errors": []}
+
+    def write(results):
+        output.write(results)
+        invalid = results["error"].notna()
+        summary["rows"] += len(results)
+        summary["fraudulent"] += int(results["is_fraud"].eq(True).sum())
+        summary["rule_flagged"] += int((results["fraud_source"] == "rule").sum())
+        summary["model_scored"] += int((results["fraud_source"] == "model").sum())
+        summary["invalid_rows"] += int(invalid.sum())
+        for offset, message in results.loc[invalid, "error"].items():
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"offset": int(offset), "error": message})
+        summary["chunks"] += 1
+
+    uses = uses_velocity(rules_db, serving.feature_extractor.feature_names)
+    velocity = VelocityStore(max_keys=None) if uses else None
+
+    def chunks():
+        for df in read_chunks(input_path, chunk_rows):
+            yield df if velocity is None else add_velocity(df, velocity)
+
+    started = time.perf_counter()
+    try:
+        if workers == 1:
+            _use_model(serving, rules_db)
+            for df in chunks():
+                write(_score_chunk(df))
+        else:
+            with Pool(workers, initializer=_init_worker, initargs=(rules_db, version)) as pool:
+                # Keep only a few chunks in flight so memory stays bounded for huge inputs
+                in_flight = deque()
+                for df in chunks():
+                    in_flight.append(pool.apply_async(_score_chunk, (df,)))
+                    if len(in_flight) >= 2 * workers:
+                        write(in_flight.popleft().get())
+                while in_flight:
+                    write(in_flight.popleft().get())
+    finally:
+        output.close()
+    elapsed = time.perf_counter() - started
+
+    summary.update(
+        input=input_path,
+        output=output_path,
+        model_version=serving.version,
+        workers=workers,
+        chunk_rows=chunk_rows,
+        seconds=round(elapsed, 3),
+        rows_per_second=round(summary["rows"] / elapsed, 1) if elapsed > 0 else 0.0,
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV file, or NDJSON with a .ndjson/.jsonl extension")
+    parser.add_argument("output", help="Output .csv or .parquet file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-rows", type=int, default=10000, help="Rows scored per task")
+    parser.add_argument("--rules-db", default=RULES_DB)
+    parser.add_argument("--version", help="Model registry version to score with (default: the active one)")
+    parser.add_argument("--summary", help="Also write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    summary = bulk_score(args.input, args.output, args.workers, args.chunk_rows, args.rules_db, args.version)
+    print(json.dumps(summary, indent=2))
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
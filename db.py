@@ -0,0 +1,75 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+FRAUD_DB = "fraud_detection.db"
+RULES_DB = "rules.db"
+
+# Applied to every pooled connection. WAL lets readers proceed while a writer
+# commits; synchronous=NORMAL is durable in WAL mode except on power loss.
+PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # 16 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+]
+
+
+class ConnectionPool:
+    """A small pool of persistent SQLite connections to one database file.
+
+    Connections stay open between requests, so the pragmas above are applied
+    once and each connection's prepared-statement cache (`cached_statements`)
+    is reused across requests.
+    """
+
+    def __init__(self, path, size=8, timeout=10, cached_statements=256):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; uncommitted changes are rolled back when it is returned."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path):
+    """Return the process-wide connection pool for a database file."""
+    with _pools_lock:
+        if path not in _pools:
+            _pools[path] = ConnectionPool(path)
+        return _pools[path]
@@ -0,0 +1,75 @@
+"""JSON encoding for the services, backed by orjson when it is installed.
+
+orjson is optional: without it every function here falls back to the
+standard library and produces the same JSON.
+"""
+import json
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_OPTIONS = 0 if orjson is None else orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Compact JSON text for `obj`, keys in insertion order."""
+    if orjson is None:
+        return json.dumps(obj, separators=(",", ":"), default=_default)
+    return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+
+def loads(text):
+    """Parse JSON text or UTF-8 bytes."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # NaN and Infinity literals, which only the standard library accepts; it
+            # also raises the usual error for text that is not JSON at all
+            pass
+    return json.loads(text)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and parses with orjson when it is installed.
+
+    Responses keep Flask's sorted keys and compact separators. Debug mode
+    (indented output) and calls with json.dumps keyword arguments use the
+    default provider.
+    """
+
+    def _encode(self, obj):
+        option = _OPTIONS | (orjson.OPT_SORT_KEYS if self.sort_keys else 0)
+        return orjson.dumps(obj, default=self._fallback, option=option)
+
+    def _fallback(self, value):
+        if isinstance(value, np.generic):
+            return value.item()
+        return self.default(value)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
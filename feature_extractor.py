@@ -0,0 +1,180 @@
+import pickle
+import threading
+
+import numpy as np
+
+from velocity_store import VELOCITY_AMOUNT_FEATURES
+
+# Canonical model input order; train_fraud_model.py writes it to model_features.pkl
+MODEL_FEATURES = [
+    "transaction_amount",
+    "transaction_channel",
+    "transaction_payment_mode_anonymous",
+    "payment_gateway_bank_anonymous",
+    "payer_browser_anonymous",
+    "transaction_hour",
+    "transaction_day",
+    "transaction_month",
+]
+
+# Features kept as floats; every other feature is truncated toward zero like int() does
+FLOAT_FEATURES = {"transaction_amount"} | VELOCITY_AMOUNT_FEATURES
+
+# Channel encoding seen by the rules and the request-level feature vector
+CHANNEL_MAPPING = {"online": 0, "mobile": 1, "pos": 2}
+
+# Integers beyond this magnitude are not exact as float64
+_EXACT_INT = 2 ** 53
+
+
+class FeatureError(ValueError):
+    """Raised when transaction fields cannot be converted to model features."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        shown = ", ".join(f"row {row} {field}={value!r}" for row, field, value in errors[:5])
+        more = f" (+{len(errors) - 5} more)" if len(errors) > 5 else ""
+        super().__init__(f"Invalid feature values: {shown}{more}")
+
+    def by_row(self):
+        """Map each failing row to a message naming all of its invalid fields."""
+        fields = {}
+        for row, field, value in self.errors:
+            fields.setdefault(row, []).append(f"{field}={value!r}")
+        return {row: "Invalid feature values: " + ", ".join(shown) for row, shown in fields.items()}
+
+
+def convert_column(raw, out):
+    """Convert one field's raw values into the float64 array `out`.
+
+    Missing (None) and NaN values become 0. Returns `(numeric, bad)`:
+    `numeric` marks the cells holding a number (int, float or bool, not
+    NaN) that float64 represents exactly, i.e. the cells a vectorized rule
+    mask decides the same way eval() would; numeric strings are converted
+    but not marked. `bad` lists the indices of values float() rejects,
+    which are set to 0.
+    """
+    values = np.array(raw) if len(raw) else np.empty(0)
+    if values.ndim == 1 and values.dtype.kind in "biuf":
+        # Every value is a number: convert the column in one step
+        out[:] = values
+        numeric = ~np.isnan(out)
+        out[~numeric] = 0.0
+        if values.dtype.kind in "iu":
+            numeric &= (values <= _EXACT_INT) & (values >= -_EXACT_INT)
+        return numeric, []
+
+    numeric = np.zeros(len(raw), dtype=bool)
+    bad = []
+    for i, value in enumerate(raw):
+        try:
+            number = np.nan if value is None else float(value)
+        except (TypeError, ValueError, OverflowError):
+            bad.append(i)
+            number = np.nan
+        if number != number:
+            out[i] = 0.0
+            continue
+        out[i] = number
+        numeric[i] = isinstance(value, float) or (isinstance(value, int) and -_EXACT_INT <= value <= _EXACT_INT)
+    return numeric, bad
+
+
+def save_feature_names(path="model_features.pkl", feature_names=MODEL_FEATURES):
+    with open(path, "wb") as f:
+        pickle.dump(list(feature_names), f)
+
+
+class FeatureExtractor:
+    """Turn transaction dicts into model feature rows in a fixed column order.
+
+    Missing fields default to 0 (transaction_channel to -1, as an unknown
+    channel). Inputs are never modified; rule_namespace() returns the encoded
+    view that rule conditions are evaluated against.
+    """
+
+    def __init__(self, feature_names=MODEL_FEATURES):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self._integer = np.array([name not in FLOAT_FEATURES for name in self.feature_names])
+        self._local = threading.local()
+
+    @classmethod
+    def from_file(cls, path="model_features.pkl"):
+        with open(path, "rb") as f:
+            return cls(pickle.load(f))
+
+    def check_model(self, model):
+        """Fail fast if the model was trained with a different feature order."""
+        trained = getattr(model, "feature_names_in_", None)
+        if trained is not None and list(trained) != self.feature_names:
+            raise ValueError(f"Model features {list(trained)} do not match {self.feature_names}")
+
+    def select(self, df):
+        """Return the training frame's feature columns in model order."""
+        return df[self.feature_names]
+
+    def _raw_value(self, data, name):
+        if name == "transaction_channel":
+            return CHANNEL_MAPPING.get(data.get(name, 0), -1)
+        return data.get(name)
+
+    def rule_namespace(self, data):
+        """A copy of the transaction with categorical fields encoded for rule evaluation."""
+        namespace = dict(data)
+        if "transaction_channel" in self.feature_names:
+            namespace["transaction_channel"] = self._raw_value(data, "transaction_channel")
+        return namespace
+
+    def extract_one(self, data):
+        """Fill and return this thread's preallocated 1 x n feature buffer.
+
+        The buffer is reused by the next call on the same thread; copy it if
+        it has to outlive the request.
+        """
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.empty((1, self.n_features), dtype=np.float64)
+        errors = []
+        row = buf[0]
+        for j, name in enumerate(self.feature_names):
+            value = self._raw_value(data, name)
+            try:
+                row[j] = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                errors.append((0, name, value))
+        if errors:
+            raise FeatureError(errors)
+        row[np.isnan(row)] = 0.0
+        np.trunc(row, out=row, where=self._integer)
+        return buf
+
+    def extract_batch(self, transactions, out=None, truncate=True):
+        """Convert transactions into an n x k float64 matrix and a numeric-cell mask.
+
+        Columns are converted one at a time straight into `out` (allocated if
+        not given). Integer features are truncated toward zero like int()
+        unless `truncate` is false, which keeps the raw values for rule
+        evaluation (see truncate()). The mask marks the cells rule masks can
+        decide (see convert_column). Every invalid cell is collected and
+        reported in one FeatureError.
+        """
+        n = len(transactions)
+        features = out if out is not None else np.empty((n, self.n_features), dtype=np.float64)
+        numeric = np.empty((n, self.n_features), dtype=bool)
+        errors = []
+        for j, name in enumerate(self.feature_names):
+            raw = [self._raw_value(data, name) for data in transactions]
+            numeric[:, j], bad = convert_column(raw, features[:, j])
+            errors.extend((i, name, raw[i]) for i in bad)
+        if errors:
+            errors.sort()
+            raise FeatureError(errors)
+        if truncate:
+            self.truncate(features)
+        return features, numeric
+
+    def truncate(self, features):
+        """Truncate the integer features of an n x k matrix toward zero, in place."""
+        np.trunc(features, out=features, where=self._integer)
+        return features
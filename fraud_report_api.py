@@ -1,7 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+import io
 import sqlite3
 import logging
+from collections import Counter
 from datetime import datetime
+from db import get_pool, FRAUD_DB
+from fraud_reports import ACCEPTED, ALREADY_REPORTED, MAX_BATCH_SIZE, submit_reports
+from fraud_stats import ensure_fraud_stats, fraud_buckets, fraud_totals, summarize_totals
+from metrics import current_timer, instrument, metrics_from_env
+from stream_ingest import NDJSON_MIMETYPE, read_ndjson
+from fast_json import FastJSONProvider, dumps
+from asgi_server import asgi_app_from_env, asgi_enabled, serve
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -9,34 +18,50 @@ logger = logging.getLogger("fraud_reporting_api")
 
 # Initialize Flask app
 app = Flask(__name__)
+# orjson-backed jsonify and request.json when orjson is installed
+app.json = FastJSONProvider(app)
 
-# Database connection function
-def get_db_connection():
-    return sqlite3.connect("fraud_detection.db", check_same_thread=False, timeout=10)
+# Pooled WAL-mode connections to the fraud database
+fraud_db = get_pool(FRAUD_DB)
+
+# Set once the fraud_stats summary table exists (it needs the transactions table)
+stats_ready = False
+
+# Request and stage latency histograms plus report outcome counters at /metrics
+service_metrics = metrics_from_env()
+instrument(app, service_metrics)
+
+# ASGI entry point (FRAUD_SERVER=asgi, or uvicorn fraud_report_api:asgi_app): the event
+# loop holds the connections and a bounded thread pool runs the handlers
+asgi_app = asgi_app_from_env(app)
+service_metrics.add_collector("fraud_asgi", asgi_app.metrics)
 
 # Ensure fraud reporting table exists
 def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS fraud_reporting (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_id TEXT UNIQUE,
-            reporting_entity_id TEXT,
-            fraud_details TEXT,
-            is_fraud_reported INTEGER DEFAULT 1,
-            report_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    conn.commit()
-    conn.close()
+    global stats_ready
+    with fraud_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fraud_reporting (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                transaction_id TEXT UNIQUE,
+                reporting_entity_id TEXT,
+                fraud_details TEXT,
+                is_fraud_reported INTEGER DEFAULT 1,
+                report_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        stats_ready = ensure_fraud_stats(conn)
     logger.info("✅ Fraud reporting database initialized successfully")
 
 # Fraud Reporting API
 @app.route("/fraud_report", methods=["POST"])
 def fraud_report():
+    timer = current_timer()
     try:
         data = request.json
+        timer.lap("json_parse")
         if not data or "transaction_id" not in data or "reporting_entity_id" not in data or "fraud_details" not in data:
             return jsonify({"error": "Missing required fields: transaction_id, reporting_entity_id, fraud_details"}), 400
 
@@ -44,16 +69,17 @@ def fraud_report():
         reporting_entity_id = data["reporting_entity_id"]
         fraud_details = data["fraud_details"]
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with fraud_db.connection() as conn:
+            cursor = conn.cursor()
 
-        # Insert report into database
-        cursor.execute("""
-            INSERT INTO fraud_reporting (transaction_id, reporting_entity_id, fraud_details)
-            VALUES (?, ?, ?)
-        """, (transaction_id, reporting_entity_id, fraud_details))
-        conn.commit()
-        conn.close()
+            # Insert report into database
+            cursor.execute("""
+                INSERT INTO fraud_reporting (transaction_id, reporting_entity_id, fraud_details)
+                VALUES (?, ?, ?)
+            """, (transaction_id, reporting_entity_id, fraud_details))
+            conn.commit()
+        timer.lap("db_insert")
+        service_metrics.inc("fraud_reports_total", failure_code=ACCEPTED)
         logger.info(f"✅ Fraud report recorded for transaction {transaction_id}")
 
         return jsonify({
@@ -62,6 +88,7 @@ def fraud_report():
             "failure_code": 0
         })
     except sqlite3.IntegrityError:
+        service_metrics.inc("fraud_reports_total", failure_code=ALREADY_REPORTED)
         return jsonify({
             "transaction_id": transaction_id,
             "reporting_acknowledged": False,
@@ -72,9 +99,73 @@ def fraud_report():
         logger.error(f"❌ Error in fraud_report API: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+# Bulk fraud reporting: a JSON array (or {"reports": [...]}) or an NDJSON stream, written in one transaction
+@app.route("/fraud_report/batch", methods=["POST"])
+def fraud_report_batch():
+    timer = current_timer()
+    try:
+        if NDJSON_MIMETYPE in (request.content_type or ""):
+            # The whole batch is written at once, so read the body in one go rather than line by line
+            reports = list(read_ndjson(io.BytesIO(request.get_data())))
+        else:
+            reports = request.get_json(silent=True)
+            if isinstance(reports, dict):
+                reports = reports.get("reports")
+        if not isinstance(reports, list):
+            return jsonify({"error": "Expected a JSON array of reports, {\"reports\": [...]} or NDJSON"}), 400
+        if len(reports) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"At most {MAX_BATCH_SIZE} reports per batch"}), 413
+        timer.lap("json_parse")
+
+        results = submit_reports(fraud_db, reports)
+        timer.lap("db_insert")
+        failure_codes = Counter(result["failure_code"] for result in results)
+        for code, count in failure_codes.items():
+            service_metrics.inc("fraud_reports_total", count, failure_code=code)
+        acknowledged = failure_codes[ACCEPTED]
+        logger.info(f"✅ Fraud report batch: {acknowledged} of {len(results)} acknowledged")
+
+        # Serialized without jsonify's key sorting, which dominates for large batches
+        body = {"acknowledged": acknowledged, "failed": len(results) - acknowledged, "results": results}
+        response = Response(dumps(body), mimetype="application/json")
+        timer.lap("serialize")
+        return response
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error in fraud_report batch API: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+# Fraud statistics: overall totals, plus ?bucket=minute|hour|day breakdowns by source and channel
+@app.route("/fraud_report", methods=["GET"])
+def fraud_statistics():
+    global stats_ready
+    timer = current_timer()
+    try:
+        with fraud_db.connection() as conn:
+            if not stats_ready:
+                stats_ready = ensure_fraud_stats(conn)
+            if not stats_ready:
+                return jsonify(summarize_totals())
+            report = fraud_totals(conn)
+            bucket = request.args.get("bucket")
+            if bucket:
+                report["bucket"] = bucket
+                report["buckets"] = fraud_buckets(conn, bucket, request.args.get("window", type=int))
+        timer.lap("db_query")
+        return jsonify(report)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error(f"❌ Error in fraud statistics API: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
 # Initialize database
 init_db()
 
-# Run the Flask app
+# Run the Flask app, or uvicorn with FRAUD_SERVER=asgi
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    if asgi_enabled():
+        serve(asgi_app, port=5002)
+    else:
+        app.run(debug=True, port=5002)
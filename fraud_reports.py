@@ -0,0 +1,98 @@
+import sqlite3
+
+REQUIRED_FIELDS = ("transaction_id", "reporting_entity_id", "fraud_details")
+
+# Per-report failure codes, matching POST /fraud_report where they overlap
+ACCEPTED = 0
+ALREADY_REPORTED = 1
+INVALID_REPORT = 2
+DUPLICATE_IN_BATCH = 3
+
+# Reports accepted in one batch request
+MAX_BATCH_SIZE = 50000
+
+# Bound on SQL variables per lookup query
+_LOOKUP_CHUNK = 900
+
+INSERT_REPORT_SQL = """
+    INSERT INTO fraud_reporting (transaction_id, reporting_entity_id, fraud_details)
+    VALUES (?, ?, ?)
+    ON CONFLICT(transaction_id) DO NOTHING
+"""
+
+
+def _ack(index, transaction_id, code, error=None, **extra):
+    ack = {
+        "index": index,
+        "transaction_id": transaction_id,
+        "reporting_acknowledged": code == ACCEPTED,
+        "failure_code": code,
+    }
+    if error:
+        ack["error"] = error
+    ack.update(extra)
+    return ack
+
+
+def _existing_reports(conn, transaction_ids):
+    existing = {}
+    ids = list(transaction_ids)
+    for start in range(0, len(ids), _LOOKUP_CHUNK):
+        chunk = ids[start:start + _LOOKUP_CHUNK]
+        placeholders = ",".join("?" * len(chunk))
+        for transaction_id, entity, details in conn.execute(
+            f"SELECT transaction_id, reporting_entity_id, fraud_details FROM fraud_reporting "
+            f"WHERE transaction_id IN ({placeholders})", chunk
+        ):
+            existing[transaction_id] = (entity, details)
+    return existing
+
+
+def submit_reports(pool, reports):
+    """Record a batch of fraud reports in one transaction; return one acknowledgement per report.
+
+    Reports are idempotent: re-sending a report identical to the stored one
+    is acknowledged again (with "already_recorded": true), while a different
+    report for an already reported transaction fails with ALREADY_REPORTED,
+    like POST /fraud_report. Invalid items fail individually without
+    affecting the rest of the batch.
+    """
+    results = [None] * len(reports)
+    valid = {}
+    for index, report in enumerate(reports):
+        if not isinstance(report, dict):
+            results[index] = _ack(index, None, INVALID_REPORT, "Report must be a JSON object")
+            continue
+        transaction_id = report.get("transaction_id")
+        missing = [field for field in REQUIRED_FIELDS if report.get(field) in (None, "")]
+        if missing:
+            results[index] = _ack(index, transaction_id, INVALID_REPORT, f"Missing required fields: {', '.join(missing)}")
+            continue
+        transaction_id = str(transaction_id)
+        if transaction_id in valid:
+            results[index] = _ack(index, transaction_id, DUPLICATE_IN_BATCH, "Transaction reported earlier in this batch")
+            continue
+        valid[transaction_id] = (index, str(report["reporting_entity_id"]), str(report["fraud_details"]))
+
+    with pool.connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = _existing_reports(conn, valid)
+            rows = []
+            for transaction_id, (index, entity, details) in valid.items():
+                if transaction_id in existing:
+                    if existing[transaction_id] == (entity, details):
+                        results[index] = _ack(index, transaction_id, ACCEPTED, already_recorded=True)
+                    else:
+                        results[index] = _ack(index, transaction_id, ALREADY_REPORTED, "Transaction already reported")
+                    continue
+                rows.append((transaction_id, entity, details))
+                results[index] = _ack(index, transaction_id, ACCEPTED)
+            # Inserting in key order keeps the transaction_id index writes sequential
+            rows.sort()
+            conn.executemany(INSERT_REPORT_SQL, rows)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return results
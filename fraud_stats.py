@@ -0,0 +1,200 @@
+import sqlite3
+
+# Bucket sizes kept in fraud_stats, with the strftime format of each bucket's
+# start. The "all" bucket holds running totals since the table was created.
+BUCKETS = {
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+    "all": None,
+}
+
+# Buckets returned by default for each size
+DEFAULT_WINDOWS = {"minute": 60, "hour": 24, "day": 30}
+
+# Buckets of each size kept, counting back from the current one (7 days of
+# minutes, 90 days of hours, about 10 years of days). Older buckets are
+# deleted as transactions arrive; the "all" buckets are kept forever.
+# This is also the largest window one request may ask for.
+RETENTION = {"minute": 7 * 24 * 60, "hour": 90 * 24, "day": 3660}
+
+_WINDOW_MODIFIERS = {"minute": "minutes", "hour": "hours", "day": "days"}
+
+STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS fraud_stats (
+        bucket_size TEXT NOT NULL,
+        bucket_start TEXT NOT NULL,
+        fraud_source TEXT NOT NULL,
+        transaction_channel TEXT NOT NULL,
+        transactions INTEGER NOT NULL DEFAULT 0,
+        fraudulent INTEGER NOT NULL DEFAULT 0,
+        fraud_amount REAL NOT NULL DEFAULT 0,
+        score_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket_size, bucket_start, fraud_source, transaction_channel)
+    ) WITHOUT ROWID
+"""
+
+
+def _bucket_start(size, row):
+    fmt = BUCKETS[size]
+    if fmt is None:
+        return "''"
+    return f"COALESCE(strftime('{fmt}', {row}.transaction_date), '')"
+
+
+def _oldest_kept(size):
+    # Start of the oldest bucket of `size` within RETENTION
+    return f"strftime('{BUCKETS[size]}', 'now', '-{RETENTION[size] - 1} {_WINDOW_MODIFIERS[size]}')"
+
+
+def _apply_row(row, sign):
+    """Statements adding (sign '+') or removing (sign '-') one transactions row."""
+    statements = []
+    for size in BUCKETS:
+        statements.append(f"""
+            INSERT INTO fraud_stats (bucket_size, bucket_start, fraud_source, transaction_channel,
+                                     transactions, fraudulent, fraud_amount, score_sum)
+            VALUES ('{size}', {_bucket_start(size, row)},
+                    COALESCE({row}.fraud_source, 'unknown'), COALESCE({row}.transaction_channel, 'unknown'),
+                    {sign}1, {sign}(COALESCE({row}.is_fraud, 0) = 1),
+                    {sign}(CASE WHEN {row}.is_fraud = 1 THEN COALESCE({row}.transaction_amount, 0) ELSE 0 END),
+                    {sign}COALESCE({row}.fraud_score, 0))
+            ON CONFLICT (bucket_size, bucket_start, fraud_source, transaction_channel) DO UPDATE SET
+                transactions = transactions + excluded.transactions,
+                fraudulent = fraudulent + excluded.fraudulent,
+                fraud_amount = fraud_amount + excluded.fraud_amount,
+                score_sum = score_sum + excluded.score_sum;""")
+    return "".join(statements)
+
+
+# Delete the buckets older than RETENTION; each is one primary key range
+PRUNE = [
+    f"DELETE FROM fraud_stats WHERE bucket_size = '{size}' AND bucket_start < {_oldest_kept(size)}"
+    for size in RETENTION
+]
+_PRUNE_ALL = "; ".join(PRUNE) + ";"
+
+
+# Keep fraud_stats in step with every insert, upsert and delete on transactions. Each
+# trigger ends by pruning expired buckets, including any old one it just touched
+TRIGGER_NAMES = ["fraud_stats_insert", "fraud_stats_update", "fraud_stats_delete"]
+TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS fraud_stats_insert AFTER INSERT ON transactions BEGIN
+        {_apply_row("NEW", "+")}
+        {_PRUNE_ALL}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS fraud_stats_update
+        AFTER UPDATE OF transaction_amount, is_fraud, fraud_source, fraud_score, transaction_date, transaction_channel
+        ON transactions BEGIN
+        {_apply_row("OLD", "-")}
+        {_apply_row("NEW", "+")}
+        {_PRUNE_ALL}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS fraud_stats_delete AFTER DELETE ON transactions BEGIN
+        {_apply_row("OLD", "-")}
+        {_PRUNE_ALL}
+    END""",
+]
+
+
+def _backfill(conn):
+    for size in BUCKETS:
+        conn.execute(f"""
+            INSERT INTO fraud_stats
+            SELECT '{size}', {_bucket_start(size, "t")},
+                   COALESCE(t.fraud_source, 'unknown'), COALESCE(t.transaction_channel, 'unknown'),
+                   COUNT(*), SUM(COALESCE(t.is_fraud, 0) = 1),
+                   SUM(CASE WHEN t.is_fraud = 1 THEN COALESCE(t.transaction_amount, 0) ELSE 0 END),
+                   SUM(COALESCE(t.fraud_score, 0))
+            FROM transactions AS t
+            GROUP BY 2, 3, 4
+        """)
+
+
+def ensure_fraud_stats(conn):
+    """Create fraud_stats and its triggers, backfilling from existing transactions once.
+
+    Also adds the transaction_channel and model_version columns to older
+    transactions tables, replaces triggers created by older versions and
+    prunes expired buckets.
+    Runs in its own write transaction so concurrent startups cannot backfill
+    twice. Returns False if the transactions table does not exist yet.
+    """
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+        if not columns:
+            # No transactions table yet; the scoring services create it
+            conn.rollback()
+            return False
+        if "transaction_channel" not in columns:
+            conn.execute("ALTER TABLE transactions ADD COLUMN transaction_channel TEXT")
+        if "model_version" not in columns:
+            conn.execute("ALTER TABLE transactions ADD COLUMN model_version TEXT")
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fraud_stats'"
+        ).fetchone()
+        conn.execute(STATS_TABLE)
+        if not exists:
+            _backfill(conn)
+        for name in TRIGGER_NAMES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for trigger in TRIGGERS:
+            conn.execute(trigger)
+        for statement in PRUNE:
+            conn.execute(statement)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return True
+
+
+def fraud_totals(conn):
+    """Overall totals, summed over the running 'all' buckets (one per source and channel)."""
+    transactions, fraudulent, fraud_amount, score_sum = conn.execute("""
+        SELECT COALESCE(SUM(transactions), 0), COALESCE(SUM(fraudulent), 0),
+               COALESCE(SUM(fraud_amount), 0), COALESCE(SUM(score_sum), 0)
+        FROM fraud_stats WHERE bucket_size = 'all'
+    """).fetchone()
+    return summarize_totals(transactions, fraudulent, fraud_amount, score_sum)
+
+
+def summarize_totals(transactions=0, fraudulent=0, fraud_amount=0.0, score_sum=0.0):
+    return {
+        "total_transactions": transactions,
+        "total_fraudulent": fraudulent,
+        "total_fraud_amount": round(fraud_amount, 2),
+        "avg_fraud_score": round(score_sum / transactions, 2) if transactions else 0.0,
+    }
+
+
+def fraud_buckets(conn, size, window=None):
+    """The last `window` buckets of `size`, one entry per bucket, source and channel."""
+    if size not in DEFAULT_WINDOWS:
+        raise ValueError(f"bucket must be one of {', '.join(DEFAULT_WINDOWS)}")
+    window = DEFAULT_WINDOWS[size] if window is None else window
+    if not 1 <= window <= RETENTION[size]:
+        raise ValueError(f"window must be between 1 and {RETENTION[size]} for {size} buckets")
+    since = conn.execute(
+        "SELECT strftime(?, 'now', ?)", (BUCKETS[size], f"-{window - 1} {_WINDOW_MODIFIERS[size]}")
+    ).fetchone()[0]
+    rows = conn.execute("""
+        SELECT bucket_start, fraud_source, transaction_channel, transactions, fraudulent, fraud_amount, score_sum
+        FROM fraud_stats
+        WHERE bucket_size = ? AND bucket_start >= ? AND transactions != 0
+        ORDER BY bucket_start, fraud_source, transaction_channel
+    """, (size, since))
+    return [
+        {
+            "bucket_start": bucket_start,
+            "fraud_source": fraud_source,
+            "transaction_channel": channel,
+            "transactions": transactions,
+            "fraudulent": fraudulent,
+            "fraud_amount": round(fraud_amount, 2),
+            "avg_fraud_score": round(score_sum / transactions, 2) if transactions else 0.0,
+        }
+        for bucket_start, fraud_source, channel, transactions, fraudulent, fraud_amount, score_sum in rows
+    ]
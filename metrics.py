@@ -0,0 +1,349 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+from flask import Response, g, request
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Histogram bucket upper bounds in seconds, 50 microseconds to 5 seconds
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+HELP = {
+    "fraud_request_seconds": "Request latency by endpoint",
+    "fraud_stage_seconds": "Time spent in each stage of a request",
+    "fraud_rule_hits_total": "Transactions decided by each rule",
+    "fraud_decisions_total": "Scoring decisions by source (rule or model) and outcome",
+    "fraud_reports_total": "Fraud reports received, by failure_code",
+}
+
+# Counter keys of fraud_decisions_total, by (source, is_fraud)
+_DECISION_KEYS = {
+    (source, is_fraud): ("fraud_decisions_total", (("is_fraud", str(is_fraud).lower()), ("source", source)))
+    for source in ("rule", "model")
+    for is_fraud in (True, False)
+}
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram; observe() is a bisect and two adds under a lock."""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class RequestTimer:
+    """Times the stages of one request: each lap() records the time since the previous lap."""
+
+    __slots__ = ("metrics", "endpoint", "started", "last")
+
+    def __init__(self, metrics, endpoint):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.started = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.metrics.observe_stage(self.endpoint, stage, now - self.last)
+        self.last = now
+
+    def done(self):
+        self.metrics.observe_request(self.endpoint, time.perf_counter() - self.started)
+
+
+class NullTimer:
+    """Stands in for RequestTimer when metrics are disabled."""
+
+    __slots__ = ("metrics",)
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def lap(self, stage):
+        pass
+
+    def done(self):
+        pass
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """Per-process latency histograms, rule-hit and decision counters, rendered for Prometheus.
+
+    Every request gets a RequestTimer (see instrument()); handlers call
+    timer.lap(stage) after each stage, so fraud_stage_seconds shows where
+    the time goes. Components that keep their own counters (the
+    micro-batcher, the transaction writer, the velocity store) are added
+    with add_collector() and exported as gauges when /metrics is scraped.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, profiler=None):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.profiler = profiler
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._stages = {}
+        self._counters = Counter()
+        self._collectors = []
+        self._null_timer = NullTimer(self)
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def timer(self, endpoint):
+        if not self.enabled:
+            return self._null_timer
+        return RequestTimer(self, endpoint)
+
+    def observe_stage(self, endpoint, stage, seconds):
+        self._histogram(self._stages, (endpoint, stage)).observe(seconds)
+
+    def observe_request(self, endpoint, seconds):
+        self._histogram(self._requests, endpoint).observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        self._count((name, tuple(sorted(labels.items()))), amount)
+
+    def _count(self, key, amount=1):
+        if not self.enabled or not amount:
+            return
+        with self._lock:
+            self._counters[key] += amount
+
+    def rule_hit(self, rule, count=1):
+        self._count(("fraud_rule_hits_total", (("rule_id", rule.id),)), count)
+        self._count(_DECISION_KEYS["rule", bool(rule.is_fraud)], count)
+
+    def rule_matches(self, rules, matches):
+        """Count rule hits for a batch, given match_rules() output."""
+        if not self.enabled or not len(matches):
+            return
+        hits = np.bincount(matches[matches >= 0], minlength=len(rules))
+        for rule, count in zip(rules, hits.tolist()):
+            if count:
+                self.rule_hit(rule, count)
+
+    def model_decision(self, score):
+        self._count(_DECISION_KEYS["model", bool(score > 0.5)])
+
+    def model_scores(self, scores):
+        if not self.enabled or not len(scores):
+            return
+        fraudulent = int(np.count_nonzero(np.asarray(scores) > 0.5))
+        self._count(_DECISION_KEYS["model", True], fraudulent)
+        self._count(_DECISION_KEYS["model", False], len(scores) - fraudulent)
+
+    def add_collector(self, prefix, collect):
+        """Export the numbers in collect()'s dict as `{prefix}_{key}` gauges on each scrape."""
+        self._collectors.append((prefix, collect))
+
+    def _render_histograms(self, lines, name, table, label_names):
+        if not table:
+            return
+        lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in sorted(table.items()):
+            labels = list(zip(label_names, key if isinstance(key, tuple) else (key,)))
+            counts, total = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+    def _render_collector(self, lines, prefix, stats):
+        for key, value in sorted(stats.items()):
+            name = f"{prefix}_{key}"
+            if isinstance(value, dict):
+                values = [([("key", k)], v) for k, v in sorted(value.items())]
+            else:
+                values = [([], value)]
+            values = [(labels, v) for labels, v in values if isinstance(v, (int, float))]
+            if not values:
+                continue
+            lines.append(f"# TYPE {name} gauge")
+            for labels, v in values:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(v)}")
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        self._render_histograms(lines, "fraud_request_seconds", dict(self._requests), ("endpoint",))
+        self._render_histograms(lines, "fraud_stage_seconds", dict(self._stages), ("endpoint", "stage"))
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+        previous = None
+        for (name, labels), value in counters:
+            if name != previous:
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                previous = name
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for prefix, collect in self._collectors:
+            self._render_collector(lines, prefix, collect())
+        return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """Sampling profiler over in-flight requests.
+
+    A background thread wakes every `interval` seconds and records the
+    Python stack of each thread currently handling a request, as folded
+    stacks ("endpoint;file:function;... count") that flamegraph.pl and
+    speedscope read directly. Idle threads are never sampled, so the cost
+    is one stack walk per in-flight request per interval.
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._active = {}
+        self._samples = Counter()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def enter(self, endpoint):
+        self._active[threading.get_ident()] = endpoint
+
+    def exit(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self._active:
+                continue
+            frames = sys._current_frames()
+            for ident, endpoint in list(self._active.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                stack.append(endpoint)
+                stack.reverse()
+                with self._lock:
+                    self._samples[";".join(stack)] += 1
+            del frames
+
+    def folded(self, reset=False):
+        with self._lock:
+            samples = self._samples.most_common()
+            if reset:
+                self._samples.clear()
+        return "".join(f"{stack} {count}\n" for stack, count in samples)
+
+
+def current_timer():
+    """The RequestTimer of the request being handled (a no-op timer outside requests)."""
+    return g.get("timer") or NULL_TIMER
+
+
+def instrument(app, metrics):
+    """Time every request of `app`, and serve /metrics (and /metrics/profile when profiling)."""
+
+    def finish(timer):
+        timer.done()
+        if metrics.profiler is not None:
+            metrics.profiler.exit()
+
+    @app.before_request
+    def start_request_timer():
+        rule = request.url_rule
+        endpoint = rule.rule if rule is not None else "unmatched"
+        g.timer = metrics.timer(endpoint)
+        if metrics.profiler is not None:
+            metrics.profiler.enter(endpoint)
+
+    @app.after_request
+    def finish_on_close(response):
+        # Streamed responses are done when the server closes them, not when the view returns
+        timer = g.pop("timer", None)
+        if timer is not None:
+            response.call_on_close(lambda: finish(timer))
+        return response
+
+    @app.teardown_request
+    def stop_request_timer(exc):
+        # Requests that failed before after_request ran
+        timer = g.pop("timer", None)
+        if timer is not None:
+            finish(timer)
+
+    def prometheus_metrics():
+        return Response(metrics.render(), content_type=PROMETHEUS_MIMETYPE)
+
+    def profile():
+        if metrics.profiler is None:
+            return Response("Profiler disabled; start the service with FRAUD_PROFILER=1\n", status=404,
+                            mimetype="text/plain")
+        return Response(metrics.profiler.folded(reset=request.args.get("reset") == "1"), mimetype="text/plain")
+
+    app.add_url_rule("/metrics", "prometheus_metrics", prometheus_metrics, methods=["GET"])
+    app.add_url_rule("/metrics/profile", "metrics_profile", profile, methods=["GET"])
+
+
+def metrics_from_env():
+    """Build the service Metrics from the environment.
+
+    FRAUD_METRICS=0 turns the per-request histograms and counters off.
+    FRAUD_PROFILER=1 starts the sampling profiler, taking a sample every
+    FRAUD_PROFILER_INTERVAL_MS (default 10).
+    """
+    profiler = None
+    if os.environ.get("FRAUD_PROFILER", "0") == "1":
+        profiler = StackSampler(interval=float(os.environ.get("FRAUD_PROFILER_INTERVAL_MS", 10)) / 1000.0)
+    return Metrics(enabled=os.environ.get("FRAUD_METRICS", "1") != "0", profiler=profiler)
+
+
+# Timer used outside an instrumented request
+NULL_TIMER = NullTimer(Metrics(enabled=False))
@@ -0,0 +1,121 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row scoring requests into one model call.
+
+    Callers block in score() while a background thread collects rows that
+    arrive within `window_ms` of the first one (or until `max_batch_size` rows
+    are waiting), scores them with one `score_fn(model, matrix)` call per
+    model they were submitted with (one, except across a model reload) and
+    hands each caller its own result. When `max_queue_depth` rows are already
+    waiting, score() scores the row inline instead of queueing it.
+    """
+
+    def __init__(self, score_fn, window_ms=2.0, max_batch_size=64, max_queue_depth=1024):
+        self.score_fn = score_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched_rows": 0,
+            "max_observed_batch_size": 0,
+            "overflow_inline": 0,
+            "errors": 0,
+            "scoring_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def score(self, model, features):
+        """Return `model`'s score for one feature row, blocking until its batch is scored."""
+        future = Future()
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        try:
+            self._queue.put_nowait((model, np.array(features, dtype=np.float64), time.perf_counter(), future))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["overflow_inline"] += 1
+            return self.score_fn(model, np.asarray(features, dtype=np.float64).reshape(1, -1))[0]
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            groups = {}
+            for entry in batch:
+                groups.setdefault(id(entry[0]), []).append(entry)
+            for group in groups.values():
+                try:
+                    scores = self.score_fn(group[0][0], np.vstack([row for _, row, _, _ in group]))
+                except Exception as e:
+                    with self._stats_lock:
+                        self._stats["errors"] += 1
+                    for _, _, _, future in group:
+                        future.set_exception(e)
+                    continue
+                for (_, _, _, future), score in zip(group, scores):
+                    future.set_result(score)
+            finished = time.perf_counter()
+
+            with self._stats_lock:
+                stats = self._stats
+                stats["batches"] += 1
+                stats["batched_rows"] += len(batch)
+                stats["max_observed_batch_size"] = max(stats["max_observed_batch_size"], len(batch))
+                stats["scoring_seconds"] += finished - started
+                stats["queue_wait_seconds"] += sum(started - enqueued for _, _, enqueued, _ in batch)
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = stats["batched_rows"] / stats["batches"] if stats["batches"] else 0.0
+        stats["config"] = {
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "max_queue_depth": self._queue.maxsize,
+        }
+        return stats
+
+
+def micro_batcher_from_env(score_fn):
+    """Build a MicroBatcher when FRAUD_MICROBATCH=1, configured from the environment.
+
+    FRAUD_MICROBATCH_WINDOW_MS (default 2), FRAUD_MICROBATCH_MAX_BATCH (default 64)
+    and FRAUD_MICROBATCH_QUEUE_DEPTH (default 1024) tune the batcher.
+    Returns None when micro-batching is disabled.
+    """
+    if os.environ.get("FRAUD_MICROBATCH", "0") != "1":
+        return None
+    return MicroBatcher(
+        score_fn,
+        window_ms=float(os.environ.get("FRAUD_MICROBATCH_WINDOW_MS", 2)),
+        max_batch_size=int(os.environ.get("FRAUD_MICROBATCH_MAX_BATCH", 64)),
+        max_queue_depth=int(os.environ.get("FRAUD_MICROBATCH_QUEUE_DEPTH", 1024)),
+    )
@@ -0,0 +1,215 @@
+"""Versioned model registry and hot reload for the scoring services.
+
+    python model_registry.py publish [--version V] [--activate]   # register the current .pkl files
+    python model_registry.py activate V                           # point CURRENT at version V
+    python model_registry.py list
+
+Each version is a directory under model_registry/ holding the model,
+scaler, encoder and feature-name .pkl files plus their memory-mappable
+export (see model_store.py). The CURRENT file names the active version and
+is replaced atomically. The services load the active version at startup
+(or the .pkl files in the working directory when the registry is empty)
+and swap in another one with POST /admin/model/reload, without a restart.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from feature_extractor import FeatureExtractor
+from model_store import ARTIFACTS_DIR, export_from_files, load_serving_model
+
+REGISTRY_DIR = "model_registry"
+CURRENT = "CURRENT"
+
+MODEL_FILES = ["fraud_model.pkl", "scaler.pkl", "label_encoders.pkl", "model_features.pkl"]
+
+# Rows scored to warm a freshly loaded model before it takes traffic
+WARM_ROWS = 256
+
+# Everything one request needs from a model version; replaced as a whole on reload
+ServingModel = namedtuple("ServingModel", ["version", "feature_extractor", "model", "preprocessor"])
+
+
+def _file_sha(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def list_versions(registry=REGISTRY_DIR):
+    """Published versions, oldest first."""
+    try:
+        names = os.listdir(registry)
+    except OSError:
+        return []
+    # Staging directories start with a dot and are never versions
+    versions = [name for name in names if not name.startswith(".")
+                and all(os.path.exists(os.path.join(registry, name, f)) for f in MODEL_FILES)]
+    return sorted(versions, key=lambda name: os.path.getmtime(os.path.join(registry, name)))
+
+
+def current_version(registry=REGISTRY_DIR):
+    """The version CURRENT points at, or None when nothing is active."""
+    try:
+        with open(os.path.join(registry, CURRENT)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+
+def set_current(version, registry=REGISTRY_DIR):
+    """Point CURRENT at `version`, replacing the file in one rename."""
+    if version not in list_versions(registry):
+        raise LookupError(f"Unknown model version {version!r}")
+    fd, path = tempfile.mkstemp(dir=registry, prefix=".current-")
+    with os.fdopen(fd, "w") as f:
+        f.write(version + "\n")
+    os.replace(path, os.path.join(registry, CURRENT))
+
+
+def publish(version=None, source_dir=".", registry=REGISTRY_DIR, activate=False):
+    """Copy the model files in `source_dir` into the registry as a new version.
+
+    The version defaults to the publish time plus the model file's hash.
+    The files and their export are staged in a temporary directory and
+    renamed into place, so a half-written version is never listed.
+    """
+    paths = [os.path.join(source_dir, name) for name in MODEL_FILES]
+    version = version or time.strftime("%Y%m%d-%H%M%S-") + _file_sha(paths[0])[:8]
+    target = os.path.join(registry, version)
+    if os.path.exists(target):
+        raise ValueError(f"Model version {version!r} already exists")
+    os.makedirs(registry, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=registry, prefix=".staging-")
+    try:
+        for path in paths:
+            shutil.copy2(path, staging)
+        staged = [os.path.join(staging, name) for name in MODEL_FILES]
+        export_from_files(staged[3], staged[0], staged[1], staged[2], os.path.join(staging, ARTIFACTS_DIR))
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    if activate:
+        set_current(version, registry)
+    return version
+
+
+def load_version(version=None, registry=REGISTRY_DIR):
+    """Load a ServingModel for `version`, the active version, or the working-directory .pkl files.
+
+    Without a version and with no active one, the model files in the
+    working directory are loaded as version "pkl-<hash of fraud_model.pkl>".
+    """
+    version = version or current_version(registry)
+    if version is None:
+        directory = "."
+        version = "pkl-" + _file_sha("fraud_model.pkl")[:12]
+        artifacts = ARTIFACTS_DIR
+    else:
+        if version not in list_versions(registry):
+            raise LookupError(f"Unknown model version {version!r}")
+        directory = os.path.join(registry, version)
+        artifacts = os.path.join(directory, ARTIFACTS_DIR)
+    model_path, scaler_path, encoders_path, features_path = (os.path.join(directory, name) for name in MODEL_FILES)
+    feature_extractor = FeatureExtractor.from_file(features_path)
+    model, preprocessor = load_serving_model(
+        feature_extractor.feature_names, model_path, scaler_path, encoders_path, artifacts
+    )
+    feature_extractor.check_model(model)
+    return ServingModel(version, feature_extractor, model, preprocessor)
+
+
+def warm(serving, rows=WARM_ROWS):
+    """Fault in a model's memory-mapped arrays and run it once, before it serves requests."""
+    for value in vars(serving.model).values():
+        if isinstance(value, np.memmap):
+            # One read per page is enough to map it in
+            np.asarray(value).reshape(-1).view(np.uint8)[::4096].sum()
+    serving.model.predict_proba(np.zeros((rows, len(serving.feature_extractor.feature_names))))
+
+
+class ModelHolder:
+    """The serving model of one process, swapped in one assignment on reload.
+
+    Handlers read `current` once per request and use that ServingModel
+    throughout, so a request never mixes two versions. reload() loads and
+    warms the new version on a background thread while `current` keeps
+    serving; a failed load leaves it in place and is reported by status().
+    """
+
+    def __init__(self, registry=REGISTRY_DIR):
+        self.registry = registry
+        self.current = load_version(registry=registry)
+        warm(self.current)
+        self._reload_lock = threading.Lock()
+        self._status = {"state": "idle", "requested": None,
+                        "started_at": None, "finished_at": None, "load_seconds": None, "error": None}
+
+    def reload(self, version=None):
+        """Start loading `version` (default: the active one) in the background.
+
+        Returns False if a reload is already running. Raises LookupError for
+        an unknown version. A named version that loads is also made the
+        registry's active version, so restarts keep it.
+        """
+        if version is not None and version not in list_versions(self.registry):
+            raise LookupError(f"Unknown model version {version!r}")
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self._status.update(state="loading", requested=version, started_at=time.time(), finished_at=None,
+                            load_seconds=None, error=None)
+        threading.Thread(target=self._reload, args=(version,), name="model-reload", daemon=True).start()
+        return True
+
+    def _reload(self, version):
+        started = time.perf_counter()
+        try:
+            serving = load_version(version, self.registry)
+            warm(serving)
+            if version is not None and version != current_version(self.registry):
+                set_current(version, self.registry)
+            self.current = serving
+            self._status["state"] = "idle"
+        except Exception as e:
+            self._status.update(state="failed", error=str(e))
+        finally:
+            self._status.update(finished_at=time.time(), load_seconds=time.perf_counter() - started)
+            self._reload_lock.release()
+
+    def status(self):
+        status = dict(self._status)
+        status["version"] = self.current.version
+        status["active_version"] = current_version(self.registry)
+        status["versions"] = list_versions(self.registry)
+        return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish_parser = commands.add_parser("publish", help="register the .pkl files in the working directory")
+    publish_parser.add_argument("--version")
+    publish_parser.add_argument("--activate", action="store_true")
+    activate_parser = commands.add_parser("activate", help="make a published version the active one")
+    activate_parser.add_argument("version")
+    commands.add_parser("list", help="list published versions")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        version = publish(args.version, activate=args.activate)
+        print(f"Published {version}" + (" (active)" if args.activate else ""))
+    elif args.command == "activate":
+        set_current(args.version)
+        print(f"Active model version: {args.version}")
+    else:
+        active = current_version()
+        for version in list_versions():
+            print(version + (" *" if version == active else ""))
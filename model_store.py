@@ -0,0 +1,184 @@
+"""Export the trained model, scaler and encoders as memory-mappable NumPy arrays.
+
+    python model_store.py            # export the current .pkl files to model_artifacts/
+
+Serving processes map the exported .npy files read-only, so every worker
+shares the same pages and starts without unpickling the forest. The .pkl
+files remain the source of truth: if they change after an export, or
+FRAUD_MODEL_FORMAT=pickle is set, the services load them as before.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+from preprocessing import Preprocessor
+from tree_engine import TOLERANCE, CompiledForest, compile_model
+
+ARTIFACTS_DIR = "model_artifacts"
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+FOREST_ARRAYS = ["feature", "threshold", "children", "class_values", "roots"]
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _save(directory, name, array):
+    array = np.asarray(array)
+    if array.dtype == object:
+        # Object arrays cannot be memory-mapped; encoder classes are strings or numbers
+        array = array.astype(str)
+    np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+
+def _load(directory, name):
+    return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r", allow_pickle=False)
+
+
+def export_artifacts(model, preprocessor, directory=ARTIFACTS_DIR, sources=()):
+    """Write the compiled forest and preprocessing arrays to `directory`.
+
+    `sources` are the files the export was made from; their hashes, sizes
+    and modification times are recorded so a stale export is detected when
+    they change.
+    """
+    if isinstance(model, CompiledForest):
+        forest = model
+    else:
+        forest = CompiledForest.from_sklearn(model)
+        error = forest.verify(model)
+        if error > TOLERANCE:
+            raise ValueError(f"Compiled model differs from sklearn by {error:.3g}")
+    os.makedirs(directory, exist_ok=True)
+
+    for name in FOREST_ARRAYS:
+        _save(directory, "forest_" + name, getattr(forest, name))
+    _save(directory, "forest_classes", forest.classes_)
+    _save(directory, "scaler_mean", preprocessor.mean)
+    _save(directory, "scaler_scale", preprocessor.scale)
+    for name, classes in preprocessor.encoder_classes.items():
+        _save(directory, "encoder_" + name, classes)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "max_depth": int(forest.max_depth),
+        "n_features_in": int(forest.n_features_in_),
+        "feature_names_in": [str(name) for name in getattr(forest, "feature_names_in_", [])] or None,
+        "feature_names": preprocessor.feature_names,
+        "encoders": list(preprocessor.encoder_classes),
+        "sources": {os.path.basename(path): _sha256(path) for path in sources},
+        "source_stats": {os.path.basename(path): _stat(path) for path in sources},
+    }
+    # Written last, so a partial export is never picked up
+    with open(os.path.join(directory, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(directory=ARTIFACTS_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def is_current(manifest, sources):
+    """True if the export was made from the current contents of `sources`.
+
+    A source with the size and modification time recorded at export is
+    taken as unchanged without reading it; any other source (touched, or
+    checked out afresh) is hashed and compared with the recorded hash.
+    """
+    recorded = manifest.get("sources", {})
+    stats = manifest.get("source_stats", {})
+    for path in sources:
+        name = os.path.basename(path)
+        try:
+            stat = _stat(path)
+        except OSError:
+            return False
+        if name not in recorded:
+            return False
+        if stats.get(name) != stat and _sha256(path) != recorded[name]:
+            return False
+    return True
+
+
+def load_forest(directory=ARTIFACTS_DIR, manifest=None):
+    manifest = manifest or read_manifest(directory)
+    feature_names_in = manifest["feature_names_in"]
+    return CompiledForest(
+        **{name: _load(directory, "forest_" + name) for name in FOREST_ARRAYS},
+        max_depth=manifest["max_depth"],
+        classes=_load(directory, "forest_classes"),
+        n_features_in=manifest["n_features_in"],
+        feature_names_in=np.array(feature_names_in, dtype=object) if feature_names_in else None,
+    )
+
+
+def load_preprocessor(directory=ARTIFACTS_DIR, manifest=None):
+    manifest = manifest or read_manifest(directory)
+    return Preprocessor.from_arrays(
+        manifest["feature_names"],
+        _load(directory, "scaler_mean"),
+        _load(directory, "scaler_scale"),
+        {name: _load(directory, "encoder_" + name) for name in manifest["encoders"]},
+    )
+
+
+def load_serving_model(feature_names, model_path="fraud_model.pkl", scaler_path="scaler.pkl",
+                       encoders_path="label_encoders.pkl", directory=ARTIFACTS_DIR):
+    """Return (model, preprocessor) for the scoring services.
+
+    Uses the memory-mapped export when it is present and matches the .pkl
+    files; otherwise unpickles them. FRAUD_MODEL_FORMAT=pickle or
+    FRAUD_MODEL_BACKEND=sklearn always unpickles.
+    """
+    sources = (model_path, scaler_path, encoders_path)
+    use_export = (
+        os.environ.get("FRAUD_MODEL_FORMAT", "mmap") != "pickle"
+        and os.environ.get("FRAUD_MODEL_BACKEND", "compiled") == "compiled"
+    )
+    manifest = read_manifest(directory) if use_export else None
+    if manifest is not None and manifest["feature_names"] != list(feature_names):
+        print(f"Ignoring {directory}: exported for features {manifest['feature_names']}")
+        manifest = None
+    if manifest is not None and not is_current(manifest, sources):
+        print(f"Ignoring {directory}: the model files changed since it was exported")
+        manifest = None
+    if manifest is not None:
+        return load_forest(directory, manifest), load_preprocessor(directory, manifest)
+
+    with open(model_path, "rb") as model_file:
+        model = pickle.load(model_file)
+    return compile_model(model), Preprocessor.from_files(feature_names, scaler_path, encoders_path)
+
+
+def export_from_files(feature_names_path="model_features.pkl", model_path="fraud_model.pkl",
+                      scaler_path="scaler.pkl", encoders_path="label_encoders.pkl", directory=ARTIFACTS_DIR):
+    with open(feature_names_path, "rb") as f:
+        feature_names = pickle.load(f)
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+    preprocessor = Preprocessor.from_files(feature_names, scaler_path, encoders_path)
+    return export_artifacts(model, preprocessor, directory, sources=(model_path, scaler_path, encoders_path))
+
+
+if __name__ == "__main__":
+    export_from_files()
+    print(f"Exported fraud_model.pkl, scaler.pkl and label_encoders.pkl to {ARTIFACTS_DIR}/")
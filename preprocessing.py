@@ -0,0 +1,123 @@
+import pickle
+
+import numpy as np
+
+# Columns train_fraud_model.py standardizes and label-encodes
+NUMERICAL_FEATURES = ['transaction_amount', 'transaction_hour', 'transaction_day', 'transaction_month']
+CATEGORICAL_FEATURES = ['transaction_channel', 'payer_browser_anonymous', 'transaction_payment_mode_anonymous', 'payment_gateway_bank_anonymous']
+
+# Code used for categories the encoder never saw during training
+UNKNOWN_CATEGORY = -1
+
+
+def _lookup_keys(value):
+    """Request values that should map to a training class (e.g. '7', 7 and 7.0)."""
+    keys = {value}
+    if isinstance(value, (int, np.integer)):
+        keys.update({int(value), str(int(value))})
+    elif isinstance(value, (float, np.floating)) and float(value).is_integer():
+        keys.update({int(value), str(int(value))})
+    elif isinstance(value, str) and value.strip().lstrip("-").isdigit():
+        keys.add(int(value))
+    return keys
+
+
+def compile_classes(classes):
+    """Compile LabelEncoder classes into a dict lookup and, for integer classes, an array lookup."""
+    table = {}
+    for code, value in enumerate(classes):
+        if isinstance(value, np.generic):
+            value = value.item()
+        for key in _lookup_keys(value):
+            table.setdefault(key, code)
+
+    int_keys = [key for key in table if isinstance(key, int)]
+    if len(int_keys) == len(classes) and min(int_keys) >= 0:
+        lut = np.full(max(int_keys) + 1, UNKNOWN_CATEGORY, dtype=np.float64)
+        for key in int_keys:
+            lut[key] = table[key]
+    else:
+        lut = None
+    return table, lut
+
+
+def compile_encoder(encoder):
+    """Compile a fitted LabelEncoder, see compile_classes()."""
+    return compile_classes(encoder.classes_)
+
+
+class Preprocessor:
+    """Apply the training-time encoders and scaler to extracted feature rows.
+
+    Label encoders are compiled once into O(1) dict lookups (and array lookups
+    for integer-coded categories); scaling is one vectorized in-place
+    `(x - mean) / scale` over the whole matrix, the same arithmetic as
+    StandardScaler.transform.
+    """
+
+    def __init__(self, feature_names, scaler=None, label_encoders=None):
+        self.feature_names = list(feature_names)
+        index = {name: j for j, name in enumerate(self.feature_names)}
+
+        self.mean = np.zeros(len(self.feature_names), dtype=np.float64)
+        self.scale = np.ones(len(self.feature_names), dtype=np.float64)
+        if scaler is not None:
+            # Older scalers were fitted on all columns; only the numerical ones are scaled in training.
+            fitted = list(getattr(scaler, "feature_names_in_", NUMERICAL_FEATURES))
+            for name in NUMERICAL_FEATURES:
+                if name in index and name in fitted:
+                    k = fitted.index(name)
+                    self.mean[index[name]] = scaler.mean_[k]
+                    self.scale[index[name]] = scaler.scale_[k]
+
+        self._set_classes({name: encoder.classes_ for name, encoder in (label_encoders or {}).items()})
+
+    def _set_classes(self, encoder_classes):
+        index = {name: j for j, name in enumerate(self.feature_names)}
+        self.encoder_classes = {}
+        self.categorical = []
+        for name, classes in encoder_classes.items():
+            if name in index:
+                table, lut = compile_classes(classes)
+                self.encoder_classes[name] = classes
+                self.categorical.append((index[name], name, table, lut))
+
+    @classmethod
+    def from_files(cls, feature_names, scaler_path="scaler.pkl", encoders_path="label_encoders.pkl"):
+        with open(scaler_path, "rb") as f:
+            scaler = pickle.load(f)
+        with open(encoders_path, "rb") as f:
+            label_encoders = pickle.load(f)
+        return cls(feature_names, scaler, label_encoders)
+
+    @classmethod
+    def from_arrays(cls, feature_names, mean, scale, encoder_classes):
+        """Rebuild from exported arrays: per-feature mean and scale, and each encoder's classes."""
+        preprocessor = cls(feature_names)
+        preprocessor.mean = np.asarray(mean, dtype=np.float64)
+        preprocessor.scale = np.asarray(scale, dtype=np.float64)
+        preprocessor._set_classes(encoder_classes)
+        return preprocessor
+
+    def _encode_column(self, transactions, features, j, name, table, lut):
+        column = features[:, j]
+        if lut is not None:
+            # Integer-coded categories were already parsed into the feature column.
+            codes = np.full(len(column), UNKNOWN_CATEGORY, dtype=np.float64)
+            known = (column >= 0) & (column < len(lut))
+            codes[known] = lut[column[known].astype(np.int64)]
+            column[:] = codes
+        else:
+            column[:] = [table.get(data.get(name, 0), UNKNOWN_CATEGORY) for data in transactions]
+
+    def transform(self, transactions, features):
+        """Encode and scale a batch in place; `features[i]` must belong to `transactions[i]`."""
+        for j, name, table, lut in self.categorical:
+            self._encode_column(transactions, features, j, name, table, lut)
+        features -= self.mean
+        features /= self.scale
+        return features
+
+    def transform_one(self, data, features):
+        """Encode and scale a single 1 x n row in place."""
+        return self.transform((data,), features)
@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+REBALANCE_METHODS = ("none", "undersample", "smote", "hybrid")
+NEIGHBOR_SEARCHES = ("exact", "approximate")
+
+# Bytes of distances computed at once by the chunked neighbour search
+DISTANCE_BLOCK_BYTES = 64 * 1024 * 1024
+
+# Synthetic rows generated per task
+GENERATE_CHUNK_ROWS = 65536
+
+
+class Rebalancer:
+    """Class rebalancing for a binary training set, shared by the training scripts.
+
+    Methods:
+      undersample  all minority rows plus as many majority rows, drawn without replacement
+      smote        all rows plus SMOTE samples until the minority matches the majority
+      hybrid       majority undersampled to `majority_ratio` times the minority, then SMOTE
+      none         the rows unchanged
+
+    SMOTE interpolates between a minority row and one of its `k_neighbors`
+    nearest minority rows. Neighbours are found by a brute-force search
+    over blocks of at most DISTANCE_BLOCK_BYTES of float32 distances, over
+    every minority row ("exact") or over a random `max_candidates` of them
+    ("approximate"). Blocks and generation chunks run on `n_jobs` threads,
+    each chunk with its own generator spawned from `seed`, so the output
+    depends only on the seed. Output is float32 features and int8 labels.
+    """
+
+    def __init__(self, method="undersample", seed=42, k_neighbors=5, majority_ratio=2.0,
+                 neighbors="exact", max_candidates=50000, n_jobs=-1):
+        if method not in REBALANCE_METHODS:
+            raise ValueError(f"method must be one of {', '.join(REBALANCE_METHODS)}")
+        if neighbors not in NEIGHBOR_SEARCHES:
+            raise ValueError(f"neighbors must be one of {', '.join(NEIGHBOR_SEARCHES)}")
+        self.method = method
+        self.seed = seed
+        self.k_neighbors = k_neighbors
+        self.majority_ratio = majority_ratio
+        self.neighbors = neighbors
+        self.max_candidates = max_candidates
+        self.n_jobs = (os.cpu_count() or 1) if n_jobs in (None, -1) else n_jobs
+
+    def fit_resample(self, X, y):
+        """Return (X, y) rebalanced as float32 features and int8 labels."""
+        X = np.asarray(X, dtype=np.float32)
+        y = np.asarray(y).astype(np.int8, copy=False)
+        counts = np.bincount(y, minlength=2)
+        if len(counts) != 2:
+            raise ValueError("rebalancing needs binary labels 0 and 1")
+        minority = int(np.argmin(counts))
+        minority_rows = np.flatnonzero(y == minority)
+        majority_rows = np.flatnonzero(y != minority)
+        seeds = np.random.SeedSequence(self.seed)
+        rng = np.random.default_rng(seeds.spawn(1)[0])
+
+        if self.method == "none":
+            return X, y
+        if self.method == "undersample":
+            keep = np.concatenate([minority_rows, rng.choice(majority_rows, len(minority_rows), replace=False)])
+            return X[keep], y[keep]
+        if self.method == "hybrid":
+            n_majority = min(len(majority_rows), int(round(self.majority_ratio * len(minority_rows))))
+            majority_rows = rng.choice(majority_rows, n_majority, replace=False)
+        return self._smote(X, y, minority, minority_rows, majority_rows, seeds)
+
+    def _smote(self, X, y, minority, minority_rows, majority_rows, seeds):
+        n_new = max(0, len(majority_rows) - len(minority_rows))
+        X_minority = X[minority_rows]
+        neighbors = self.nearest_neighbors(X_minority, seeds)
+
+        n_kept = len(minority_rows) + len(majority_rows)
+        X_out = np.empty((n_kept + n_new, X.shape[1]), dtype=np.float32)
+        y_out = np.empty(n_kept + n_new, dtype=np.int8)
+        X_out[:len(minority_rows)] = X_minority
+        X_out[len(minority_rows):n_kept] = X[majority_rows]
+        y_out[:len(minority_rows)] = minority
+        y_out[len(minority_rows):n_kept] = 1 - minority
+        y_out[n_kept:] = minority
+
+        starts = range(n_kept, n_kept + n_new, GENERATE_CHUNK_ROWS)
+        chunk_seeds = seeds.spawn(len(starts))
+
+        def generate(start, seed):
+            rng = np.random.default_rng(seed)
+            m = min(GENERATE_CHUNK_ROWS, n_kept + n_new - start)
+            rows = rng.integers(0, len(X_minority), m)
+            picks = neighbors[rows, rng.integers(0, neighbors.shape[1], m)]
+            steps = rng.random((m, 1), dtype=np.float32)
+            base = X_minority[rows]
+            X_out[start:start + m] = base + steps * (X_minority[picks] - base)
+
+        self._run(generate, starts, chunk_seeds)
+        return X_out, y_out
+
+    def nearest_neighbors(self, X_minority, seeds=None):
+        """Indices of the `k_neighbors` nearest other minority rows of each minority row."""
+        n = len(X_minority)
+        if n < 2:
+            raise ValueError("SMOTE needs at least 2 minority rows")
+        candidates = np.arange(n)
+        if self.neighbors == "approximate" and n > self.max_candidates:
+            rng = np.random.default_rng((seeds or np.random.SeedSequence(self.seed)).spawn(1)[0])
+            candidates = np.sort(rng.choice(n, self.max_candidates, replace=False))
+        # Position of each row among the candidates (-1 if not one), to skip a row's own distance
+        own = np.full(n, -1, dtype=np.int64)
+        own[candidates] = np.arange(len(candidates))
+        C = X_minority[candidates]
+        C_norms = np.einsum("ij,ij->i", C, C)
+        k = min(self.k_neighbors, len(candidates) - 1)
+        block = max(1, DISTANCE_BLOCK_BYTES // (4 * len(candidates)))
+        result = np.empty((n, k), dtype=np.int64)
+
+        def search(start):
+            rows = np.arange(start, min(start + block, n))
+            # Squared distance up to the row's own norm, which does not change the ranking
+            distances = C_norms[None, :] - 2.0 * (X_minority[rows] @ C.T)
+            mine = own[rows]
+            distances[np.flatnonzero(mine >= 0), mine[mine >= 0]] = np.inf
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            result[rows] = candidates[nearest]
+
+        self._run(search, range(0, n, block))
+        return result
+
+    def _run(self, task, *iterables):
+        if self.n_jobs <= 1:
+            for args in zip(*iterables):
+                task(*args)
+            return
+        with ThreadPoolExecutor(self.n_jobs) as pool:
+            # NumPy releases the GIL in the matrix products and copies
+            list(pool.map(task, *iterables))
+
+
+def rebalancer_from_env(default_method="undersample"):
+    """Build the training Rebalancer from the environment.
+
+    FRAUD_REBALANCE picks the method (undersample, smote, hybrid or none),
+    FRAUD_REBALANCE_SEED the seed (default 42), FRAUD_SMOTE_NEIGHBORS k
+    (default 5), FRAUD_SMOTE_SEARCH exact or approximate,
+    FRAUD_SMOTE_MAX_CANDIDATES the approximate search's sample (default
+    50000), FRAUD_HYBRID_MAJORITY_RATIO the majority kept per minority row
+    in hybrid mode (default 2) and FRAUD_TRAIN_JOBS the threads (default
+    -1, all cores).
+    """
+    return Rebalancer(
+        method=os.environ.get("FRAUD_REBALANCE", default_method),
+        seed=int(os.environ.get("FRAUD_REBALANCE_SEED", 42)),
+        k_neighbors=int(os.environ.get("FRAUD_SMOTE_NEIGHBORS", 5)),
+        majority_ratio=float(os.environ.get("FRAUD_HYBRID_MAJORITY_RATIO", 2.0)),
+        neighbors=os.environ.get("FRAUD_SMOTE_SEARCH", "exact"),
+        max_candidates=int(os.environ.get("FRAUD_SMOTE_MAX_CANDIDATES", 50000)),
+        n_jobs=int(os.environ.get("FRAUD_TRAIN_JOBS", -1)),
+    )
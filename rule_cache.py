@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from db import get_pool, RULES_DB
+from rule_engine import UnsupportedCondition, compile_mask, condition_constraints
+from rule_order import RULE_ORDER_POLICIES, OrderedRules, RuleStats, expected_cost, plan_order, precedence
+
+# Actions containing any of these keywords mark a transaction as safe instead of fraudulent
+SAFE_KEYWORDS = ["safe", "approved", "all good", "verified", "trusted"]
+
+# A fraud rule with its condition already compiled to a code object and, when the
+# vectorized engine supports the condition, to a batch mask function as well,
+# plus the per-field constraints used to reorder rules safely
+CompiledRule = namedtuple("CompiledRule", ["id", "condition", "action", "code", "is_fraud", "mask", "constraints"])
+
+# rules.db setting holding the rule evaluation order policy
+ORDER_SETTING = "evaluation_order"
+
+
+def is_fraud_action(action):
+    return not any(keyword in action.lower() for keyword in SAFE_KEYWORDS)
+
+
+def compile_rule(rule_id, condition, action):
+    code = compile(condition, f"<rule {rule_id}>", "eval")
+    try:
+        mask = compile_mask(condition)
+    except UnsupportedCondition:
+        mask = None
+    return CompiledRule(rule_id, condition, action, code, is_fraud_action(action), mask,
+                        condition_constraints(condition))
+
+
+class RuleCache:
+    """Process-wide cache of the enabled fraud rules, compiled once per reload.
+
+    The cache reloads when bump_version() is called (the /rules POST/PUT/DELETE
+    handlers do this) or when the rules database changes on disk, e.g. because
+    rule_manager.py edited it from another process.
+
+    get_rules() returns the rules in evaluation order. Under the "adaptive"
+    policy (the default, see FRAUD_RULE_ORDER) the order is re-planned from
+    the collected RuleStats every `reorder_every` searches, moving cheap
+    rules that decide many transactions forward wherever that cannot change
+    which action the first matching rule has (see rule_order.precedence).
+    The policy is stored in rules.db, so set_policy() reaches every service.
+    Unless FRAUD_RULE_INDEX=0, each search only evaluates the rules a
+    RuleIndex finds could match the transaction.
+    """
+
+    def __init__(self, db_path=RULES_DB, reorder_every=1000, sample_every=64):
+        self.db_path = db_path
+        self.reorder_every = reorder_every
+        self.sample_every = sample_every
+        self.default_policy = os.environ.get("FRAUD_RULE_ORDER", "adaptive")
+        if self.default_policy not in RULE_ORDER_POLICIES:
+            raise ValueError(f"FRAUD_RULE_ORDER must be one of {', '.join(RULE_ORDER_POLICIES)}")
+        self.policy = self.default_policy
+        self.indexed = os.environ.get("FRAUD_RULE_INDEX", "1") != "0"
+        self.stats = RuleStats()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = None
+        self._loaded_stamp = None
+        self._by_id = []
+        self._before = []
+        self._planned_at = None
+        self._rules = OrderedRules()
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+
+    @property
+    def version(self):
+        return self._version
+
+    def _disk_stamp(self):
+        # In WAL mode commits land in the -wal file until the next checkpoint,
+        # so watch it alongside the main database file.
+        stamp = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def _is_fresh(self, stamp):
+        return self._loaded_version == self._version and self._loaded_stamp == stamp
+
+    def get_rules(self):
+        stamp = self._disk_stamp()
+        rules = self._rules
+        if self._is_fresh(stamp) and rules.searches < self.reorder_every:
+            return rules
+        with self._lock:
+            if not self._is_fresh(stamp):
+                version = self._version
+                self._by_id, self.policy = self._load()
+                self._before = precedence(self._by_id)
+                self._loaded_version = version
+                self._loaded_stamp = stamp
+                self._replan()
+            elif self._rules.searches >= self.reorder_every:
+                self._replan()
+            return self._rules
+
+    def _replan(self):
+        # Caller holds self._lock
+        self.stats.merge(self._rules)
+        order = self._order(self.stats.estimates(self._by_id))
+        self._rules = OrderedRules([self._by_id[i] for i in order], self.sample_every, self.indexed)
+        self._planned_at = time.time()
+
+    def _order(self, estimates):
+        if self.policy == "id":
+            return list(range(len(self._by_id)))
+        return plan_order(self._by_id, self._before, estimates)
+
+    def _load(self):
+        with get_pool(self.db_path).connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, condition, action FROM fraud_rules WHERE enabled=1 ORDER BY id")
+            rows = cursor.fetchall()
+            try:
+                setting = cursor.execute("SELECT value FROM rule_settings WHERE name=?", (ORDER_SETTING,)).fetchone()
+            except sqlite3.OperationalError:
+                # Databases created before rule_settings existed
+                setting = None
+
+        rules = []
+        for rule_id, condition, action in rows:
+            try:
+                rules.append(compile_rule(rule_id, condition, action))
+            except SyntaxError as e:
+                print(f"Rule compilation error (rule {rule_id}): {e}")
+        policy = setting[0] if setting and setting[0] in RULE_ORDER_POLICIES else self.default_policy
+        return rules, policy
+
+    def set_policy(self, policy):
+        """Store the rule evaluation order policy in rules.db; raises ValueError for unknown policies."""
+        if policy not in RULE_ORDER_POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(RULE_ORDER_POLICIES)}")
+        with get_pool(self.db_path).connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS rule_settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("INSERT INTO rule_settings (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value=excluded.value", (ORDER_SETTING, policy))
+            conn.commit()
+        self.bump_version()
+
+    def order_report(self):
+        """The policy, current evaluation order and per-rule statistics, for GET /rules/order."""
+        self.get_rules()
+        with self._lock:
+            self.stats.merge(self._rules)
+            by_id, before, rules = self._by_id, self._before, self._rules
+        estimates = self.stats.estimates(by_id)
+        index = {rule.id: i for i, rule in enumerate(by_id)}
+        order = [index[rule.id] for rule in rules]
+        positions = {i: position for position, i in enumerate(order)}
+        filed = rules.index.filed if rules.index is not None else [None] * len(rules)
+        report = []
+        for i, rule in enumerate(by_id):
+            stats = self.stats.get(rule)
+            report.append({
+                "id": rule.id,
+                "action": rule.action,
+                "position": positions[i],
+                "seen": stats["seen"],
+                "evaluations": stats["evaluations"],
+                "matches": stats["matches"],
+                "hit_rate": stats["matches"] / stats["seen"] if stats["seen"] else None,
+                "avg_eval_us": stats["seconds"] / stats["timed"] * 1e6 if stats["timed"] else None,
+                "must_follow": [by_id[j].id for j in before[i]],
+                "indexed_on": filed[positions[i]],
+            })
+        return {
+            "policy": self.policy,
+            "indexed": rules.index is not None,
+            "order": [rule.id for rule in rules],
+            "planned_at": self._planned_at,
+            "expected_cost_us": expected_cost(order, estimates) * 1e6,
+            "id_order_cost_us": expected_cost(range(len(by_id)), estimates) * 1e6,
+            "adaptive_cost_us": expected_cost(plan_order(by_id, before, estimates), estimates) * 1e6,
+            "rules": report,
+        }
+
+
+def first_matching_rule(rules, data):
+    """Return the first rule whose condition holds for the transaction dict, or None.
+
+    With rules from RuleCache.get_rules() only the candidate rules of the
+    rule index are evaluated, and the search is recorded for the adaptive
+    evaluation order: where it stopped and, on sampled searches, how long
+    each rule took.
+    """
+    if not isinstance(rules, OrderedRules):
+        for rule in rules:
+            if _holds(rule, data):
+                return rule
+        return None
+
+    timings = [] if rules.should_time() else None
+    for position in rules.candidates(data):
+        rule = rules[position]
+        if timings is None:
+            matched = _holds(rule, data)
+        else:
+            started = time.perf_counter()
+            matched = _holds(rule, data)
+            timings.append((position, time.perf_counter() - started))
+        if matched:
+            rules.record(position, timings)
+            return rule
+    rules.record(len(rules), timings)
+    return None
+
+
+def _holds(rule, data):
+    try:
+        # Evaluate condition using only allowed data fields.
+        return eval(rule.code, {"__builtins__": None}, data)
+    except Exception as e:
+        print(f"Rule evaluation error: {e}")
+        return False
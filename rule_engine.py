@@ -0,0 +1,413 @@
+import ast
+import operator
+from functools import reduce
+
+import numpy as np
+
+from feature_extractor import convert_column
+from velocity_store import VELOCITY_FEATURES
+
+# Transaction fields rule conditions may reference in the vectorized engine
+KNOWN_FIELDS = [
+    "transaction_amount",
+    "transaction_channel",
+    "transaction_payment_mode_anonymous",
+    "payment_gateway_bank_anonymous",
+    "payer_browser_anonymous",
+    "transaction_hour",
+    "transaction_day",
+    "transaction_month",
+] + VELOCITY_FEATURES
+
+_COMPARE_OPS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_BIN_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+
+
+class UnsupportedCondition(ValueError):
+    """Raised when a rule condition uses syntax the vectorized engine does not handle."""
+
+
+######################################
+# Condition Compilation
+######################################
+
+def compile_mask(condition):
+    """Compile a rule condition into a function mapping batch columns to `(match, undecided)` masks.
+
+    Supported: comparisons (including chains), `and`/`or`/`not`, `in`/`not in`
+    against a literal list/tuple/set, and + - * / // % on KNOWN_FIELDS and
+    numeric constants. Values follow eval()'s semantics (`and`/`or` yield
+    an operand, comparisons count as 0/1 in arithmetic). Rows where a
+    referenced field is missing or not a number, or where a divisor is
+    zero, are marked undecided: eval() may raise there, or short-circuit
+    past the bad operand, so match_rules() evaluates those rows one by one.
+    """
+    tree = ast.parse(condition, mode="eval")
+    node_fn = _compile_node(tree.body)
+    fields = sorted({n.id for n in ast.walk(tree) if isinstance(n, ast.Name)})
+
+    def mask(columns):
+        invalid = [~columns.valid[field] for field in fields]
+        with np.errstate(all="ignore"):
+            result = np.asarray(node_fn(columns, invalid)) != 0
+        undecided = reduce(np.logical_or, invalid) if invalid else False
+        return (np.broadcast_to(result, (columns.size,)),
+                np.broadcast_to(undecided, (columns.size,)))
+
+    return mask
+
+
+def _compile_node(node):
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile_node(v) for v in node.values]
+        # `a and b` is a if a is falsy, else b; `a or b` is a if a is truthy, else b
+        keep_left = np.equal if isinstance(node.op, ast.And) else np.not_equal
+
+        def boolop(cols, inv):
+            value = parts[0](cols, inv)
+            for part in parts[1:]:
+                value = np.where(keep_left(value, 0), value, part(cols, inv))
+            return value
+        return boolop
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile_node(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda cols, inv: (np.asarray(operand(cols, inv)) == 0).astype(np.float64)
+        if isinstance(node.op, ast.USub):
+            return lambda cols, inv: -operand(cols, inv)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        raise UnsupportedCondition(f"unsupported unary operator {type(node.op).__name__}")
+
+    if isinstance(node, ast.BinOp):
+        op = _BIN_OPS.get(type(node.op))
+        if op is None:
+            raise UnsupportedCondition(f"unsupported operator {type(node.op).__name__}")
+        left = _compile_node(node.left)
+        right = _compile_node(node.right)
+        if op in (operator.truediv, operator.floordiv, operator.mod):
+            def divide(cols, inv):
+                divisor = right(cols, inv)
+                inv.append(np.asarray(divisor) == 0)
+                return op(left(cols, inv), divisor)
+            return divide
+        return lambda cols, inv: op(left(cols, inv), right(cols, inv))
+
+    if isinstance(node, ast.Compare):
+        left = _compile_node(node.left)
+        steps = []
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                steps.append((op, _literal_members(comparator), None))
+            elif type(op) in _COMPARE_OPS:
+                steps.append((op, None, _compile_node(comparator)))
+            else:
+                raise UnsupportedCondition(f"unsupported comparison {type(op).__name__}")
+
+        def compare(cols, inv):
+            lhs = left(cols, inv)
+            results = []
+            for op, members, rhs_fn in steps:
+                if members is not None:
+                    hit = np.isin(lhs, members)
+                    results.append(~hit if isinstance(op, ast.NotIn) else hit)
+                    continue
+                rhs = rhs_fn(cols, inv)
+                results.append(_COMPARE_OPS[type(op)](lhs, rhs))
+                lhs = rhs
+            # As numbers, so that arithmetic on comparisons counts like Python's True/False
+            return reduce(np.logical_and, results).astype(np.float64)
+
+        # A chained membership test would compare against the literal container itself.
+        if any(m is not None for _, m, _ in steps[:-1]):
+            raise UnsupportedCondition("membership test must be the last comparison")
+        return compare
+
+    if isinstance(node, ast.Name):
+        if node.id not in KNOWN_FIELDS:
+            raise UnsupportedCondition(f"unknown field {node.id}")
+        name = node.id
+        return lambda cols, inv: cols.values[name]
+
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (int, float)):
+            value = float(node.value)
+            if value != node.value:
+                raise UnsupportedCondition(f"constant {node.value!r} is not exact as a float")
+            return lambda cols, inv: value
+        raise UnsupportedCondition(f"unsupported constant {node.value!r}")
+
+    raise UnsupportedCondition(f"unsupported expression {type(node).__name__}")
+
+
+def _literal_members(node):
+    if not isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+        raise UnsupportedCondition("'in' requires a literal list, tuple or set")
+    members = []
+    for element in node.elts:
+        if not isinstance(element, ast.Constant) or not isinstance(element.value, (int, float)):
+            raise UnsupportedCondition("'in' list must contain only numbers")
+        if float(element.value) != element.value:
+            raise UnsupportedCondition(f"constant {element.value!r} is not exact as a float")
+        members.append(float(element.value))
+    return np.array(members, dtype=np.float64)
+
+
+######################################
+# Batch Columns
+######################################
+
+class BatchColumns:
+    """Known transaction fields as float64 columns plus a per-row validity mask.
+
+    A cell is valid when it holds a number (see
+    feature_extractor.convert_column). Fields already extracted into an
+    untruncated feature matrix (see FeatureExtractor.extract_batch) are
+    taken from it directly; any other known field is read from the
+    transaction dicts the first time a rule references it.
+    """
+
+    def __init__(self, transactions, features=None, numeric=None, feature_names=()):
+        self.size = len(transactions)
+        self.transactions = transactions
+        self.values = _ColumnDict(self._load)
+        self.valid = _ColumnDict(self._load)
+        extracted = {name: j for j, name in enumerate(feature_names)}
+        for field in KNOWN_FIELDS:
+            if field in extracted:
+                self.values[field] = features[:, extracted[field]]
+                self.valid[field] = numeric[:, extracted[field]]
+
+    def _load(self, field):
+        if field not in KNOWN_FIELDS:
+            raise KeyError(field)
+        values = np.empty(self.size, dtype=np.float64)
+        # Values float() rejects are not numeric, so they are left to eval() like missing ones
+        valid, _ = convert_column([data.get(field) for data in self.transactions], values)
+        self.values[field] = values
+        self.valid[field] = valid
+
+
+class _ColumnDict(dict):
+    # Builds a missing column on first access
+    def __init__(self, load):
+        super().__init__()
+        self._load = load
+
+    def __missing__(self, field):
+        self._load(field)
+        return self[field]
+
+
+######################################
+# First-Match Rule Evaluation
+######################################
+
+def match_rules(rules, transactions, columns=None, namespace=None):
+    """Return, for each transaction, the index of the first matching rule or -1.
+
+    Rules compiled by compile_mask are evaluated as one mask over `columns`
+    (built from the transactions if not given). Any other rule, and the rows
+    a mask leaves undecided, fall back to eval() against
+    `namespace(transaction)` on the rows no earlier rule matched, so both
+    paths give the same answer as rule_cache.first_matching_rule().
+    """
+    n = len(transactions)
+    if not rules or n == 0:
+        return np.full(n, -1, dtype=np.int64)
+
+    if columns is None:
+        columns = BatchColumns(transactions)
+    if namespace is None:
+        namespace = dict
+    masks = np.zeros((len(rules), n), dtype=bool)
+    matched = np.zeros(n, dtype=bool)
+    for i, rule in enumerate(rules):
+        rows = ~matched
+        if rule.mask is not None:
+            try:
+                hits, undecided = rule.mask(columns)
+                masks[i] = hits & ~undecided
+                rows &= undecided
+            except Exception as e:
+                print(f"Rule evaluation error: {e}")
+        for row in np.flatnonzero(rows):
+            try:
+                masks[i, row] = bool(eval(rule.code, {"__builtins__": None}, namespace(transactions[row])))
+            except Exception as e:
+                print(f"Rule evaluation error: {e}")
+        matched |= masks[i]
+
+    return np.where(matched, masks.argmax(axis=0), -1)
+
+
+######################################
+# Condition Constraints
+######################################
+
+class FieldConstraint:
+    """The values of one field a rule condition can still match.
+
+    A numeric interval (None for an open end), an optional set of allowed
+    values and a set of excluded values. Built from a condition's top-level
+    `and` terms, so it over-approximates the matching values: terms the
+    analysis does not understand simply add no constraint.
+    """
+
+    __slots__ = ("low", "low_inclusive", "high", "high_inclusive", "allowed", "excluded")
+
+    def __init__(self):
+        self.low = self.high = None
+        self.low_inclusive = self.high_inclusive = True
+        self.allowed = None
+        self.excluded = frozenset()
+
+    def copy(self):
+        other = FieldConstraint()
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def restrict_low(self, value, inclusive):
+        if self.low is None or value > self.low or (value == self.low and not inclusive):
+            self.low, self.low_inclusive = value, inclusive
+
+    def restrict_high(self, value, inclusive):
+        if self.high is None or value < self.high or (value == self.high and not inclusive):
+            self.high, self.high_inclusive = value, inclusive
+
+    def restrict_allowed(self, values):
+        values = frozenset(values)
+        self.allowed = values if self.allowed is None else self.allowed & values
+
+    def exclude(self, values):
+        self.excluded = self.excluded | frozenset(values)
+
+    def intersect(self, other):
+        result = self.copy()
+        if other.low is not None:
+            result.restrict_low(other.low, other.low_inclusive)
+        if other.high is not None:
+            result.restrict_high(other.high, other.high_inclusive)
+        if other.allowed is not None:
+            result.restrict_allowed(other.allowed)
+        result.exclude(other.excluded)
+        return result
+
+    def admits(self, value):
+        """Whether `value` satisfies the interval (non-numbers fail any bound, as eval() raises)."""
+        if self.low is None and self.high is None:
+            return True
+        if not isinstance(value, (int, float)):
+            return False
+        if self.low is not None and (value < self.low or (value == self.low and not self.low_inclusive)):
+            return False
+        if self.high is not None and (value > self.high or (value == self.high and not self.high_inclusive)):
+            return False
+        return True
+
+    def is_empty(self):
+        if self.allowed is not None:
+            return not any(value not in self.excluded and self.admits(value) for value in self.allowed)
+        if self.low is None or self.high is None:
+            return False
+        if self.low != self.high:
+            return self.low > self.high
+        return not (self.low_inclusive and self.high_inclusive) or self.low in self.excluded
+
+
+_FLIPPED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+_NO_CONSTANT = object()
+
+
+def _constant(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool, type(None))):
+        return node.value
+    if (isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd))
+            and isinstance(node.operand, ast.Constant) and isinstance(node.operand.value, (int, float))):
+        return -node.operand.value if isinstance(node.op, ast.USub) else node.operand.value
+    return _NO_CONSTANT
+
+
+def _conjuncts(node):
+    if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+        for value in node.values:
+            yield from _conjuncts(value)
+    else:
+        yield node
+
+
+def _constrain(constraints, field, op, value):
+    constraint = constraints.setdefault(field, FieldConstraint())
+    if isinstance(op, ast.Eq):
+        constraint.restrict_allowed([value])
+    elif isinstance(op, ast.NotEq):
+        constraint.exclude([value])
+    elif not isinstance(value, (int, float)) or isinstance(value, bool):
+        return
+    elif isinstance(op, (ast.Gt, ast.GtE)):
+        constraint.restrict_low(value, isinstance(op, ast.GtE))
+    elif isinstance(op, (ast.Lt, ast.LtE)):
+        constraint.restrict_high(value, isinstance(op, ast.LtE))
+
+
+def condition_constraints(condition):
+    """Map each field to the FieldConstraint its values must meet for `condition` to hold.
+
+    Only `field <op> constant` comparisons (either way round, chains
+    included) and `field in/not in [constants]` among the top-level `and`
+    terms are used. An empty dict means nothing could be inferred.
+    """
+    try:
+        tree = ast.parse(condition, mode="eval")
+    except SyntaxError:
+        return {}
+    constraints = {}
+    for term in _conjuncts(tree.body):
+        if not isinstance(term, ast.Compare):
+            continue
+        operands = [term.left] + term.comparators
+        for left, op, right in zip(operands, term.ops, operands[1:]):
+            if isinstance(op, (ast.In, ast.NotIn)):
+                if not isinstance(left, ast.Name) or not isinstance(right, (ast.List, ast.Tuple, ast.Set)):
+                    continue
+                members = [_constant(element) for element in right.elts]
+                if any(member is _NO_CONSTANT for member in members):
+                    continue
+                constraint = constraints.setdefault(left.id, FieldConstraint())
+                if isinstance(op, ast.In):
+                    constraint.restrict_allowed(members)
+                else:
+                    constraint.exclude(members)
+            elif type(op) in _FLIPPED:
+                if isinstance(left, ast.Name) and _constant(right) is not _NO_CONSTANT:
+                    _constrain(constraints, left.id, op, _constant(right))
+                elif isinstance(right, ast.Name) and _constant(left) is not _NO_CONSTANT:
+                    _constrain(constraints, right.id, _FLIPPED[type(op)](), _constant(left))
+    return constraints
+
+
+def constraints_disjoint(first, second):
+    """True if no transaction can satisfy both constraint maps (see condition_constraints)."""
+    for field, constraint in first.items():
+        other = second.get(field)
+        if (constraint if other is None else constraint.intersect(other)).is_empty():
+            return True
+    return any(constraint.is_empty() for constraint in second.values())
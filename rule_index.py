@@ -0,0 +1,102 @@
+import numbers
+from bisect import bisect_left, bisect_right
+
+_MISSING = object()
+
+
+class _Thresholds:
+    """Rules requiring `field > t` (or >=, <, <=), sorted by t so one bisect finds those that hold."""
+
+    def __init__(self, entries, lower):
+        entries = sorted(entries)
+        self.lower = lower
+        self.values = [t for t, _ in entries]
+        self.positions = [position for _, position in entries]
+
+    def holding(self, value, inclusive):
+        if self.lower:
+            # t < value, or t <= value for >=
+            end = (bisect_right if inclusive else bisect_left)(self.values, value)
+            return self.positions[:end]
+        # t > value, or t >= value for <=
+        start = (bisect_left if inclusive else bisect_right)(self.values, value)
+        return self.positions[start:]
+
+
+class RuleIndex:
+    """Per-field predicate index over rules in evaluation order.
+
+    Every rule is filed under one predicate its condition requires (see
+    rule_engine.condition_constraints): its allowed values in a hash table
+    for `==` and `in` tests, or its lower or upper bound in a sorted
+    threshold list for range tests. Rules with no such predicate are always
+    candidates, and rules that can never match are left out.
+    candidates(data) returns the positions, in evaluation order, of the
+    rules whose filed predicate holds for the transaction; no other rule
+    can match it, so searching only those finds the same first match.
+    """
+
+    def __init__(self, rules):
+        self.always = []
+        self.filed = [None] * len(rules)
+        equal = {}
+        bounds = {}
+        for position, rule in enumerate(rules):
+            entry = self._choose(rule.constraints)
+            if entry is None:
+                self.always.append(position)
+                continue
+            kind, field, key = entry
+            if kind == "never":
+                continue
+            self.filed[position] = field
+            if kind == "equal":
+                table = equal.setdefault(field, {})
+                for value in key:
+                    table.setdefault(value, []).append(position)
+            else:
+                bound, inclusive = key
+                bounds.setdefault((field, kind == "lower", inclusive), []).append((bound, position))
+        self.equal = list(equal.items())
+        self.thresholds = [
+            (field, inclusive, _Thresholds(entries, lower))
+            for (field, lower, inclusive), entries in sorted(bounds.items())
+        ]
+
+    @staticmethod
+    def _choose(constraints):
+        # The smallest allowed-value set if there is one, else a range bound
+        best = None
+        for field, constraint in sorted(constraints.items()):
+            if constraint.is_empty():
+                return "never", field, None
+            if constraint.allowed is not None:
+                values = [v for v in constraint.allowed if v not in constraint.excluded and constraint.admits(v)]
+                if best is None or best[0] != "equal" or len(values) < len(best[2]):
+                    best = ("equal", field, values)
+            elif best is None and constraint.low is not None:
+                best = ("lower", field, (constraint.low, constraint.low_inclusive))
+            elif best is None and constraint.high is not None:
+                best = ("upper", field, (constraint.high, constraint.high_inclusive))
+        return best
+
+    def candidates(self, data):
+        found = list(self.always)
+        for field, table in self.equal:
+            value = data.get(field, _MISSING)
+            if value is _MISSING:
+                continue
+            try:
+                found += table.get(value, ())
+            except TypeError:
+                # Unhashable values (lists, dicts) equal no constant
+                pass
+        for field, inclusive, thresholds in self.thresholds:
+            value = data.get(field, _MISSING)
+            if isinstance(value, numbers.Real):
+                found += thresholds.holding(value, inclusive)
+            elif not isinstance(value, (str, bytes, type(None))) and value is not _MISSING:
+                # Unknown types may define their own comparisons
+                found += thresholds.positions
+        found.sort()
+        return found
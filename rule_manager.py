@@ -1,84 +1,89 @@
 from flask import Flask, request, jsonify, render_template
-import sqlite3
 from flask_cors import CORS
+from db import get_pool, RULES_DB
+from fast_json import FastJSONProvider
+from asgi_server import asgi_app_from_env, asgi_enabled, serve
 
 # Initialize Flask app, set template folder to root
 app = Flask(__name__, template_folder='.')
 CORS(app)
+# orjson-backed jsonify and request.json when orjson is installed
+app.json = FastJSONProvider(app)
+
+# ASGI entry point (FRAUD_SERVER=asgi, or uvicorn rule_manager:asgi_app)
+asgi_app = asgi_app_from_env(app)
+
+# Pooled WAL-mode connections to the rules database
+rules_db = get_pool(RULES_DB)
 
 # Initialize the database
 def init_db():
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS fraud_rules (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        condition TEXT NOT NULL,
-                        action TEXT NOT NULL,
-                        enabled INTEGER DEFAULT 1
-                     )''')
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fraud_rules (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            condition TEXT NOT NULL,
+                            action TEXT NOT NULL,
+                            enabled INTEGER DEFAULT 1
+                         )''')
+        conn.commit()
 
 init_db()
 
 # Fetch all rules
 @app.route("/rules", methods=["GET"])
 def get_rules():
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM fraud_rules")
-    rules = [{"id": row[0], "condition": row[1], "action": row[2], "enabled": bool(row[3])} for row in cursor.fetchall()]
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM fraud_rules")
+        rules = [{"id": row[0], "condition": row[1], "action": row[2], "enabled": bool(row[3])} for row in cursor.fetchall()]
     return jsonify(rules)
 
 # Add a new rule
 @app.route("/rules", methods=["POST"])
 def add_rule():
     data = request.json
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute("INSERT INTO fraud_rules (condition, action, enabled) VALUES (?, ?, ?)",
-                   (data["condition"], data["action"], int(data.get("enabled", 1))))
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO fraud_rules (condition, action, enabled) VALUES (?, ?, ?)",
+                       (data["condition"], data["action"], int(data.get("enabled", 1))))
+        conn.commit()
     return jsonify({"message": "Rule added successfully"}), 201
 
 # Update an existing rule
 @app.route("/rules/<int:rule_id>", methods=["PUT"])
 def update_rule(rule_id):
     data = request.json
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
-    cursor.execute("UPDATE fraud_rules SET condition=?, action=?, enabled=? WHERE id=?",
-                   (data["condition"], data["action"], int(data["enabled"]), rule_id))
-    conn.commit()
-    conn.close()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE fraud_rules SET condition=?, action=?, enabled=? WHERE id=?",
+                       (data["condition"], data["action"], int(data["enabled"]), rule_id))
+        conn.commit()
     return jsonify({"message": "Rule updated successfully"})
 
 # Delete a rule and reorder IDs
 @app.route("/rules/<int:rule_id>", methods=["DELETE"])
 def delete_rule(rule_id):
-    conn = sqlite3.connect("rules.db")
-    cursor = conn.cursor()
+    with rules_db.connection() as conn:
+        cursor = conn.cursor()
 
-    # Delete the selected rule
-    cursor.execute("DELETE FROM fraud_rules WHERE id=?", (rule_id,))
-    conn.commit()
+        # Delete the selected rule
+        cursor.execute("DELETE FROM fraud_rules WHERE id=?", (rule_id,))
+        conn.commit()
 
-    # Retrieve remaining rules sorted by ID
-    cursor.execute("SELECT * FROM fraud_rules ORDER BY id")
-    rules = cursor.fetchall()
+        # Retrieve remaining rules sorted by ID
+        cursor.execute("SELECT * FROM fraud_rules ORDER BY id")
+        rules = cursor.fetchall()
 
-    # Reset the entire table and re-insert with new sequential IDs
-    cursor.execute("DELETE FROM fraud_rules")
-    cursor.execute("DELETE FROM sqlite_sequence WHERE name='fraud_rules'")  # Reset auto-increment
+        # Reset the entire table and re-insert with new sequential IDs
+        cursor.execute("DELETE FROM fraud_rules")
+        cursor.execute("DELETE FROM sqlite_sequence WHERE name='fraud_rules'")  # Reset auto-increment
 
-    for index, rule in enumerate(rules, start=1):
-        cursor.execute("INSERT INTO fraud_rules (id, condition, action, enabled) VALUES (?, ?, ?, ?)", 
-                       (index, rule[1], rule[2], rule[3]))
+        for index, rule in enumerate(rules, start=1):
+            cursor.execute("INSERT INTO fraud_rules (id, condition, action, enabled) VALUES (?, ?, ?, ?)", 
+                           (index, rule[1], rule[2], rule[3]))
 
-    conn.commit()
-    conn.close()
+        conn.commit()
     return jsonify({"message": "Rule deleted and IDs reordered successfully"})
 
 # Serve the frontend
@@ -86,6 +91,9 @@ def delete_rule(rule_id):
 def index():
     return render_template("index.html")
 
-# Run the app
+# Run the app, or uvicorn with FRAUD_SERVER=asgi
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    if asgi_enabled():
+        serve(asgi_app, port=5000)
+    else:
+        app.run(debug=True, port=5000)
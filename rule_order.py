@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import threading
+
+import numpy as np
+
+from rule_engine import constraints_disjoint
+from rule_index import RuleIndex
+
+# Rule evaluation orders: "id" evaluates rules in id order, "adaptive"
+# evaluates cheap rules that decide many transactions first
+RULE_ORDER_POLICIES = ("id", "adaptive")
+
+# Cost assumed for a rule before any evaluation of it has been timed, in seconds
+DEFAULT_RULE_COST = 1e-6
+
+# Below this many rules, evaluating them all is cheaper than an index lookup
+INDEX_MIN_RULES = 8
+
+
+class OrderedRules(list):
+    """Rules in evaluation order, counting where first_matching_rule() stops.
+
+    Each search records the position of the rule that matched (len(self)
+    when none did); every `sample_every`-th search also times each rule it
+    evaluates. drain() hands the counts to RuleStats. With `indexed`, a
+    RuleIndex limits each search to the rules that could match (once there
+    are INDEX_MIN_RULES rules).
+    """
+
+    def __init__(self, rules=(), sample_every=64, indexed=False):
+        super().__init__(rules)
+        self.sample_every = sample_every
+        self.index = RuleIndex(self) if indexed and len(self) >= INDEX_MIN_RULES else None
+        self.searches = 0
+        self._stops = [0] * (len(self) + 1)
+        self._seconds = [0.0] * len(self)
+        self._timed = [0] * len(self)
+        self._ticket = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def should_time(self):
+        return next(self._ticket) % self.sample_every == 0
+
+    def candidates(self, data):
+        """Positions of the rules to evaluate for the transaction dict, in order."""
+        if self.index is None:
+            return range(len(self))
+        return self.index.candidates(data)
+
+    def record(self, position, timings=None):
+        """Record a search that stopped at `position`, with (position, seconds) per timed rule."""
+        with self._lock:
+            self.searches += 1
+            self._stops[position] += 1
+            if timings:
+                for i, seconds in timings:
+                    self._seconds[i] += seconds
+                    self._timed[i] += 1
+
+    def record_matches(self, matches):
+        """Record a batch of first-match positions from match_rules() (-1 for no match)."""
+        # -1 lands in the last bin, the "no rule matched" count
+        stops = np.bincount(np.where(matches < 0, len(self), matches), minlength=len(self) + 1)
+        with self._lock:
+            self.searches += len(matches)
+            self._stops = [a + b for a, b in zip(self._stops, stops.tolist())]
+
+    def drain(self):
+        """Return and reset (stops, seconds, timed) per position."""
+        with self._lock:
+            counts = (self._stops, self._seconds, self._timed)
+            self._stops = [0] * (len(self) + 1)
+            self._seconds = [0.0] * len(self)
+            self._timed = [0] * len(self)
+        return counts
+
+
+def rule_key(rule):
+    # Statistics follow a rule's condition and action, not its id, which a DELETE renumbers
+    return rule.condition, rule.action
+
+
+class RuleStats:
+    """Per-rule match counts and sampled evaluation times, kept across rule reloads.
+
+    For each rule: `seen` transactions were searched while it was enabled,
+    `evaluations` of them reached it, `matches` were decided by it, and
+    `timed` evaluations took `seconds` in total.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}
+
+    def merge(self, ordered):
+        stops, seconds, timed = ordered.drain()
+        searched = sum(stops)
+        reached = searched
+        with self._lock:
+            for position, rule in enumerate(ordered):
+                entry = self._rules.setdefault(rule_key(rule), [0, 0, 0, 0.0, 0])
+                entry[0] += searched
+                entry[1] += reached
+                entry[2] += stops[position]
+                entry[3] += seconds[position]
+                entry[4] += timed[position]
+                reached -= stops[position]
+
+    def get(self, rule):
+        with self._lock:
+            seen, evaluations, matches, seconds, timed = self._rules.get(rule_key(rule), (0, 0, 0, 0.0, 0))
+        return {"seen": seen, "evaluations": evaluations, "matches": matches, "seconds": seconds, "timed": timed}
+
+    def estimates(self, rules):
+        """(cost in seconds, probability of deciding a transaction) for each rule."""
+        stats = [self.get(rule) for rule in rules]
+        timed = [s["seconds"] / s["timed"] for s in stats if s["timed"]]
+        default_cost = sum(timed) / len(timed) if timed else DEFAULT_RULE_COST
+        return [
+            (s["seconds"] / s["timed"] if s["timed"] else default_cost,
+             # Smoothed so unseen rules neither dominate nor vanish
+             (s["matches"] + 0.5) / (s["seen"] + 1.0))
+            for s in stats
+        ]
+
+
+def precedence(rules):
+    """For rules in id order, the indices of the earlier rules each one must still follow.
+
+    A later rule may overtake an earlier one only when no transaction can
+    match both (their conditions are provably disjoint) or when both have
+    the same action, and so the same result. Any order that keeps these
+    pairs returns a first match with the same action as id order.
+    """
+    before = []
+    for j, later in enumerate(rules):
+        before.append([
+            i for i, earlier in enumerate(rules[:j])
+            if earlier.action != later.action and not constraints_disjoint(earlier.constraints, later.constraints)
+        ])
+    return before
+
+
+def plan_order(rules, before, estimates):
+    """Evaluation order for `rules` (in id order) with the lowest expected cost.
+
+    Among the rules whose predecessors (see precedence()) are placed, the
+    one with the lowest cost per unit of match probability goes next, ties
+    broken by id. For mutually disjoint rules that is the order minimising
+    the expected evaluation cost; elsewhere it is a greedy approximation.
+    """
+    waiting = [len(b) for b in before]
+    after = [[] for _ in rules]
+    for j, earlier in enumerate(before):
+        for i in earlier:
+            after[i].append(j)
+    ready = [(estimates[j][0] / estimates[j][1], j) for j in range(len(rules)) if not waiting[j]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, i = heapq.heappop(ready)
+        order.append(i)
+        for j in after[i]:
+            waiting[j] -= 1
+            if not waiting[j]:
+                heapq.heappush(ready, (estimates[j][0] / estimates[j][1], j))
+    return order
+
+
+def expected_cost(order, estimates):
+    """Expected seconds spent evaluating rules per transaction when rules run in `order`."""
+    total = 0.0
+    reached = 1.0
+    for i in order:
+        cost, probability = estimates[i]
+        total += cost * reached
+        reached = max(0.0, reached - probability)
+    return total
@@ -0,0 +1,117 @@
+import numpy as np
+
+from feature_extractor import FeatureError
+from metrics import NULL_TIMER
+from rule_engine import BatchColumns, match_rules
+from rule_order import OrderedRules
+
+
+def predict_fraud_scores(model, features, chunk_size=None):
+    """Return the fraud probability for every row of a feature matrix.
+
+    All rows are scored with a single predict_proba call, or with one call per
+    `chunk_size` rows when a positive chunk size is given, to bound peak memory.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float64)
+    n = len(features)
+    if n == 0:
+        return np.empty(0, dtype=np.float64)
+    if not chunk_size or chunk_size <= 0 or chunk_size >= n:
+        return model.predict_proba(features)[:, 1]
+
+    scores = np.empty(n, dtype=np.float64)
+    for start in range(0, n, chunk_size):
+        stop = start + chunk_size
+        scores[start:stop] = model.predict_proba(features[start:stop])[:, 1]
+    return scores
+
+
+# Response bodies shared by the single and batch detection endpoints
+def rule_result(transaction_id, rule):
+    return {
+        "transaction_id": transaction_id,
+        "is_fraud": rule.is_fraud,
+        "fraud_source": "rule",
+        "fraud_reason": rule.action,
+        "fraud_score": 1.0 if rule.is_fraud else 0.0
+    }
+
+
+def model_result(transaction_id, score):
+    return {
+        "transaction_id": transaction_id,
+        "is_fraud": bool(score > 0.5),
+        "fraud_source": "model",
+        "fraud_reason": "Predicted by AI",
+        "fraud_score": round(float(score), 2)
+    }
+
+
+def score_transactions(transactions, rules, feature_extractor, preprocessor, model, chunk_size=None,
+                       timer=NULL_TIMER, with_scores=False):
+    """Rules-then-model results for a list of transaction dicts, in input order.
+
+    Each rule is evaluated as one mask over the batch (first match wins) and
+    every row no rule matched is scored by the model in a single call.
+    Stage times, rule hits and decisions are recorded through `timer`.
+    With `with_scores`, returns `(results, scores)` where `scores` holds
+    each row's unrounded model score (NaN where a rule decided).
+    """
+    # Convert every transaction to features in one pass; rules see the raw values,
+    # only the model's copy is truncated like int()
+    features, numeric = feature_extractor.extract_batch(transactions, truncate=False)
+    timer.lap("feature_build")
+
+    columns = BatchColumns(transactions, features, numeric, feature_extractor.feature_names)
+    matches = match_rules(rules, transactions, columns, feature_extractor.rule_namespace)
+    timer.lap("rule_eval")
+    timer.metrics.rule_matches(rules, matches)
+    if isinstance(rules, OrderedRules):
+        # Hit counts for the adaptive rule order (see RuleCache)
+        rules.record_matches(matches)
+
+    results = [None] * len(transactions)
+    for i in np.flatnonzero(matches >= 0):
+        results[i] = rule_result(transactions[i].get("transaction_id", "unknown"), rules[matches[i]])
+
+    pending = np.flatnonzero(matches < 0)
+    model_features = preprocessor.transform(
+        [transactions[i] for i in pending], feature_extractor.truncate(features[pending])
+    )
+    timer.lap("preprocess")
+    scores = predict_fraud_scores(model, model_features, chunk_size)
+    timer.lap("predict_proba")
+    timer.metrics.model_scores(scores)
+    for i, score in zip(pending, scores):
+        results[i] = model_result(transactions[i].get("transaction_id", "unknown"), score)
+    if with_scores:
+        raw_scores = np.full(len(transactions), np.nan)
+        raw_scores[pending] = scores
+        return results, raw_scores
+    return results
+
+
+def score_valid_transactions(transactions, rules, feature_extractor, preprocessor, model, chunk_size=None,
+                             timer=NULL_TIMER):
+    """score_transactions() for a batch that may hold rows with invalid feature values.
+
+    Returns `(results, scores, errors)`: the valid rows are scored as usual
+    (see score_transactions with `with_scores`), each invalid row gets None
+    in `results`, NaN in `scores` and a message in `errors`, keyed by its
+    index in `transactions`.
+    """
+    try:
+        results, scores = score_transactions(transactions, rules, feature_extractor, preprocessor, model,
+                                             chunk_size, timer, with_scores=True)
+        return results, scores, {}
+    except FeatureError as e:
+        errors = e.by_row()
+    valid = [i for i in range(len(transactions)) if i not in errors]
+    scored, valid_scores = score_transactions([transactions[i] for i in valid], rules, feature_extractor,
+                                              preprocessor, model, chunk_size, timer, with_scores=True)
+    results = [None] * len(transactions)
+    for i, result in zip(valid, scored):
+        results[i] = result
+    scores = np.full(len(transactions), np.nan)
+    scores[valid] = valid_scores
+    return results, scores, errors
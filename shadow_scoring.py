@@ -0,0 +1,239 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from model_registry import load_version, warm
+from scoring import predict_fraud_scores
+
+logger = logging.getLogger("shadow_scoring")
+
+SHADOW_TABLE = """
+    CREATE TABLE IF NOT EXISTS shadow_scores (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT,
+        primary_version TEXT,
+        candidate_version TEXT,
+        primary_score REAL,
+        candidate_score REAL,
+        score_delta REAL,
+        primary_is_fraud INTEGER,
+        candidate_is_fraud INTEGER,
+        latency_ms REAL,
+        queue_ms REAL,
+        scored_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+SHADOW_INDEX = (
+    "CREATE INDEX IF NOT EXISTS idx_shadow_scores_versions ON shadow_scores (candidate_version, primary_version)"
+)
+
+INSERT_SHADOW_SQL = """
+    INSERT INTO shadow_scores
+        (transaction_id, primary_version, candidate_version, primary_score, candidate_score, score_delta,
+         primary_is_fraud, candidate_is_fraud, latency_ms, queue_ms)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+SUMMARY_SQL = """
+    SELECT candidate_version, primary_version, COUNT(*),
+           AVG(primary_is_fraud = candidate_is_fraud),
+           SUM(primary_is_fraud AND NOT candidate_is_fraud),
+           SUM(candidate_is_fraud AND NOT primary_is_fraud),
+           AVG(score_delta), AVG(ABS(score_delta)), MAX(ABS(score_delta)),
+           AVG(latency_ms), MAX(latency_ms), AVG(queue_ms),
+           MIN(scored_at), MAX(scored_at)
+    FROM shadow_scores
+    GROUP BY candidate_version, primary_version
+    ORDER BY MAX(scored_at) DESC
+"""
+
+SUMMARY_COLUMNS = [
+    "candidate_version", "primary_version", "compared", "agreement_rate", "missed_fraud", "extra_fraud",
+    "avg_score_delta", "avg_abs_score_delta", "max_abs_score_delta", "avg_latency_ms", "max_latency_ms",
+    "avg_queue_ms", "first_scored_at", "last_scored_at",
+]
+
+
+def create_shadow_table(conn):
+    conn.execute(SHADOW_TABLE)
+    conn.execute(SHADOW_INDEX)
+
+
+def shadow_summary(conn):
+    """Agreement, score deltas and latency per (candidate, primary) version pair, most recent first.
+
+    missed_fraud counts transactions the primary model flagged and the
+    candidate did not; extra_fraud the reverse. Deltas are candidate minus
+    primary score.
+    """
+    return [dict(zip(SUMMARY_COLUMNS, row)) for row in conn.execute(SUMMARY_SQL)]
+
+
+class ShadowScorer:
+    """Score model-decided transactions with a candidate model, off the request path.
+
+    submit() queues a transaction the primary model scored and returns at
+    once; when `max_queue_size` items are already waiting the item is
+    dropped and counted, so the primary path never waits on the shadow.
+    `workers` background threads each take up to `max_batch_size` queued
+    items, build their features with the candidate's own extractor and
+    preprocessor (it may have been trained with different encoders or a
+    different scaler), score them in one call and write one shadow_scores
+    row per item with the primary and candidate scores and decisions.
+    latency_ms is the item's share of the batch's scoring time and queue_ms
+    how long it waited to be picked up.
+    """
+
+    def __init__(self, candidate, pool, workers=1, max_queue_size=1000, max_batch_size=256, flush_interval=0.05):
+        self.candidate = candidate
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "dropped": 0,
+            "scored": 0,
+            "failed": 0,
+            "batches": 0,
+            "agreements": 0,
+            "disagreements": 0,
+            "abs_score_delta_sum": 0.0,
+            "scoring_seconds": 0.0,
+            "queue_wait_seconds": 0.0,
+        }
+        with pool.connection() as conn:
+            create_shadow_table(conn)
+            conn.commit()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"shadow-scorer-{i}", daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def submit(self, data, result, primary_score, primary_version):
+        """Queue a scored transaction for the candidate; rule decisions are skipped.
+
+        `primary_score` is the primary model's unrounded score, which the
+        candidate's score is compared with (the response holds it rounded).
+        """
+        if result["fraud_source"] != "model":
+            return
+        try:
+            self._queue.put_nowait((data, result, float(primary_score), primary_version, time.perf_counter()))
+        except queue.Full:
+            self._count("dropped")
+            return
+        self._count("submitted")
+
+    def submit_many(self, transactions, results, primary_scores, primary_version):
+        for data, result, primary_score in zip(transactions, results, primary_scores):
+            self.submit(data, result, primary_score, primary_version)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score(self, batch):
+        candidate = self.candidate
+        records = [data for data, _, _, _, _ in batch]
+        features, _ = candidate.feature_extractor.extract_batch(records)
+        scores = predict_fraud_scores(candidate.model, candidate.preprocessor.transform(records, features))
+        return candidate.version, scores
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                version, scores = self._score(batch)
+            except Exception as e:
+                logger.error(f"Shadow scoring of {len(batch)} transactions failed: {e}")
+                self._count("failed", len(batch))
+                continue
+            finished = time.perf_counter()
+            latency_ms = (finished - started) * 1000.0 / len(batch)
+
+            rows = []
+            agreements = 0
+            abs_delta = 0.0
+            for (data, result, primary_score, primary_version, enqueued), score in zip(batch, scores):
+                score = float(score)
+                candidate_is_fraud = score > 0.5
+                agreements += candidate_is_fraud == bool(result["is_fraud"])
+                abs_delta += abs(score - primary_score)
+                rows.append((
+                    result["transaction_id"], primary_version, version, primary_score, score,
+                    score - primary_score, int(result["is_fraud"]), int(candidate_is_fraud),
+                    latency_ms, (started - enqueued) * 1000.0,
+                ))
+            try:
+                with self.pool.connection() as conn:
+                    conn.executemany(INSERT_SHADOW_SQL, rows)
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"Failed to persist {len(rows)} shadow scores: {e}")
+                self._count("failed", len(rows))
+                continue
+
+            with self._stats_lock:
+                stats = self._stats
+                stats["scored"] += len(batch)
+                stats["batches"] += 1
+                stats["agreements"] += agreements
+                stats["disagreements"] += len(batch) - agreements
+                stats["abs_score_delta_sum"] += abs_delta
+                stats["scoring_seconds"] += finished - started
+                stats["queue_wait_seconds"] += sum(started - enqueued for _, _, _, _, enqueued in batch)
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["agreement_rate"] = stats["agreements"] / stats["scored"] if stats["scored"] else None
+        stats["avg_latency_ms"] = stats["scoring_seconds"] * 1000.0 / stats["scored"] if stats["scored"] else None
+        stats["candidate_version"] = self.candidate.version
+        stats["config"] = {
+            "workers": len(self._threads),
+            "max_queue_size": self._queue.maxsize,
+            "max_batch_size": self.max_batch_size,
+        }
+        return stats
+
+
+def shadow_scorer_from_env(pool):
+    """Build a ShadowScorer when FRAUD_SHADOW_MODEL names a model registry version.
+
+    FRAUD_SHADOW_WORKERS (default 1), FRAUD_SHADOW_QUEUE_SIZE (default 1000)
+    and FRAUD_SHADOW_MAX_BATCH (default 256) tune the worker pool. Returns
+    None when shadow scoring is disabled.
+    """
+    version = os.environ.get("FRAUD_SHADOW_MODEL")
+    if not version:
+        return None
+    candidate = load_version(version)
+    warm(candidate)
+    return ShadowScorer(
+        candidate,
+        pool,
+        workers=int(os.environ.get("FRAUD_SHADOW_WORKERS", 1)),
+        max_queue_size=int(os.environ.get("FRAUD_SHADOW_QUEUE_SIZE", 1000)),
+        max_batch_size=int(os.environ.get("FRAUD_SHADOW_MAX_BATCH", 256)),
+    )
@@ -1,62 +1,69 @@
-import pandas as pd
+import os
+
 import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from imblearn.over_sampling import SMOTE
+from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
+from preprocessing import NUMERICAL_FEATURES
+from feature_extractor import FeatureExtractor
+from rebalance import rebalancer_from_env
+from training_data import (StageReport, encode_categoricals, feature_matrix, fill_missing_amounts,
+                           read_training_columns, standardize)
 
-# Load dataset (update the path to where you saved transactions_train.csv)
-df = pd.read_csv("transactions_train.csv")
+# Wall time and peak memory are printed after each stage
+report = StageReport()
 
-# Fill missing values and drop sparse column
-df['transaction_amount'].fillna(df['transaction_amount'].median(), inplace=True)
-df.drop(columns=['payer_mobile_anonymous'], inplace=True)
-
-# Extract date-time features
-df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-df['transaction_hour'] = df['transaction_date'].dt.hour
-df['transaction_day'] = df['transaction_date'].dt.day
-df['transaction_month'] = df['transaction_date'].dt.month
-df.drop(columns=['transaction_date'], inplace=True)
+# Load dataset (update the path to where you saved transactions_train.csv)
+with report.stage("read_csv"):
+    columns = read_training_columns("transactions_train.csv")
+    fill_missing_amounts(columns)
 
 # Encode categorical features
-categorical_features = ['transaction_channel', 'payer_browser_anonymous', 'transaction_payment_mode_anonymous', 'payment_gateway_bank_anonymous']
-label_encoders = {col: LabelEncoder() for col in categorical_features}
-for col in categorical_features:
-    df[col] = label_encoders[col].fit_transform(df[col])
-
-# Drop non-informative columns
-df.drop(columns=['transaction_id_anonymous', 'payee_id_anonymous', 'payer_email_anonymous', 'payee_ip_anonymous'], inplace=True)
+with report.stage("encode"):
+    encode_categoricals(columns)
 
-# Define features and target
-X = df.drop(columns=['is_fraud'])
-y = df['is_fraud']
+# Define features (in the same order the serving code uses) and target
+feature_extractor = FeatureExtractor()
+with report.stage("feature_matrix"):
+    X = feature_matrix(columns, feature_extractor.feature_names)
+    y = columns["is_fraud"]
+    del columns
 
-print("Original class distribution:\n", y.value_counts())
+print("Original class distribution:\n", pd.Series(y).value_counts())
 
 # Split data into training and test sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+with report.stage("split"):
+    train_rows, test_rows = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42, stratify=y)
+    X_train, X_test, y_train, y_test = X[train_rows], X[test_rows], y[train_rows], y[test_rows]
+    del X, y
 
 # Standardize numerical features
-scaler = StandardScaler()
-numerical_features = ['transaction_amount', 'transaction_hour', 'transaction_day', 'transaction_month']
-X_train[numerical_features] = scaler.fit_transform(X_train[numerical_features])
-X_test[numerical_features] = scaler.transform(X_test[numerical_features])
+numerical_columns = [feature_extractor.feature_names.index(name) for name in NUMERICAL_FEATURES]
+with report.stage("scale"):
+    scaler = StandardScaler()
+    standardize(X_train, scaler, numerical_columns, NUMERICAL_FEATURES, fit=True)
+    standardize(X_test, scaler, numerical_columns, NUMERICAL_FEATURES)
 
-# Apply SMOTE for class balancing
-smote = SMOTE(random_state=42)
-X_train_smote, y_train_smote = smote.fit_resample(X_train, y_train)
+# Apply SMOTE for class balancing (FRAUD_REBALANCE=hybrid or undersample to compare, see rebalance.py)
+with report.stage("rebalance"):
+    X_train_smote, y_train_smote = rebalancer_from_env("smote").fit_resample(X_train, y_train)
+    del X_train, y_train
 
-print("Resampled class distribution:\n", y_train_smote.value_counts())
+print("Resampled class distribution:\n", pd.Series(y_train_smote).value_counts())
 
 # Train Random Forest Classifier
-clf_smote = RandomForestClassifier(n_estimators=100, random_state=42)
-clf_smote.fit(X_train_smote, y_train_smote)
+with report.stage("fit"):
+    clf_smote = RandomForestClassifier(n_estimators=100, random_state=42,
+                                       n_jobs=int(os.environ.get("FRAUD_TRAIN_JOBS", -1)))
+    clf_smote.fit(X_train_smote, y_train_smote)
 
 # Evaluate on the test set
-y_pred_smote = clf_smote.predict(X_test)
+with report.stage("evaluate"):
+    y_pred_smote = clf_smote.predict(X_test)
 
 # Print performance metrics
 print("\nConfusion Matrix:\n", confusion_matrix(y_test, y_pred_smote))
 print("\nClassification Report:\n", classification_report(y_test, y_pred_smote))
+print(report.summary())
@@ -0,0 +1,93 @@
+import csv
+
+from fast_json import dumps, loads
+
+# Rows scored together when streaming an upload
+DEFAULT_CHUNK_ROWS = 1000
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def upload_format(content_type, requested=None):
+    """'csv' or 'ndjson', from ?format= or the request Content-Type."""
+    if requested:
+        requested = requested.lower()
+        if requested not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported format {requested!r}, expected csv or ndjson")
+        return requested
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    return "ndjson"
+
+
+def iter_lines(stream):
+    """Decoded lines from a binary stream, read one line at a time."""
+    for line in iter(stream.readline, b""):
+        yield line.decode("utf-8")
+
+
+def _parse_cell(value):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def read_csv(stream, numeric_fields=()):
+    """Yield one dict per CSV row; the first row is the header.
+
+    Empty cells are left out, so they get the same defaults as missing JSON
+    fields. Cells in `numeric_fields` are parsed as int or float when they
+    look like numbers.
+    """
+    numeric_fields = set(numeric_fields)
+    reader = csv.reader(iter_lines(stream))
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.lstrip("\ufeff").strip() for name in header]
+    for row in reader:
+        if not row:
+            continue
+        record = {}
+        for name, value in zip(header, row):
+            value = value.strip()
+            if value == "":
+                continue
+            record[name] = _parse_cell(value) if name in numeric_fields else value
+        yield record
+
+
+def read_ndjson(stream):
+    """Yield one dict per non-blank line of newline-delimited JSON."""
+    for number, line in enumerate(iter_lines(stream), start=1):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number} is not a JSON object")
+        yield record
+
+
+def chunked(records, size):
+    """Group an iterable of records into lists of at most `size`."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def ndjson_line(obj):
+    return dumps(obj) + "\n"
@@ -0,0 +1,30 @@
+import importlib
+import os
+import shutil
+import sys
+
+import pytest
+
+# The services are flat modules in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# What the detection service loads from its working directory
+SERVICE_FILES = ["rules.db", "fraud_detection.db", "fraud_model.pkl", "scaler.pkl", "label_encoders.pkl",
+                 "model_features.pkl"]
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    # Run the service against copies of its databases and model files
+    workdir = tmp_path_factory.mktemp("service")
+    for name in SERVICE_FILES:
+        shutil.copy2(os.path.join(ROOT, name), workdir)
+    shutil.copytree(os.path.join(ROOT, "model_artifacts"), workdir / "model_artifacts")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        service = importlib.import_module("fraud_detection_api")
+        yield service.app.test_client()
+    finally:
+        os.chdir(cwd)
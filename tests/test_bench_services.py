@@ -0,0 +1,31 @@
+import json
+
+from bench_services import InProcessClient, compare, run_load
+
+GOOD = {"transaction_id": "BENCH_OK", "transaction_amount": 120.0, "transaction_channel": "online",
+        "transaction_payment_mode_anonymous": 1, "payment_gateway_bank_anonymous": 2, "payer_browser_anonymous": 1,
+        "transaction_hour": 12, "transaction_day": 3, "transaction_month": 4}
+BAD = dict(GOOD, transaction_id="BENCH_BAD", transaction_amount="abc")
+
+
+def test_error_bodies_with_status_200_count_as_errors(client):
+    bench = InProcessClient(client.application)
+    bodies = [json.dumps(GOOD).encode(), json.dumps(BAD).encode()]
+    # The handler answers the invalid row with status 200 and an "error" key
+    assert bench.post("/detect_fraud", bodies[1])[0] == 200
+
+    latencies, errors, _ = run_load(bench, "/detect_fraud", lambda i: bodies[i % 2], 6, 2)
+
+    assert len(latencies) == 6 and errors == 3
+
+    batch = json.dumps({"transactions": [GOOD, BAD]}).encode()
+    assert run_load(bench, "/detect_fraud_batch", lambda i: batch, 2, 1)[1] == 2
+
+
+def test_more_errors_than_the_baseline_is_a_regression():
+    run = {"scenario": "detect_fraud", "batch_size": 1, "concurrency": 1, "errors": 5,
+           "latency_ms": {"p95": 1.0}, "requests_per_second": 100.0}
+    baseline = {"results": [dict(run, errors=0)]}
+
+    assert compare([run], baseline, 0.10) == [run]
+    assert compare([dict(run, errors=0)], baseline, 0.10) == []
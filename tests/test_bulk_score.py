@@ -0,0 +1,38 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from bulk_score import bulk_score
+from conftest import ROOT
+from model_registry import load_version
+
+ROWS = """transaction_id,transaction_amount,transaction_channel,transaction_payment_mode_anonymous,payment_gateway_bank_anonymous,payer_browser_anonymous,transaction_hour,transaction_day,transaction_month
+A,120.5,online,1,2,1,12,3,4
+B,abc,mobile,1,2,1,12,3,4
+C,2000000,pos,1,2,1,12,3,4
+D,40,online,1,2,1,12,3,4
+"""
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_invalid_rows_are_reported_and_the_run_continues(tmp_path, monkeypatch, workers):
+    # The model files are read from the repository, as from a service's working directory
+    monkeypatch.chdir(ROOT)
+    rules_db = shutil.copy(os.path.join(ROOT, "rules.db"), tmp_path)
+    source = tmp_path / "input.csv"
+    source.write_text(ROWS)
+    output = tmp_path / "scored.csv"
+
+    summary = bulk_score(str(source), str(output), workers=workers, chunk_rows=2,
+                         rules_db=rules_db)
+
+    scored = pd.read_csv(output)
+    assert list(scored["transaction_id"]) == ["A", "B", "C", "D"]
+    assert scored["error"].notna().tolist() == [False, True, False, False]
+    assert scored.loc[2, "fraud_source"] == "rule"
+    assert summary["rows"] == 4 and summary["invalid_rows"] == 1
+    assert summary["errors"] == [{"offset": 1, "error": "Invalid feature values: transaction_amount='abc'"}]
+    # The version the services would serve from this directory
+    assert summary["model_version"] == load_version().version
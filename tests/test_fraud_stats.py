@@ -0,0 +1,67 @@
+import sqlite3
+
+import pytest
+
+from fraud_stats import RETENTION, ensure_fraud_stats, fraud_buckets, fraud_totals
+
+TRANSACTIONS_TABLE = """
+    CREATE TABLE transactions (
+        transaction_id TEXT PRIMARY KEY,
+        transaction_amount REAL,
+        is_fraud INTEGER,
+        fraud_source TEXT,
+        fraud_reason TEXT,
+        fraud_score REAL,
+        transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(TRANSACTIONS_TABLE)
+    assert ensure_fraud_stats(conn)
+    yield conn
+    conn.close()
+
+
+def _insert(conn, transaction_id, age):
+    conn.execute("""
+        INSERT INTO transactions (transaction_id, transaction_amount, is_fraud, fraud_source, fraud_score,
+                                  transaction_date)
+        VALUES (?, 100, 1, 'rule', 1.0, datetime('now', ?))
+    """, (transaction_id, age))
+
+
+def _sizes(conn):
+    rows = conn.execute("SELECT bucket_size, COUNT(*) FROM fraud_stats WHERE transactions != 0 GROUP BY 1")
+    return dict(rows.fetchall())
+
+
+def test_old_transactions_only_reach_the_buckets_still_kept(conn):
+    _insert(conn, "new", "-1 minutes")
+    _insert(conn, "week", "-8 days")
+    _insert(conn, "quarter", "-100 days")
+    assert _sizes(conn) == {"minute": 1, "hour": 2, "day": 3, "all": 1}
+    assert fraud_totals(conn)["total_transactions"] == 3
+
+
+def test_expired_buckets_are_pruned_on_insert(conn):
+    conn.execute("INSERT INTO fraud_stats VALUES ('minute', '2000-01-01 00:00:00', 'rule', 'online', 5, 5, 1, 5)")
+    conn.execute("INSERT INTO fraud_stats VALUES ('day', '2000-01-01 00:00:00', 'rule', 'online', 5, 5, 1, 5)")
+    _insert(conn, "new", "-1 minutes")
+    assert conn.execute("SELECT COUNT(*) FROM fraud_stats WHERE bucket_start LIKE '2000-%'").fetchone()[0] == 0
+
+
+def test_deleting_an_expired_transaction_does_not_recreate_its_bucket(conn):
+    _insert(conn, "quarter", "-100 days")
+    conn.execute("DELETE FROM transactions WHERE transaction_id = 'quarter'")
+    assert conn.execute("SELECT COUNT(*) FROM fraud_stats WHERE transactions < 0").fetchone()[0] == 0
+    assert fraud_totals(conn)["total_transactions"] == 0
+
+
+def test_window_is_limited_to_the_retention(conn):
+    assert fraud_buckets(conn, "hour", RETENTION["hour"]) == []
+    with pytest.raises(ValueError):
+        fraud_buckets(conn, "minute", RETENTION["minute"] + 1)
@@ -0,0 +1,49 @@
+import os
+
+import model_store
+
+
+def _manifest(path):
+    name = os.path.basename(path)
+    return {"sources": {name: model_store._sha256(path)}, "source_stats": {name: model_store._stat(path)}}
+
+
+def _count_hashes(monkeypatch):
+    calls = []
+    sha256 = model_store._sha256
+
+    def counting_sha256(path):
+        calls.append(path)
+        return sha256(path)
+    monkeypatch.setattr(model_store, "_sha256", counting_sha256)
+    return calls
+
+
+def test_unchanged_sources_are_not_hashed(tmp_path, monkeypatch):
+    source = tmp_path / "fraud_model.pkl"
+    source.write_bytes(b"model")
+    manifest = _manifest(str(source))
+    calls = _count_hashes(monkeypatch)
+    assert model_store.is_current(manifest, [str(source)])
+    assert calls == []
+
+
+def test_touched_source_is_hashed(tmp_path, monkeypatch):
+    source = tmp_path / "fraud_model.pkl"
+    source.write_bytes(b"model")
+    manifest = _manifest(str(source))
+    calls = _count_hashes(monkeypatch)
+
+    os.utime(source, ns=(0, 0))
+    assert model_store.is_current(manifest, [str(source)])
+    source.write_bytes(b"other")
+    assert not model_store.is_current(manifest, [str(source)])
+    assert len(calls) == 2
+
+
+def test_manifest_without_stats_is_hashed(tmp_path):
+    source = tmp_path / "scaler.pkl"
+    source.write_bytes(b"scaler")
+    manifest = {"sources": {"scaler.pkl": model_store._sha256(str(source))}}
+    assert model_store.is_current(manifest, [str(source)])
+    assert not model_store.is_current(manifest, [str(tmp_path / "missing.pkl")])
@@ -0,0 +1,100 @@
+"""The vectorized rule engine must pick the same first matching rule as eval()."""
+import os
+import random
+import sqlite3
+
+import pytest
+
+from conftest import ROOT
+from feature_extractor import FeatureExtractor
+from rule_cache import compile_rule, first_matching_rule
+from rule_engine import BatchColumns, match_rules
+
+# Conditions beyond rules.db covering short-circuits, arithmetic on comparisons and division
+EXTRA_CONDITIONS = [
+    "transaction_hour < 5 or payer_browser_anonymous > 5",
+    "payer_browser_anonymous > 5 and transaction_hour < 5",
+    "(transaction_day > 3) + (transaction_month > 6) >= 2",
+    "transaction_amount / transaction_hour > 100",
+    "transaction_amount % transaction_day == 1",
+    "not transaction_channel == 1",
+    "(transaction_amount and transaction_hour) > 20",
+    "transaction_channel in [0, 2] and transaction_amount > 500",
+    "transaction_payment_mode_anonymous != 3",
+]
+
+NUMBERS = [0, 1, 3, 5, 6, 7, 23, 24, 1000001, 5.5, 4.9, -1, -2.5, True, 2 ** 60, float("nan")]
+NUMERIC_STRINGS = ["7", "5.5", "0"]
+CHANNELS = ["online", "mobile", "pos", "atm", 1]
+
+
+def _rules_db():
+    conn = sqlite3.connect(f"file:{os.path.join(ROOT, 'rules.db')}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT id, condition, action FROM fraud_rules WHERE enabled=1 ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def _rules():
+    rows = _rules_db() + [(1000 + i, condition, "Extra rule") for i, condition in enumerate(EXTRA_CONDITIONS)]
+    return [compile_rule(rule_id, condition, action) for rule_id, condition, action in rows]
+
+
+def _transactions(n, seed, values):
+    rng = random.Random(seed)
+    transactions = []
+    for i in range(n):
+        data = {"transaction_id": f"T{i}"}
+        for field in FeatureExtractor().feature_names:
+            if rng.random() < 0.1:
+                continue
+            data[field] = rng.choice(CHANNELS if field == "transaction_channel" else values)
+        transactions.append(data)
+    return transactions
+
+
+def _expected(rules, transactions, namespace):
+    matches = []
+    for data in transactions:
+        rule = first_matching_rule(rules, namespace(data))
+        matches.append(-1 if rule is None else rules.index(rule))
+    return matches
+
+
+def test_every_rule_has_a_mask():
+    assert all(rule.mask is not None for rule in _rules())
+
+
+@pytest.mark.parametrize("rotation", range(4))
+def test_batch_columns_match_eval(rotation):
+    # Non-numeric strings cannot reach the feature matrix, so read the raw columns from the dicts
+    rules = _rules()
+    rules = rules[rotation:] + rules[:rotation]
+    transactions = _transactions(2000, rotation, NUMBERS + NUMERIC_STRINGS + ["abc", ""])
+    assert list(match_rules(rules, transactions, BatchColumns(transactions))) == \
+        _expected(rules, transactions, dict)
+
+
+@pytest.mark.parametrize("rotation", range(4))
+def test_feature_matrix_columns_match_eval(rotation):
+    rules = _rules()
+    rules = rules[rotation:] + rules[:rotation]
+    extractor = FeatureExtractor()
+    transactions = _transactions(2000, 100 + rotation, NUMBERS + NUMERIC_STRINGS)
+    features, numeric = extractor.extract_batch(transactions, truncate=False)
+    columns = BatchColumns(transactions, features, numeric, extractor.feature_names)
+    assert list(match_rules(rules, transactions, columns, extractor.rule_namespace)) == \
+        _expected(rules, transactions, extractor.rule_namespace)
+
+
+def test_numeric_strings_are_left_to_eval():
+    rule = compile_rule(1, "payer_browser_anonymous > 5", "Unusual browser detected")
+    transactions = [{"payer_browser_anonymous": "7"}, {"payer_browser_anonymous": 7}]
+    assert list(match_rules([rule], transactions)) == [-1, 0]
+
+
+def test_or_short_circuits_past_missing_field():
+    rule = compile_rule(1, "transaction_hour < 5 or payer_browser_anonymous > 5", "Odd hour")
+    transactions = [{"transaction_hour": 3}, {"transaction_hour": 12}, {"payer_browser_anonymous": 9}]
+    assert list(match_rules([rule], transactions)) == [0, -1, -1]
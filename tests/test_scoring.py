@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from feature_extractor import FeatureExtractor
+from preprocessing import Preprocessor
+from rule_cache import compile_rule, first_matching_rule
+from scoring import predict_fraud_scores, score_transactions
+
+
+class RecordingModel:
+    """Scores every row 0.3 and keeps the feature matrices it was given."""
+
+    def __init__(self):
+        self.seen = []
+
+    def predict_proba(self, features):
+        self.seen.append(np.array(features))
+        return np.column_stack([np.full(len(features), 0.7), np.full(len(features), 0.3)])
+
+
+def _score(transactions, conditions):
+    extractor = FeatureExtractor()
+    rules = [compile_rule(i + 1, condition, "Flagged") for i, condition in enumerate(conditions)]
+    model = RecordingModel()
+    results = score_transactions(transactions, rules, extractor, Preprocessor(extractor.feature_names), model)
+    return results, rules, extractor, model
+
+
+def test_batch_rules_see_untruncated_values():
+    transactions = [{"transaction_id": "a", "payer_browser_anonymous": 5.5},
+                    {"transaction_id": "b", "payer_browser_anonymous": 4.7}]
+    results, rules, extractor, _ = _score(transactions, ["payer_browser_anonymous > 5"])
+    assert [result["fraud_source"] for result in results] == ["rule", "model"]
+    # Same decision as the single-transaction path
+    assert first_matching_rule(rules, extractor.rule_namespace(transactions[0])) is rules[0]
+
+
+def test_model_sees_truncated_values():
+    transactions = [{"transaction_id": "b", "payer_browser_anonymous": 4.7, "transaction_amount": 10.5}]
+    results, _, extractor, model = _score(transactions, ["payer_browser_anonymous > 5"])
+    row = dict(zip(extractor.feature_names, model.seen[0][0]))
+    assert row["payer_browser_anonymous"] == 4.0
+    assert row["transaction_amount"] == 10.5
+    assert results[0]["fraud_score"] == 0.3
+
+
+class RowModel:
+    """Scores each row with its first feature."""
+
+    def predict_proba(self, features):
+        return np.column_stack([1 - features[:, 0], features[:, 0]])
+
+
+@pytest.mark.parametrize("chunk_size", [None, 0, -2, 2, 100])
+def test_every_chunk_size_scores_every_row(chunk_size):
+    features = np.linspace(0, 1, 5).reshape(-1, 1)
+    assert np.array_equal(predict_fraud_scores(RowModel(), features, chunk_size), features[:, 0])
+
+
+@pytest.mark.parametrize("chunk_size", [0, -2])
+def test_batch_endpoint_rejects_non_positive_chunk_size(client, chunk_size):
+    response = client.post(f"/detect_fraud_batch?chunk_size={chunk_size}",
+                           json={"transactions": [{"transaction_id": "B1", "transaction_amount": 10}]})
+    assert response.status_code == 400
+    assert "chunk_size" in response.get_json()["error"]
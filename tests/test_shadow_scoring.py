@@ -0,0 +1,39 @@
+import time
+
+import numpy as np
+
+from db import ConnectionPool
+from feature_extractor import FeatureExtractor
+from model_registry import ServingModel
+from preprocessing import Preprocessor
+from scoring import model_result
+from shadow_scoring import ShadowScorer
+
+
+class ConstantModel:
+    def __init__(self, score):
+        self.score = score
+
+    def predict_proba(self, features):
+        return np.column_stack([np.full(len(features), 1 - self.score), np.full(len(features), self.score)])
+
+
+def test_deltas_use_the_unrounded_primary_score(tmp_path):
+    extractor = FeatureExtractor()
+    candidate = ServingModel("candidate", extractor, ConstantModel(0.3), Preprocessor(extractor.feature_names))
+    pool = ConnectionPool(str(tmp_path / "shadow.db"))
+    scorer = ShadowScorer(candidate, pool, flush_interval=0)
+
+    primary_score = 0.123456
+    result = model_result("T1", primary_score)
+    scorer.submit({"transaction_id": "T1", "transaction_amount": 10.0}, result, primary_score, "primary")
+    deadline = time.time() + 10
+    while scorer.metrics()["scored"] < 1 and time.time() < deadline:
+        time.sleep(0.01)
+
+    with pool.connection() as conn:
+        stored, delta = conn.execute("SELECT primary_score, score_delta FROM shadow_scores").fetchone()
+    assert result["fraud_score"] == 0.12
+    assert stored == primary_score
+    assert abs(delta - (0.3 - primary_score)) < 1e-12
+    assert abs(scorer.metrics()["abs_score_delta_sum"] - (0.3 - primary_score)) < 1e-12
@@ -0,0 +1,34 @@
+from fast_json import dumps, loads
+
+GOOD = {"transaction_amount": 120.0, "transaction_channel": "online", "transaction_payment_mode_anonymous": 1,
+        "payment_gateway_bank_anonymous": 2, "payer_browser_anonymous": 1, "transaction_hour": 12,
+        "transaction_day": 3, "transaction_month": 4}
+
+
+def _stream(client, rows, chunk_rows):
+    body = "".join(dumps(row) + "\n" for row in rows)
+    response = client.post(f"/detect_fraud_stream?chunk_rows={chunk_rows}", data=body,
+                           content_type="application/x-ndjson")
+    assert response.status_code == 200
+    return [loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_bad_rows_are_reported_and_the_rest_of_the_chunk_is_scored(client):
+    rows = [dict(GOOD, transaction_id=f"S{i}") for i in range(5)]
+    rows[1]["transaction_amount"] = "abc"
+    rows[3]["transaction_hour"] = {"h": 1}
+    lines = _stream(client, rows, chunk_rows=10)
+
+    assert len(lines) == 5
+    assert [line.get("transaction_id") for line in lines] == ["S0", None, "S2", None, "S4"]
+    assert lines[1]["offset"] == 1 and "transaction_amount='abc'" in lines[1]["error"]
+    assert lines[3]["offset"] == 3 and "transaction_hour" in lines[3]["error"]
+
+
+def test_error_offsets_count_rows_across_chunks(client):
+    rows = [dict(GOOD, transaction_id=f"C{i}") for i in range(6)]
+    rows[4]["payer_browser_anonymous"] = "x"
+    lines = _stream(client, rows, chunk_rows=2)
+
+    assert [line.get("offset") for line in lines] == [None, None, None, None, 4, None]
+    assert all("fraud_score" in line for i, line in enumerate(lines) if i != 4)
@@ -0,0 +1,14 @@
+from scoring import model_result
+from write_behind import transaction_row
+
+
+def test_rows_without_an_id_get_unique_ids():
+    rows = [transaction_row({"transaction_amount": 5}, model_result("unknown", 0.2)) for _ in range(2)]
+    assert rows[0][0] != rows[1][0]
+    assert all(row[0].startswith("unknown-") for row in rows)
+
+
+def test_rows_keep_their_own_id():
+    row = transaction_row({"transaction_id": "T1", "transaction_amount": 5}, model_result("T1", 0.2), "v1")
+    assert row[0] == "T1"
+    assert row[-1] == "v1"
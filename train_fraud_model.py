@@ -1,63 +1,98 @@
-import pandas as pd
-import numpy as np
+import os
 import pickle
+
+import numpy as np
+import pandas as pd
 from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier
+from preprocessing import NUMERICAL_FEATURES, Preprocessor
+from feature_extractor import MODEL_FEATURES, FeatureExtractor, save_feature_names
+from velocity_store import VELOCITY_FEATURES
+from model_store import export_artifacts
+from rebalance import rebalancer_from_env
+from training_data import (StageReport, add_velocity_features, encode_categoricals, feature_matrix,
+                           fill_missing_amounts, read_training_columns, standardize)
+
+# Wall time and peak memory are printed after each stage
+report = StageReport()
+
+# Optional per-payer/payee velocity features (FRAUD_VELOCITY_FEATURES=1), replayed in time order.
+# Serving adds the same features when they are listed in model_features.pkl.
+use_velocity = os.environ.get("FRAUD_VELOCITY_FEATURES", "0") == "1"
+
+# Trees are fitted in parallel on FRAUD_TRAIN_JOBS cores (default -1: all of them)
+n_jobs = int(os.environ.get("FRAUD_TRAIN_JOBS", -1))
 
-# Load dataset
-df = pd.read_csv("transactions_train.csv")
+# Load dataset in chunks, parsing only the columns the model uses into compact dtypes
+# (the sparse payer_mobile_anonymous and the id columns are never read)
+with report.stage("read_csv"):
+    columns = read_training_columns("transactions_train.csv", velocity=use_velocity)
 
-# Fill missing values and drop sparse column
-df['transaction_amount'].fillna(df['transaction_amount'].median(), inplace=True)
-df.drop(columns=['payer_mobile_anonymous'], inplace=True)
+# Fill missing amounts with the median
+with report.stage("fill_missing"):
+    fill_missing_amounts(columns)
 
-# Extract date-time features
-df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-df['transaction_hour'] = df['transaction_date'].dt.hour
-df['transaction_day'] = df['transaction_date'].dt.day
-df['transaction_month'] = df['transaction_date'].dt.month
-df.drop(columns=['transaction_date'], inplace=True)
+if use_velocity:
+    with report.stage("velocity_features"):
+        add_velocity_features(columns)
 
 # Encode categorical features
-categorical_features = ['transaction_channel', 'payer_browser_anonymous', 'transaction_payment_mode_anonymous', 'payment_gateway_bank_anonymous']
-label_encoders = {col: LabelEncoder() for col in categorical_features}
-for col in categorical_features:
-    df[col] = label_encoders[col].fit_transform(df[col])
+with report.stage("encode"):
+    label_encoders = encode_categoricals(columns)
 
-# Drop non-informative columns
-df.drop(columns=['transaction_id_anonymous', 'payee_id_anonymous', 'payer_email_anonymous', 'payee_ip_anonymous'], inplace=True)
+# Define features (in the same order the serving code uses) and target
+feature_extractor = FeatureExtractor(MODEL_FEATURES + VELOCITY_FEATURES if use_velocity else MODEL_FEATURES)
+with report.stage("feature_matrix"):
+    X = feature_matrix(columns, feature_extractor.feature_names)
+    y = columns["is_fraud"]
+    del columns
 
-# Define features and target
-X = df.drop(columns=['is_fraud'])
-y = df['is_fraud']
+# Split row indices into training and test sets
+with report.stage("split"):
+    train_rows, test_rows = train_test_split(np.arange(len(y)), test_size=0.2, random_state=42, stratify=y)
 
-# Split data into training and test sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+# Standardize numerical features of the training rows (the test rows are not used here)
+numerical_columns = [feature_extractor.feature_names.index(name) for name in NUMERICAL_FEATURES]
+with report.stage("scale"):
+    X_train, y_train = X[train_rows], y[train_rows]
+    del X, y
+    scaler = StandardScaler()
+    standardize(X_train, scaler, numerical_columns, NUMERICAL_FEATURES, fit=True)
 
-# Standardize numerical features
-scaler = StandardScaler()
-numerical_features = ['transaction_amount', 'transaction_hour', 'transaction_day', 'transaction_month']
-X_train[numerical_features] = scaler.fit_transform(X_train[numerical_features])
-X_test[numerical_features] = scaler.transform(X_test[numerical_features])
+# Balance the classes: by default all fraud cases and an equal number of non-fraud cases
+# (FRAUD_REBALANCE=smote or hybrid oversamples instead, see rebalance.py)
+with report.stage("rebalance"):
+    X_train_balanced, y_train_balanced = rebalancer_from_env("undersample").fit_resample(X_train, y_train)
+    del X_train, y_train
 
-# Undersampling: take all fraud cases and equal number of non-fraud cases from training set
-fraud_indices = y_train[y_train == 1].index
-nonfraud_indices = y_train[y_train == 0].index
+# Train Random Forest model, one tree per core at a time
+with report.stage("fit"):
+    clf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs)
+    clf.fit(pd.DataFrame(X_train_balanced, columns=feature_extractor.feature_names), y_train_balanced)
+    # Serving predicts a few rows at a time, where a thread pool per call only adds latency
+    clf.n_jobs = None
 
-n_frauds = len(fraud_indices)
-nonfraud_sample_indices = np.random.choice(nonfraud_indices, n_frauds, replace=False)
-undersample_indices = np.concatenate([fraud_indices, nonfraud_sample_indices])
+with report.stage("save"):
+    # Save model
+    with open("fraud_model.pkl", "wb") as model_file:
+        pickle.dump(clf, model_file)
 
-X_train_under = X_train.loc[undersample_indices]
-y_train_under = y_train.loc[undersample_indices]
+    # Save feature order so serving builds vectors in the same column order
+    save_feature_names("model_features.pkl", feature_extractor.feature_names)
 
-# Train Random Forest model
-clf = RandomForestClassifier(n_estimators=100, random_state=42)
-clf.fit(X_train_under, y_train_under)
+    # Save the fitted scaler and encoders so serving preprocesses exactly as training did
+    with open("scaler.pkl", "wb") as scaler_file:
+        pickle.dump(scaler, scaler_file)
+    with open("label_encoders.pkl", "wb") as encoders_file:
+        pickle.dump(label_encoders, encoders_file)
 
-# Save model
-with open("fraud_model.pkl", "wb") as model_file:
-    pickle.dump(clf, model_file)
+    # Export memory-mappable arrays that the services load instead of unpickling
+    export_artifacts(
+        clf,
+        Preprocessor(feature_extractor.feature_names, scaler, label_encoders),
+        sources=("fraud_model.pkl", "scaler.pkl", "label_encoders.pkl"),
+    )
 
-print("Model training complete. Saved as fraud_model.pkl")
+print(report.summary())
+print("Model training complete. Saved fraud_model.pkl, model_features.pkl, scaler.pkl, label_encoders.pkl and model_artifacts/")
@@ -0,0 +1,216 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+from sklearn.preprocessing import LabelEncoder
+
+from preprocessing import CATEGORICAL_FEATURES
+from velocity_store import VELOCITY_FEATURES, replay_features
+
+TRAINING_CSV = "transactions_train.csv"
+
+# Rows parsed per read_csv chunk (FRAUD_TRAIN_CHUNK_ROWS)
+CHUNK_ROWS = 200000
+
+# Columns read from the CSV: every model input is derived from these
+RAW_COLUMNS = ["transaction_amount", "transaction_date", "is_fraud"] + CATEGORICAL_FEATURES
+
+# Payer and payee ids, read only to replay velocity features
+IDENTITY_COLUMNS = ["payer_email_anonymous", "payee_id_anonymous"]
+
+DATE_PARTS = {"transaction_hour": "hour", "transaction_day": "day", "transaction_month": "month"}
+
+
+######################################
+# Stage Reporting
+######################################
+
+def _reset_peak_rss():
+    # Linux resets the VmHWM high-water mark when 5 is written to clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Without clear_refs this is the peak of the whole run so far
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+class StageReport:
+    """Wall time and peak resident memory of each stage of a training run."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        _reset_peak_rss()
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        peak = _peak_rss_mb()
+        self.stages.append((name, seconds, peak))
+        print(f"[{name}] {seconds:.2f} s, peak RSS {_format_mb(peak)}", flush=True)
+
+    def summary(self):
+        width = max([len(name) for name, _, _ in self.stages] + [5])
+        lines = [f"{'stage':<{width}}  {'seconds':>8}  {'peak RSS':>10}"]
+        for name, seconds, peak in self.stages:
+            lines.append(f"{name:<{width}}  {seconds:8.2f}  {_format_mb(peak):>10}")
+        lines.append(f"{'total':<{width}}  {sum(s for _, s, _ in self.stages):8.2f}")
+        return "\n".join(lines)
+
+
+def _format_mb(value):
+    return "n/a" if value is None else f"{value:.0f} MB"
+
+
+######################################
+# Loading
+######################################
+
+def _compact(values):
+    # Date parts fit in int8 unless unparseable dates left NaN in them
+    return values.to_numpy(np.float32) if values.hasnans else values.to_numpy(np.int8)
+
+
+def read_training_columns(path=TRAINING_CSV, velocity=False, chunk_rows=None):
+    """Read the training CSV in chunks into compact columns, keyed by name.
+
+    Only the columns the model needs are parsed: amounts as float32, labels
+    as int8, categorical features as pandas Categoricals, and the date
+    parsed chunk by chunk into int8 hour/day/month so the date strings are
+    never held for the whole file. With `velocity`, payer and payee ids and
+    the epoch seconds needed to replay velocity features are kept too.
+    """
+    chunk_rows = chunk_rows or int(os.environ.get("FRAUD_TRAIN_CHUNK_ROWS", CHUNK_ROWS))
+    usecols = RAW_COLUMNS + (IDENTITY_COLUMNS if velocity else [])
+    dtype = {"transaction_amount": np.float32, "is_fraud": np.int8}
+    dtype.update({name: "category" for name in usecols if name in CATEGORICAL_FEATURES or name in IDENTITY_COLUMNS})
+
+    parts = {}
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunk_rows):
+        dates = pd.to_datetime(chunk.pop("transaction_date"))
+        for name, part in DATE_PARTS.items():
+            parts.setdefault(name, []).append(_compact(getattr(dates.dt, part)))
+        if velocity:
+            parts.setdefault("seconds", []).append((dates - pd.Timestamp(0)).dt.total_seconds().to_numpy())
+        for name in chunk.columns:
+            column = chunk[name]
+            parts.setdefault(name, []).append(column.array if isinstance(column.dtype, pd.CategoricalDtype)
+                                              else column.to_numpy())
+        del chunk, dates
+
+    columns = {}
+    for name, chunks in parts.items():
+        if isinstance(chunks[0], pd.Categorical):
+            # One sorted category list across chunks, like LabelEncoder's classes
+            columns[name] = union_categoricals(chunks, sort_categories=True)
+        else:
+            columns[name] = np.concatenate(chunks)
+        chunks.clear()
+    return columns
+
+
+def fill_missing_amounts(columns):
+    """Replace missing amounts with the median amount, in place."""
+    amounts = columns["transaction_amount"]
+    missing = np.isnan(amounts)
+    if missing.any():
+        amounts[missing] = np.nanmedian(amounts)
+
+
+def add_velocity_features(columns):
+    """Replay per-payer/payee velocity features in time order and add them as float32 columns."""
+    records = [
+        {"payer_email_anonymous": payer, "payee_id_anonymous": payee, "transaction_amount": amount}
+        for payer, payee, amount in zip(np.asarray(columns.pop("payer_email_anonymous")),
+                                        np.asarray(columns.pop("payee_id_anonymous")),
+                                        columns["transaction_amount"].tolist())
+    ]
+    features = replay_features(records, columns.pop("seconds").tolist())
+    del records
+    for name in VELOCITY_FEATURES:
+        values = np.array([f.get(name) for f in features], dtype=np.float64)
+        columns[name] = np.nan_to_num(values, nan=0.0).astype(np.float32)
+
+
+######################################
+# Encoding
+######################################
+
+def _smallest_int(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _encode(categorical):
+    # Categories are parsed as strings; when all of them are numbers they are
+    # compared as numbers, as read_csv would have typed the column
+    classes = np.asarray(categorical.categories, dtype=object)
+    codes = np.asarray(categorical.codes)
+    try:
+        numbers = pd.to_numeric(categorical.categories).to_numpy()
+    except (TypeError, ValueError):
+        remap = None
+    else:
+        classes, remap = np.unique(numbers, return_inverse=True)
+    missing = codes < 0
+    if missing.any():
+        # LabelEncoder sorts NaN after every other class
+        classes = np.append(classes, np.nan)
+    encoded = np.empty(len(codes), dtype=_smallest_int(len(classes)))
+    encoded[:] = codes if remap is None else remap[codes]
+    encoded[missing] = len(classes) - 1
+    return classes, encoded
+
+
+def encode_categoricals(columns):
+    """Replace each categorical feature with its integer codes; return the matching LabelEncoders."""
+    label_encoders = {}
+    for name in CATEGORICAL_FEATURES:
+        classes, columns[name] = _encode(columns[name])
+        encoder = LabelEncoder()
+        encoder.classes_ = classes
+        label_encoders[name] = encoder
+    return label_encoders
+
+
+def feature_matrix(columns, feature_names):
+    """The model features as one float32 matrix, a column at a time (Fortran order)."""
+    n = len(columns["is_fraud"])
+    X = np.empty((n, len(feature_names)), dtype=np.float32, order="F")
+    for j, name in enumerate(feature_names):
+        X[:, j] = columns[name]
+    return X
+
+
+def standardize(X, scaler, columns, names, fit=False):
+    """Scale X[:, columns] in place with `scaler` (fitting it first if `fit`).
+
+    Computed in float64 as serving does and stored back as float32; the
+    scaler sees the columns by `names`, which serving uses to find them.
+    """
+    values = pd.DataFrame(X[:, columns].astype(np.float64), columns=names)
+    X[:, columns] = scaler.fit_transform(values) if fit else scaler.transform(values)
@@ -1,4 +1,6 @@
 import sqlite3
+from transaction_query import create_transaction_indexes
+from fraud_stats import ensure_fraud_stats
 
 # Function to initialize database tables
 def init_db():
@@ -14,7 +16,9 @@ def init_db():
             fraud_source TEXT,
             fraud_reason TEXT,
             fraud_score REAL,
-            transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            transaction_channel TEXT,
+            model_version TEXT
         )
     """)
 
@@ -32,7 +36,13 @@ def init_db():
         )
     """)
 
+    # Create the indexes used by the /transactions query API
+    create_transaction_indexes(conn)
+
     conn.commit()
+
+    # Create the fraud_stats summary table and the triggers that maintain it
+    ensure_fraud_stats(conn)
     conn.close()
     print("✅ Database initialized successfully!")
 
@@ -0,0 +1,167 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+from fast_json import dumps
+
+# Indexes backing GET /transactions. Every listing is ordered newest first by
+# (transaction_date, transaction_id), so the date indexes end with the id to
+# serve keyset pagination straight from the index.
+TRANSACTION_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (transaction_date, transaction_id)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_fraud_date ON transactions (is_fraud, transaction_date, transaction_id)",
+    "CREATE INDEX IF NOT EXISTS idx_transactions_score ON transactions (fraud_score)",
+]
+
+TRANSACTION_COLUMNS = [
+    "transaction_id", "transaction_amount", "is_fraud", "fraud_source",
+    "fraud_reason", "fraud_score", "model_version", "transaction_date",
+]
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Rows pulled from SQLite per fetch while streaming a page
+FETCH_ROWS = 256
+
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def create_transaction_indexes(conn):
+    for statement in TRANSACTION_INDEXES:
+        conn.execute(statement)
+
+
+def encode_cursor(transaction_date, transaction_id):
+    raw = json.dumps([transaction_date, transaction_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        transaction_date, transaction_id = json.loads(raw)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    return transaction_date, transaction_id
+
+
+def _parse_date(value, name, end=False):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime, got {value!r}")
+    if end and len(value) <= 10:
+        # A bare end date includes that whole day
+        parsed += timedelta(days=1)
+    return parsed.strftime(_DATE_FORMAT)
+
+
+def _parse_bool(value, name):
+    lowered = value.lower()
+    if lowered in ("1", "true", "yes"):
+        return 1
+    if lowered in ("0", "false", "no"):
+        return 0
+    raise ValueError(f"{name} must be true or false, got {value!r}")
+
+
+class TransactionQuery:
+    """Filters and keyset position for one page of GET /transactions.
+
+    Pages are ordered newest first. `cursor` is the opaque next_cursor of the
+    previous page; it encodes the (transaction_date, transaction_id) of that
+    page's last row, so each page is an index range scan whatever its depth.
+    """
+
+    def __init__(self, start=None, end=None, is_fraud=None, fraud_source=None, min_score=None,
+                 limit=DEFAULT_PAGE_SIZE, cursor=None):
+        self.start = start
+        self.end = end
+        self.is_fraud = is_fraud
+        self.fraud_source = fraud_source
+        self.min_score = min_score
+        self.limit = limit
+        self.cursor = cursor
+
+    @classmethod
+    def from_args(cls, args):
+        """Build from request query arguments; raises ValueError on invalid values."""
+        limit = args.get("limit", DEFAULT_PAGE_SIZE)
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError(f"limit must be an integer, got {limit!r}")
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        min_score = args.get("min_score")
+        if min_score is not None:
+            try:
+                min_score = float(min_score)
+            except ValueError:
+                raise ValueError(f"min_score must be a number, got {min_score!r}")
+
+        return cls(
+            start=_parse_date(args["start"], "start") if args.get("start") else None,
+            end=_parse_date(args["end"], "end", end=True) if args.get("end") else None,
+            is_fraud=_parse_bool(args["is_fraud"], "is_fraud") if args.get("is_fraud") else None,
+            fraud_source=args.get("fraud_source") or None,
+            min_score=min_score,
+            limit=limit,
+            cursor=decode_cursor(args["cursor"]) if args.get("cursor") else None,
+        )
+
+    def sql(self):
+        clauses, params = [], []
+        if self.start is not None:
+            clauses.append("transaction_date >= ?")
+            params.append(self.start)
+        if self.end is not None:
+            clauses.append("transaction_date < ?")
+            params.append(self.end)
+        if self.is_fraud is not None:
+            clauses.append("is_fraud = ?")
+            params.append(self.is_fraud)
+        if self.fraud_source is not None:
+            clauses.append("fraud_source = ?")
+            params.append(self.fraud_source)
+        if self.min_score is not None:
+            clauses.append("fraud_score >= ?")
+            params.append(self.min_score)
+        if self.cursor is not None:
+            clauses.append("(transaction_date, transaction_id) < (?, ?)")
+            params.extend(self.cursor)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # One extra row tells us whether another page follows
+        sql = (f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions {where} "
+               f"ORDER BY transaction_date DESC, transaction_id DESC LIMIT ?")
+        return sql, params + [self.limit + 1]
+
+    def stream(self, pool):
+        """Yield the page as JSON text fragments, fetching rows incrementally."""
+        sql, params = self.sql()
+        with pool.connection() as conn:
+            rows = conn.execute(sql, params)
+            yield '{"transactions":['
+            count = 0
+            last = None
+            has_more = False
+            while not has_more:
+                batch = rows.fetchmany(FETCH_ROWS)
+                if not batch:
+                    break
+                for row in batch:
+                    if count == self.limit:
+                        has_more = True
+                        break
+                    record = dict(zip(TRANSACTION_COLUMNS, row))
+                    if record["is_fraud"] is not None:
+                        record["is_fraud"] = bool(record["is_fraud"])
+                    yield ("," if count else "") + dumps(record)
+                    count += 1
+                    last = row
+            rows.close()
+        next_cursor = encode_cursor(last[-1], last[0]) if has_more else None
+        yield f'],"count":{count},"next_cursor":{json.dumps(next_cursor)}}}'
@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+
+# Largest absolute difference from sklearn's predict_proba we accept. The only
+# source of difference is the order in which per-tree probabilities are summed.
+TOLERANCE = 1e-12
+
+
+class CompiledForest:
+    """A fitted RandomForestClassifier flattened into contiguous NumPy node arrays.
+
+    All trees share one set of (feature, threshold, children, value) arrays.
+    Leaves point back to themselves, so a batch is scored by walking every
+    (row, tree) pair one level per step for `max_depth` vectorized steps.
+    predict_proba() mirrors the sklearn signature, so this can stand in for
+    the model wherever only predict_proba is used.
+
+    sklearn compares float32 inputs against float64 thresholds. Thresholds are
+    stored rounded down to float32, which gives the same decisions for every
+    float32 input. Batches larger than `max_rows` go to `fallback` (the
+    original sklearn model) when one is set, since its compiled per-tree loop
+    is faster than a vectorized walk once a batch no longer fits in cache.
+    """
+
+    def __init__(self, feature, threshold, children, class_values, roots, max_depth,
+                 classes, n_features_in, feature_names_in=None, fallback=None, max_rows=None):
+        # Node n's children are children[2n] (left) and children[2n + 1] (right);
+        # class_values[c] holds every node's probability of class c.
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.class_values = class_values
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+        if feature_names_in is not None:
+            self.feature_names_in_ = feature_names_in
+        self.fallback = fallback
+        self.max_rows = max_rows
+
+    @classmethod
+    def from_sklearn(cls, model, fallback=None, max_rows=None):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            nodes = np.arange(n)
+            leaf = tree.children_left == -1
+
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+            counts = tree.value[:, 0, :]
+            values.append(counts / counts.sum(axis=1, keepdims=True))
+            roots.append(offset)
+
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        children = np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1)
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=float32_thresholds(np.concatenate(thresholds)),
+            children=np.ascontiguousarray(children.ravel(), dtype=np.int32),
+            class_values=np.ascontiguousarray(np.concatenate(values).T, dtype=np.float64),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+            n_features_in=model.n_features_in_,
+            feature_names_in=getattr(model, "feature_names_in_", None),
+            fallback=fallback,
+            max_rows=max_rows,
+        )
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input of shape (n, {self.n_features_in_}), got {X.shape}")
+        flat = X.ravel()
+        row_start = (np.arange(len(X), dtype=np.int32) * X.shape[1])[:, None]
+        nodes = np.repeat(self.roots[None, :], len(X), axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat[row_start + self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+        return nodes
+
+    def predict_proba(self, X):
+        if self.fallback is not None and self.max_rows is not None and len(X) > self.max_rows:
+            return self.fallback.predict_proba(X)
+        return self._proba(self.apply(X))
+
+    def _proba(self, leaves):
+        return np.stack([values[leaves].mean(axis=1) for values in self.class_values], axis=1)
+
+    def verify(self, model, n_samples=2048, seed=0):
+        """Return the largest difference from model.predict_proba on random inputs.
+
+        Samples are drawn around each feature's split thresholds so that every
+        branch of the forest is exercised.
+        """
+        rng = np.random.default_rng(seed)
+        X = np.empty((n_samples, self.n_features_in_), dtype=np.float64)
+        internal = np.isfinite(self.threshold)
+        for j in range(self.n_features_in_):
+            splits = self.threshold[internal & (self.feature == j)].astype(np.float64)
+            if len(splits) == 0:
+                X[:, j] = rng.normal(size=n_samples)
+                continue
+            span = max(splits.max() - splits.min(), 1.0)
+            X[:, j] = rng.uniform(splits.min() - span, splits.max() + span, size=n_samples)
+        # Exact split values are the inputs most sensitive to threshold rounding.
+        picks = rng.integers(0, n_samples, size=internal.sum())
+        X[picks, self.feature[internal]] = self.threshold[internal]
+        compiled = self._proba(self.apply(X))
+        return float(np.abs(compiled - model.predict_proba(X)).max())
+
+
+def float32_thresholds(threshold):
+    """Round float64 split thresholds down to float32.
+
+    For any float32 x, `x <= t` holds exactly when `x <= float32_down(t)`,
+    so the traversal can compare float32 to float32.
+    """
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return np.ascontiguousarray(t32)
+
+
+def compile_model(model, backend=None, max_rows=None):
+    """Return the scoring backend for a fitted forest.
+
+    FRAUD_MODEL_BACKEND=compiled (the default) uses CompiledForest after
+    checking it against sklearn; FRAUD_MODEL_BACKEND=sklearn keeps the model
+    as loaded. Batches above FRAUD_MODEL_COMPILED_MAX_ROWS (default 1024) are
+    still scored by sklearn. Models that cannot be compiled are returned unchanged.
+    """
+    backend = backend or os.environ.get("FRAUD_MODEL_BACKEND", "compiled")
+    if max_rows is None:
+        max_rows = int(os.environ.get("FRAUD_MODEL_COMPILED_MAX_ROWS", 1024))
+    if backend != "compiled" or not hasattr(model, "estimators_"):
+        return model
+    try:
+        forest = CompiledForest.from_sklearn(model, fallback=model, max_rows=max_rows)
+        error = forest.verify(model)
+    except Exception as e:
+        print(f"Compiled model backend unavailable, using sklearn: {e}")
+        return model
+    if error > TOLERANCE:
+        print(f"Compiled model differs from sklearn by {error:.3g}, using sklearn")
+        return model
+    return forest
@@ -0,0 +1,204 @@
+import math
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+# Entities tracked, as (feature prefix, transaction field)
+VELOCITY_ENTITIES = [
+    ("payer", "payer_email_anonymous"),
+    ("payee", "payee_id_anonymous"),
+]
+
+# Sliding windows, as (suffix, seconds)
+VELOCITY_WINDOWS = [("1m", 60), ("1h", 3600), ("24h", 86400)]
+
+# Feature names added to each transaction, e.g. payer_txn_count_1h and payee_amount_sum_24h
+VELOCITY_FEATURES = [
+    f"{prefix}_{stat}_{suffix}"
+    for prefix, _ in VELOCITY_ENTITIES
+    for suffix, _ in VELOCITY_WINDOWS
+    for stat in ("txn_count", "amount_sum")
+]
+
+VELOCITY_AMOUNT_FEATURES = {name for name in VELOCITY_FEATURES if "_amount_sum_" in name}
+
+
+def _entity_key(value):
+    """Normalize an identifier so 7, 7.0 and '7' are the same key; None for missing ids."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            value = int(value)
+    return str(value)
+
+
+def _amount(value):
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(amount) else amount
+
+
+class _KeyState:
+    """Ring buffers of (count, amount) time buckets for one key, one ring per window."""
+
+    __slots__ = ("heads", "buckets", "totals", "last_seen")
+
+    def __init__(self, n_windows, n_buckets):
+        self.heads = array("q", [-1] * n_windows)
+        self.buckets = array("d", bytes(8 * 2 * n_windows * n_buckets))
+        self.totals = array("d", bytes(8 * 2 * n_windows))
+        self.last_seen = 0.0
+
+
+class VelocityStore:
+    """Per-payer and per-payee transaction counts and amount sums over sliding windows.
+
+    Each window is a ring of `buckets` time buckets (a 1h window with 12
+    buckets has 5 minute resolution) with running totals, so recording a
+    transaction or reading a key touches a fixed number of slots and
+    expired buckets are cleared as the ring advances. At most `max_keys`
+    keys are kept per entity; the least recently seen keys are evicted
+    first (max_keys=None keeps every key), and keys idle for longer than
+    the largest window are dropped as they are passed.
+    """
+
+    def __init__(self, windows=VELOCITY_WINDOWS, entities=VELOCITY_ENTITIES, buckets=12, max_keys=100000):
+        self.windows = list(windows)
+        self.entities = list(entities)
+        self.n_buckets = buckets
+        self.max_keys = max_keys
+        self.bucket_seconds = [seconds / buckets for _, seconds in self.windows]
+        self.horizon = max(seconds for _, seconds in self.windows)
+        self._keys = {field: OrderedDict() for _, field in self.entities}
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._updates = 0
+        self._names = [
+            [(f"{prefix}_txn_count_{suffix}", f"{prefix}_amount_sum_{suffix}") for suffix, _ in self.windows]
+            for prefix, _ in self.entities
+        ]
+
+    def _advance(self, state, w, bucket):
+        # Move window w's ring forward to `bucket`, clearing the buckets that fell out
+        head = state.heads[w]
+        if bucket <= head:
+            return
+        base = w * self.n_buckets
+        steps = self.n_buckets if head < 0 else min(bucket - head, self.n_buckets)
+        buckets, totals = state.buckets, state.totals
+        for k in range(1, steps + 1):
+            slot = 2 * (base + (head + k) % self.n_buckets)
+            totals[2 * w] -= buckets[slot]
+            totals[2 * w + 1] -= buckets[slot + 1]
+            buckets[slot] = buckets[slot + 1] = 0.0
+        state.heads[w] = bucket
+
+    def _touch(self, field, key, now):
+        keys = self._keys[field]
+        state = keys.get(key)
+        if state is None:
+            state = keys[key] = _KeyState(len(self.windows), self.n_buckets)
+            if self.max_keys is not None and len(keys) > self.max_keys:
+                keys.popitem(last=False)
+                self._evictions += 1
+        else:
+            keys.move_to_end(key)
+        # Drop up to two idle keys from the cold end; they no longer count towards any window
+        for _ in range(2):
+            oldest_key, oldest = next(iter(keys.items()))
+            if oldest is state or now - oldest.last_seen <= self.horizon:
+                break
+            del keys[oldest_key]
+            self._evictions += 1
+        state.last_seen = max(state.last_seen, now)
+        return state
+
+    def _record(self, state, now, amount, out, names):
+        for w, width in enumerate(self.bucket_seconds):
+            bucket = int(now // width)
+            self._advance(state, w, bucket)
+            if bucket > state.heads[w] - self.n_buckets:
+                slot = 2 * (w * self.n_buckets + bucket % self.n_buckets)
+                state.buckets[slot] += 1.0
+                state.buckets[slot + 1] += amount
+                state.totals[2 * w] += 1.0
+                state.totals[2 * w + 1] += amount
+            count_name, sum_name = names[w]
+            out[count_name] = int(round(state.totals[2 * w]))
+            out[sum_name] = round(state.totals[2 * w + 1], 2)
+
+    def update(self, data, now=None):
+        """Record one transaction and return its velocity features.
+
+        Counts and sums include the transaction itself. Features of an
+        entity whose id is missing are None, so rules on them do not match.
+        """
+        now = time.time() if now is None else now
+        amount = _amount(data.get("transaction_amount"))
+        features = {}
+        with self._lock:
+            self._updates += 1
+            for (_, field), names in zip(self.entities, self._names):
+                key = _entity_key(data.get(field))
+                if key is None:
+                    for count_name, sum_name in names:
+                        features[count_name] = features[sum_name] = None
+                    continue
+                self._record(self._touch(field, key, now), now, amount, features, names)
+        return features
+
+    def enrich(self, data, now=None):
+        """A copy of the transaction with its velocity features added."""
+        enriched = dict(data)
+        enriched.update(self.update(data, now))
+        return enriched
+
+    def enrich_many(self, transactions, timestamps=None):
+        """Enrich a batch in order; `timestamps` (seconds) default to the current time."""
+        if timestamps is None:
+            now = time.time()
+            return [self.enrich(data, now) for data in transactions]
+        return [self.enrich(data, now) for data, now in zip(transactions, timestamps)]
+
+    def metrics(self):
+        with self._lock:
+            return {
+                "keys": {field: len(keys) for field, keys in self._keys.items()},
+                "max_keys": self.max_keys,
+                "evictions": self._evictions,
+                "updates": self._updates,
+            }
+
+
+def replay_features(transactions, timestamps, store=None):
+    """Velocity features for historical transactions, recorded in timestamp order.
+
+    Returns one feature dict per transaction, aligned with the input. Pass
+    `store` to carry state across successive calls.
+    """
+    store = store if store is not None else VelocityStore(max_keys=None)
+    features = [None] * len(transactions)
+    for i in sorted(range(len(transactions)), key=timestamps.__getitem__):
+        features[i] = store.update(transactions[i], timestamps[i])
+    return features
+
+
+def velocity_store_from_env():
+    """Build the shared VelocityStore unless FRAUD_VELOCITY=0.
+
+    FRAUD_VELOCITY_MAX_KEYS (default 100000) bounds the keys kept per entity
+    and FRAUD_VELOCITY_BUCKETS (default 12) sets each window's resolution.
+    """
+    if os.environ.get("FRAUD_VELOCITY", "1") == "0":
+        return None
+    return VelocityStore(
+        buckets=int(os.environ.get("FRAUD_VELOCITY_BUCKETS", 12)),
+        max_keys=int(os.environ.get("FRAUD_VELOCITY_MAX_KEYS", 100000)),
+    )
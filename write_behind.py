@@ -0,0 +1,198 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger("write_behind")
+
+# Re-scoring a transaction overwrites its earlier result
+INSERT_TRANSACTION_SQL = """
+    INSERT INTO transactions
+        (transaction_id, transaction_amount, is_fraud, fraud_source, fraud_reason, fraud_score, transaction_channel,
+         model_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(transaction_id) DO UPDATE SET
+        transaction_amount=excluded.transaction_amount,
+        is_fraud=excluded.is_fraud,
+        fraud_source=excluded.fraud_source,
+        fraud_reason=excluded.fraud_reason,
+        fraud_score=excluded.fraud_score,
+        transaction_channel=excluded.transaction_channel,
+        model_version=excluded.model_version
+"""
+
+BACKPRESSURE_POLICIES = ("block", "drop", "sync")
+
+
+def transaction_row(data, result, model_version=None):
+    """Build a transactions table row from a request payload and its detection result.
+
+    `model_version` is recorded for rows the model scored; rule decisions leave it NULL.
+    A payload without a transaction_id is stored under a unique "unknown-<uuid>"
+    id, since the upsert would otherwise merge every such row into one.
+    """
+    transaction_id = result["transaction_id"]
+    if data.get("transaction_id") is None:
+        transaction_id = f"unknown-{uuid.uuid4().hex}"
+    return (
+        transaction_id,
+        float(data.get("transaction_amount", 0) or 0),
+        int(result["is_fraud"]),
+        result["fraud_source"],
+        result["fraud_reason"],
+        result["fraud_score"],
+        None if data.get("transaction_channel") is None else str(data["transaction_channel"]),
+        model_version if result["fraud_source"] == "model" else None,
+    )
+
+
+class TransactionWriter:
+    """Persist scored transactions from a bounded queue on a background thread.
+
+    Rows are written in groups with executemany and one commit per group: a
+    group is flushed when it reaches `max_batch_size` rows or `flush_interval`
+    seconds after its first row arrived. When the queue is full, the
+    `backpressure` policy decides what happens to new rows:
+
+    - "block": wait up to `block_timeout` seconds for space, then write inline
+    - "drop":  discard the row and count it
+    - "sync":  write the row inline on the caller's thread
+
+    close() (also registered with atexit) drains the queue before returning.
+    """
+
+    def __init__(self, pool, flush_interval=0.05, max_batch_size=500, max_queue_size=10000,
+                 backpressure="block", block_timeout=1.0):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"backpressure must be one of {BACKPRESSURE_POLICIES}")
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self.backpressure = backpressure
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._closed = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {"queued": 0, "written": 0, "flushes": 0, "dropped": 0, "inline_writes": 0, "failed": 0,
+                       "write_seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, name="transaction-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def submit(self, row):
+        if self._closed.is_set():
+            self._write([row])
+            self._count("inline_writes")
+            return
+        try:
+            if self.backpressure == "block":
+                self._queue.put(row, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(row)
+            self._count("queued")
+        except queue.Full:
+            if self.backpressure == "drop":
+                self._count("dropped")
+                return
+            self._write([row])
+            self._count("inline_writes")
+
+    def submit_many(self, rows):
+        for row in rows:
+            self.submit(row)
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                conn.executemany(INSERT_TRANSACTION_SQL, rows)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Failed to persist {len(rows)} transactions: {e}")
+            self._count("failed", len(rows))
+            return False
+        finally:
+            self._count("write_seconds", time.perf_counter() - started)
+        self._count("written", len(rows))
+        return True
+
+    def _collect(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._closed.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            self._write(batch)
+            self._count("flushes")
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        self._queue.join()
+
+    def close(self, timeout=10.0):
+        """Stop accepting queued rows and drain what is already queued."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._thread.join(timeout)
+        # Rows that raced with close() are written on the caller's thread.
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._write(leftover)
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        stats["backpressure"] = self.backpressure
+        return stats
+
+
+def transaction_writer_from_env(pool):
+    """Build a TransactionWriter configured from FRAUD_WRITER_* environment variables.
+
+    FRAUD_WRITER_FLUSH_MS (default 50), FRAUD_WRITER_MAX_BATCH (default 500),
+    FRAUD_WRITER_QUEUE_SIZE (default 10000) and FRAUD_WRITER_BACKPRESSURE
+    (block, drop or sync; default block).
+    """
+    return TransactionWriter(
+        pool,
+        flush_interval=float(os.environ.get("FRAUD_WRITER_FLUSH_MS", 50)) / 1000.0,
+        max_batch_size=int(os.environ.get("FRAUD_WRITER_MAX_BATCH", 500)),
+        max_queue_size=int(os.environ.get("FRAUD_WRITER_QUEUE_SIZE", 10000)),
+        backpressure=os.environ.get("FRAUD_WRITER_BACKPRESSURE", "block"),
+    )